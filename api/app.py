@@ -1,18 +1,146 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS  # Import CORS
 import os
 import requests
 import urllib.parse
 from datetime import datetime
-from itenerary import Itinerary
-from place import Place
+from itenerary import Itinerary, optimize_all
+from travel_matrix import TravelTimeMatrix
+from place import Place, PlaceSet
 from place import PlaceType
 import search
 import random
 import config
+import pipeline
+import geocoding
+import clustering
+import plans
+import metrics
+import profiling
+import time
+import json
+import logging
+import contextlib
+import contextvars
+import logs
+from functools import partial
+
+logs.setup()
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": [config.FRONTEND_URL], "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type"]}})
+
+# threading.Event set when the client of a streamed response disconnects, for servers
+# that don't close the response when it does (asgi.py sets it for its Flask pass-through)
+client_gone = contextvars.ContextVar("client_gone", default=None)
+CORS(app, resources={r"/api/*": {"origins": [config.FRONTEND_URL], "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type", "X-Request-ID", "X-Profile"], "expose_headers": ["X-Request-ID", "X-Profile-Capture"]}})
+
+
+@app.before_request
+def start_request_trace():
+    g.trace, g.trace_token = metrics.start_trace()
+    g.request_id = logs.new_request_id(request.headers.get('X-Request-ID'))
+    g.request_id_token = logs.request_id.set(g.request_id)
+    if request.method == 'POST' and request.path in profiling.ROUTES and profiling.requested(request.headers.get('X-Profile')):
+        g.profile = profiling.begin(request.path, g.request_id, request.get_json(silent=True))
+
+
+@app.after_request
+def finish_request_trace(response):
+    trace = getattr(g, 'trace', None)
+    if trace is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - trace.started, route=route, status=response.status_code)
+        if config.SERVER_TIMING:
+            response.headers['Server-Timing'] = trace.server_timing()
+            # Lets the frontend (another origin) read the timings in its devtools
+            response.headers['Timing-Allow-Origin'] = config.FRONTEND_URL
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Profile-Capture'] = os.path.basename(profile.finish(response.status_code))
+    return response
+
+
+@app.teardown_request
+def end_request_trace(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.finish(500)
+    token = g.pop('trace_token', None)
+    if token is not None:
+        metrics.end_trace(token)
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        logs.request_id.reset(token)
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, stage and provider metrics of this worker, in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def hotel_search_params(data):
+    """Read the hotel search fields shared by the plain and streaming endpoints."""
+    location = data.get('location')
+    location_coords = data.get('location_coords')
+    radius = data.get('radius', 5)  # in miles
+    budget_per_night = data.get('max_price', 200)  # This is actually budget per night
+    check_in_date = data.get('check_in_date')
+    check_out_date = data.get('check_out_date')
+
+    # Calculate number of nights and total max price
+    num_nights = 1  # Default to 1 night
+    if check_in_date and check_out_date:
+        try:
+            check_in = datetime.strptime(check_in_date, '%Y-%m-%d')
+            check_out = datetime.strptime(check_out_date, '%Y-%m-%d')
+            num_nights = (check_out - check_in).days
+            if num_nights < 1:
+                num_nights = 1  # Ensure at least 1 night
+        except Exception as date_err:
+            log.warning("Error calculating nights: %s", date_err)
+            num_nights = 1
+
+    # Max price is budget per night * number of nights
+    max_price = budget_per_night
+    log.debug("Budget per night: $%s, Nights: %s, Max total price: $%s", budget_per_night, num_nights, max_price)
+    return location, location_coords, radius, max_price, check_in_date, check_out_date, num_nights
+
+
+def _foursquare_hotels(data, location, location_coords, radius, max_price):
+    """Fallback hotel search through Foursquare, formatted for the frontend."""
+    hotels = search.search_places(**foursquare_hotel_search(data, location, location_coords, radius, max_price))
+    return format_foursquare_hotels(hotels, max_price)
+
+
+def foursquare_hotel_search(data, location, location_coords, radius, max_price):
+    """search_places() keyword arguments for the Foursquare hotel fallback."""
+    # Determine query based on hotel_name
+    query = data.get('hotel') if data.get('hotel') else "hotel"
+    return dict(
+        location=location,
+        query=query,
+        max_price=max_price if not data.get('hotel_name') else None,  # Skip price filter for specific hotel
+        radius=radius,
+        location_coords=location_coords
+    )
+
+
+def format_foursquare_hotels(hotels, max_price):
+    # Format hotels for frontend
+    hotel_list = []
+    for hotel in hotels:
+        hotel_list.append({
+            'name': hotel.name,
+            'address': hotel.address,
+            'lat': hotel.lat,
+            'lon': hotel.lon,
+            'price': max_price  # Foursquare doesn't always return price, use max_price as estimate
+        })
+    return hotel_list
 
 @app.route('/api/search-hotels', methods=['POST', 'OPTIONS'])
 def search_hotels():
@@ -25,29 +153,7 @@ def search_hotels():
         return jsonify({'error': 'Invalid JSON data'}), 400
 
     try:
-        location = data.get('location')
-        location_coords = data.get('location_coords')
-        radius = data.get('radius', 5)  # in miles
-        budget_per_night = data.get('max_price', 200)  # This is actually budget per night
-        check_in_date = data.get('check_in_date')
-        check_out_date = data.get('check_out_date')
-
-        # Calculate number of nights and total max price
-        num_nights = 1  # Default to 1 night
-        if check_in_date and check_out_date:
-            try:
-                check_in = datetime.strptime(check_in_date, '%Y-%m-%d')
-                check_out = datetime.strptime(check_out_date, '%Y-%m-%d')
-                num_nights = (check_out - check_in).days
-                if num_nights < 1:
-                    num_nights = 1  # Ensure at least 1 night
-            except Exception as date_err:
-                print(f"Error calculating nights: {date_err}")
-                num_nights = 1
-
-        # Max price is budget per night * number of nights
-        max_price = budget_per_night
-        print(f"Budget per night: ${budget_per_night}, Nights: {num_nights}, Max total price: ${max_price}")
+        location, location_coords, radius, max_price, check_in_date, check_out_date, num_nights = hotel_search_params(data)
 
         # Use Amadeus API if we have coordinates and dates
         if location_coords and check_in_date and check_out_date:
@@ -69,40 +175,94 @@ def search_hotels():
 
                 return jsonify({'hotels': priced_hotel_list})
             except Exception as amadeus_err:
-                print(f"Amadeus API error: {amadeus_err}")
+                log.warning("Amadeus API error, falling back to Foursquare: %s", amadeus_err)
                 # Fallback to Foursquare if Amadeus fails
                 pass
 
         # Fallback to Foursquare search
-        # Determine query based on hotel_name
-        query = data.get('hotel') if data.get('hotel') else "hotel"
-
-        hotels = search.search_places(
-            location=location,
-            query=query,
-            max_price=max_price if not data.get('hotel_name') else None,  # Skip price filter for specific hotel
-            radius=radius,
-            location_coords=location_coords
-        )
-
-        # Format hotels for frontend
-        hotel_list = []
-        for hotel in hotels:
-            hotel_list.append({
-                'name': hotel.name,
-                'address': hotel.address,
-                'lat': hotel.lat,
-                'lon': hotel.lon,
-                'price': max_price  # Foursquare doesn't always return price, use max_price as estimate
-            })
+        hotel_list = _foursquare_hotels(data, location, location_coords, radius, max_price)
 
         return jsonify({'hotels': hotel_list})
     except Exception as e:
-        print(f"Error in search_hotels: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in search_hotels")
         return jsonify({'error': str(e), 'hotels': []}), 500
 
+@app.route('/api/search-hotels/stream', methods=['POST', 'OPTIONS'])
+def search_hotels_stream():
+    """
+    Streaming variant of /api/search-hotels.
+
+    Replies with NDJSON: one {"type": "hotel", "hotel": {...}} line per hotel as soon as
+    its Amadeus batch resolves, then a final {"type": "done", "count": n} line (or
+    {"type": "error", ...} if the search failed); blank lines are keep-alives. The client
+    may pass `limit` to stop early; remaining batches are cancelled then, or when the
+    client disconnects.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+
+    try:
+        data = request.json
+    except Exception as e:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    try:
+        limit = max(1, min(int(data.get('limit', 20)), 100))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid limit'}), 400
+    location, location_coords, radius, max_price, check_in_date, check_out_date, num_nights = hotel_search_params(data)
+
+    def line(event):
+        return json.dumps(event) + "\n"
+
+    gone = client_gone.get()
+
+    def generate():
+        count = 0
+        try:
+            if location_coords and check_in_date and check_out_date:
+                try:
+                    hotels = search.get_hotels(location_coords.get('lat'), location_coords.get('lng'), radius)
+                    # The server closes this generator when the client goes away (noticed on a
+                    # write, hence the keep-alive lines), which closes iter_priced_hotels and
+                    # cancels its batches; under asgi.py `gone` is set instead
+                    priced = search.iter_priced_hotels(
+                        max_price=max_price * num_nights,
+                        check_in_date=check_in_date,
+                        check_out_date=check_out_date,
+                        hotels=hotels,
+                        num_nights=num_nights,
+                        limit=limit,
+                        stop=gone,
+                        keep_alive=True,
+                    )
+                    with contextlib.closing(priced):
+                        for hotel in priced:
+                            if hotel is None:
+                                yield "\n"
+                                continue
+                            count += 1
+                            yield line({'type': 'hotel', 'hotel': hotel})
+                    yield line({'type': 'done', 'count': count})
+                    return
+                except Exception as amadeus_err:
+                    log.warning("Amadeus API error: %s", amadeus_err)
+                    if count:
+                        raise
+
+            # Fallback to Foursquare search
+            for hotel in _foursquare_hotels(data, location, location_coords, radius, max_price)[:limit]:
+                count += 1
+                yield line({'type': 'hotel', 'hotel': hotel})
+            yield line({'type': 'done', 'count': count})
+        except Exception as e:
+            log.exception("Error in search_hotels_stream")
+            yield line({'type': 'error', 'error': str(e), 'count': count})
+
+    # No buffering by proxies, so each hotel reaches the browser as it is found
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers=headers)
+
 @app.route('/api/submit', methods=['POST', 'OPTIONS'])
 def submit():
     if request.method == 'OPTIONS':
@@ -114,98 +274,181 @@ def submit():
         return jsonify({'error': 'Invalid JSON data'}), 400
 
     try:
-
-        location = data.get('location')
-        location_coords = data.get('location_coords')
-        radius = data.get('radius', 5)
-        hotel_data = data.get('hotel')
-        rent_car = data.get('rent_car')
-        budget = data.get('budget')
-        duration = data.get('duration')
-        selected_tours = data.get('selected_tours', [])
-        food_percentages = data.get('food_percentages', [0, 0, 100])
-        must_visit_locations = data.get('must_visit_locations', [])
-        radius *= 1609.34
-
-        # Parse selected hotel as a place
-        hotel_place = None
-        if hotel_data:
-            hotel_place = parse_input_location({
-                'name': hotel_data.get('name', 'Selected Hotel'),
-                'type': 'Hotel',
-                'address': hotel_data.get('address', '')
-            })
-            hotel_place.lat = hotel_data.get('lat')
-            hotel_place.lon = hotel_data.get('lon')
-            hotel_place.fill_location()
-        print(f"Received submit request: location={location}, tours={selected_tours}, must_visit={must_visit_locations}, duration={duration}")
-        
-        search_center = location
-        
-        if not search_center:
-            return jsonify({'error': 'No valid search location provided'}), 400
-        
-        # Map tour types to better search queries
-        tour_query_map = {
-            "City Tour": "landmark",
-            "Museum Tour": "museum",
-            "Nature Tour": "park",
-            "Historical Tour": "historical monument",
-            "Physical Activity": "sports center"
-        }
-        
-        # Separate must-visit into food and tours
-        must_visit_food = []
-        must_visit_tours = []
-        for must_visit in must_visit_locations:
-            place = parse_input_location(must_visit)
-            place.fill_location()
-            if place.type == PlaceType.FOOD:
-                must_visit_food.append(place)
-            else:
-                must_visit_tours.append(place)
-
-        print(f"Added {len(must_visit_tours)} must-visit tour places")
-        print(f"Added {len(must_visit_food)} must-visit food places")
-
-        # Get tour places
-        tour_places = get_tours(selected_tours, tour_query_map, search_center, radius, location_coords, must_visit_tours)
-
-        # Search for food with better, more specific queries (within radius)
-        fast_food_spots = search.search_places(location=search_center, query="fast food restaurant", radius=radius, location_coords=location_coords)
-        local_food_spots = search.search_places(location=search_center, query="local restaurant", radius=radius, location_coords=location_coords)
-        fancy_food_spots = search.search_places(location=search_center, query="fine dining restaurant", radius=radius, location_coords=location_coords)
-
-        print(f"Found {len(fast_food_spots)} fast food spots")
-        print(f"Found {len(local_food_spots)} local food spots")
-        print(f"Found {len(fancy_food_spots)} fancy food spots")
-
-        # Get food places
-        all_food = get_food(food_percentages, fast_food_spots, local_food_spots, fancy_food_spots, duration, must_visit_food)
-
-        daily_itineraries, tour_count, food_count = build_daily_itineraries(hotel_place, tour_places, all_food, duration, location_coords, radius, rent_car)
-
-        # Build response
-        response_data = {
-            'success': True,
-            'location': location,
-            'duration': duration,
-            'rent_car': rent_car,
-            'budget': budget,
-            'food_percentages': food_percentages,
-            'daily_itineraries': daily_itineraries,
-            'total_tours': tour_count,
-            'total_food': food_count,
-            'message': 'Daily itineraries created and optimized successfully'
-        }
-        
-        return jsonify(response_data)
+        trip, error = parse_submit_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        # Repeated requests (double submits, going back a step) reuse the finished plan
+        key = plans.fingerprint(trip)
+        entry = plans.plan_cache.get(key, partial(make_plan, trip, plans.seed(key)))
+        return jsonify(plan_response(entry['plan'], trip))
     except Exception as e:
-        print(f"Error in submit: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in submit")
         return jsonify({'error': str(e)}), 500
 
+
+def parse_submit_request(data):
+    """
+    Read a /api/submit body.
+
+    Returns:
+        tuple: (trip dict, None), or (None, error message) for a bad request
+    """
+    location = data.get('location')
+    location_coords = data.get('location_coords')
+    radius = data.get('radius', 5)
+    hotel_data = data.get('hotel')
+    rent_car = data.get('rent_car')
+    budget = data.get('budget')
+    duration = data.get('duration')
+    # Order doesn't change the plan; a canonical one makes equal requests plan identically
+    selected_tours = sorted(set(data.get('selected_tours', [])))
+    food_percentages = data.get('food_percentages', [0, 0, 100])
+    must_visit_locations = data.get('must_visit_locations', [])
+    radius *= 1609.34
+
+    # Parse selected hotel as a place
+    hotel_place = None
+    if hotel_data:
+        hotel_place = parse_input_location({
+            'name': hotel_data.get('name', 'Selected Hotel'),
+            'type': 'Hotel',
+            'address': hotel_data.get('address', '')
+        })
+        hotel_place.lat = hotel_data.get('lat')
+        hotel_place.lon = hotel_data.get('lon')
+    log.info(
+        "Received submit request",
+        extra={'location': location, 'tours': selected_tours, 'must_visit': len(must_visit_locations), 'duration': duration},
+    )
+    
+    search_center = location
+    
+    if not search_center:
+        return None, 'No valid search location provided'
+    
+    # Map tour types to better search queries
+    tour_query_map = {
+        "City Tour": "landmark",
+        "Museum Tour": "museum",
+        "Nature Tour": "park",
+        "Historical Tour": "historical monument",
+        "Physical Activity": "sports center"
+    }
+    tour_queries = [tour_query_map.get(tour, tour) for tour in selected_tours]
+    food_queries = ["fast food restaurant", "local restaurant", "fine dining restaurant"]
+    must_visit_places = [parse_input_location(must_visit) for must_visit in must_visit_locations]
+
+    trip = {
+        'location': location,
+        'location_coords': location_coords,
+        'radius': radius,
+        'hotel_place': hotel_place,
+        'rent_car': rent_car,
+        'budget': budget,
+        'duration': duration,
+        'selected_tours': selected_tours,
+        'food_percentages': food_percentages,
+        'tour_queries': tour_queries,
+        'food_queries': food_queries,
+        'must_visit_places': must_visit_places,
+    }
+    return trip, None
+
+
+def make_plan(trip, seed):
+    """Search, geocode and plan a parsed request; returns a plans.plan_cache entry."""
+    deadline = pipeline.new_deadline()
+
+    # All searches and geocodes are independent, so send them at the same time
+    tasks = [partial(search.search_places, **kwargs) for kwargs in submit_searches(trip)]
+    # Must-visit places and the hotel are geocoded as one batch alongside the searches
+    tasks.append(partial(geocoding.fill_locations, trip['must_visit_places'] + [trip['hotel_place']], deadline=deadline))
+    results = pipeline.run_concurrently(tasks, deadline=deadline, default=[])
+    return plan_entry(trip, results[:-1], deadline, seed)
+
+
+def plan_entry(trip, search_results, deadline, seed):
+    """
+    plan_trip() as a plans.plan_cache entry. Only plans made from a result for every
+    search, with every must-visit place geocoded, within the deadline, are complete (and
+    so cached).
+    """
+    plan = plan_trip(trip, search_results, deadline, seed)
+    unplaced = [place.name for place in trip['must_visit_places'] if place.lat is None or place.lon is None]
+    if unplaced:
+        log.warning("Not caching the plan, must-visit places without coordinates: %s", unplaced)
+    complete = all(search_results) and not unplaced and pipeline.remaining(deadline) > 0
+    return {'plan': plan, 'complete': complete}
+
+
+def plan_response(plan, trip):
+    """A (possibly cached) plan with the fields the request only echoes taken from this request."""
+    return dict(plan, location=trip['location'], budget=trip['budget'])
+
+
+def submit_searches(trip):
+    """search_places() keyword arguments for every tour query, then every food query."""
+    return [
+        dict(location=trip['location'], query=query, radius=trip['radius'], location_coords=trip['location_coords'])
+        for query in trip['tour_queries'] + trip['food_queries']
+    ]
+
+
+def plan_trip(trip, search_results, deadline=None, seed=None):
+    """
+    Turn the search results (one list per submit_searches() entry, must-visit places
+    already geocoded) into the /api/submit response. The same `seed` and results always
+    give the same plan.
+    """
+    rng = random.Random(seed)
+    tour_queries = trip['tour_queries']
+    food_queries = trip['food_queries']
+    duration = trip['duration']
+    tour_results = search_results[:len(tour_queries)]
+    fast_food_spots, local_food_spots, fancy_food_spots = search_results[len(tour_queries):len(tour_queries) + len(food_queries)]
+
+    # Separate must-visit into food and tours
+    must_visit_food = []
+    must_visit_tours = []
+    for place in trip['must_visit_places']:
+        if place.type == PlaceType.FOOD:
+            must_visit_food.append(place)
+        else:
+            must_visit_tours.append(place)
+
+    log.debug("Added %d must-visit tour places", len(must_visit_tours))
+    log.debug("Added %d must-visit food places", len(must_visit_food))
+
+    # Get tour places
+    tour_places = get_tours(trip['selected_tours'], tour_queries, tour_results, must_visit_tours, rng=rng)
+
+    log.debug("Found %d fast food spots", len(fast_food_spots))
+    log.debug("Found %d local food spots", len(local_food_spots))
+    log.debug("Found %d fancy food spots", len(fancy_food_spots))
+
+    # Get food places
+    all_food = get_food(trip['food_percentages'], fast_food_spots, local_food_spots, fancy_food_spots, duration, must_visit_food, rng=rng)
+
+    daily_itineraries, tour_count, food_count = build_daily_itineraries(
+        trip['hotel_place'], tour_places, all_food, duration, trip['location_coords'], trip['radius'], trip['rent_car'],
+        seed=rng.getrandbits(64), deadline=deadline,
+    )
+
+    # Build response
+    return {
+        'success': True,
+        'location': trip['location'],
+        'duration': duration,
+        'rent_car': trip['rent_car'],
+        'budget': trip['budget'],
+        'food_percentages': trip['food_percentages'],
+        'daily_itineraries': daily_itineraries,
+        'total_tours': tour_count,
+        'total_food': food_count,
+        'message': 'Daily itineraries created and optimized successfully'
+    }
+
 def parse_input_location(location):
     name = location['name']
     type = location['type']
@@ -222,7 +465,7 @@ def parse_input_location(location):
     return place
 
 
-def split_food_by_percentage(food_percentages, fast_food_spots, local_food_spots, fancy_food_spots, duration):
+def split_food_by_percentage(food_percentages, fast_food_spots, local_food_spots, fancy_food_spots, duration, rng=random):
     """Split food options by user-specified percentages, returning allocated food spots."""
     remaining_food_spots = 3 * duration
     all_food = []
@@ -242,128 +485,136 @@ def split_food_by_percentage(food_percentages, fast_food_spots, local_food_spots
         # Add the spots
         all_food = fast_food_spots[:fast_amount] + local_food_spots[:local_amount] + fancy_food_spots[:fancy_amount]
 
-    print(f"Food allocation: {len(all_food)} food places allocated for {duration} days")
+    log.debug("Food allocation: %d food places allocated for %s days", len(all_food), duration)
 
-    random.shuffle(all_food)
+    rng.shuffle(all_food)
     return all_food
 
 
-def get_tours(selected_tours, tour_query_map, search_center, radius, location_coords, must_visit_tours):
-    """Get tour places from selected tours and must-visit tours, with deduplication."""
-    existing_places = set((p.name.lower(), p.address.lower()) for p in must_visit_tours)
+def get_tours(selected_tours, tour_queries, tour_results, must_visit_tours, rng=random):
+    """Get tour places from per-tour search results and must-visit tours, with deduplication."""
+    existing_places = set(p.dedupe_key for p in must_visit_tours)
     additional_tours = []
 
-    for tour in selected_tours:
-        query = tour_query_map.get(tour, tour)
-        places = search.search_places(location=search_center, query=query, radius=radius, location_coords=location_coords)
-        added_count = 0
-        for place in places:
-            key = (place.name.lower(), place.address.lower())
-            if key not in existing_places:
-                additional_tours.append(place)
-                existing_places.add(key)
-                added_count += 1
-        print(f"Found {added_count} additional places for '{tour}' (query: '{query}')")
-
-    random.shuffle(additional_tours)
+    for tour, query, places in zip(selected_tours, tour_queries, tour_results):
+        unique = PlaceSet(places).dedupe(existing_places)
+        additional_tours.extend(unique)
+        log.debug("Found %d additional places for %r (query: %r)", len(unique), tour, query)
+
+    rng.shuffle(additional_tours)
     tour_places = must_visit_tours + additional_tours
     return tour_places
 
 
-def get_food(food_percentages, fast_food_spots, local_food_spots, fancy_food_spots, duration, must_visit_food):
+def get_food(food_percentages, fast_food_spots, local_food_spots, fancy_food_spots, duration, must_visit_food, rng=random):
     """Get food places from categories and must-visit food, with deduplication."""
     # Categorize places
-    all_candidates = []
-    for p in fast_food_spots:
-        p.temp_type = 'fast'
-        all_candidates.append(p)
-    for p in local_food_spots:
-        p.temp_type = 'local'
-        all_candidates.append(p)
-    for p in fancy_food_spots:
-        p.temp_type = 'fancy'
-        all_candidates.append(p)
+    for category, spots in (('fast', fast_food_spots), ('local', local_food_spots), ('fancy', fancy_food_spots)):
+        for p in spots:
+            p.category = category
 
     # Deduplicate all candidates
-    seen = set()
-    unique_candidates = []
-    for p in all_candidates:
-        key = (p.name.lower(), p.address.lower())
-        if key not in seen:
-            seen.add(key)
-            unique_candidates.append(p)
-
-    # Group by temp_type
-    fast_unique = [p for p in unique_candidates if getattr(p, 'temp_type', None) == 'fast']
-    local_unique = [p for p in unique_candidates if getattr(p, 'temp_type', None) == 'local']
-    fancy_unique = [p for p in unique_candidates if getattr(p, 'temp_type', None) == 'fancy']
-
-    split_result = split_food_by_percentage(food_percentages, fast_unique, local_unique, fancy_unique, duration)
+    unique_candidates = PlaceSet(fast_food_spots + local_food_spots + fancy_food_spots).dedupe()
+
+    # Group by category
+    fast_unique = [p for p in unique_candidates if p.category == 'fast']
+    local_unique = [p for p in unique_candidates if p.category == 'local']
+    fancy_unique = [p for p in unique_candidates if p.category == 'fancy']
+
+    split_result = split_food_by_percentage(food_percentages, fast_unique, local_unique, fancy_unique, duration, rng=rng)
     all_food = must_visit_food + split_result
     return all_food
 
 
-def build_daily_itineraries(hotel_place, tour_places, all_food, duration, location_coords, radius, rent_car):
-    """Build and optimize daily itineraries."""
-    daily_itineraries = []
-    tour_count = 0
-    food_count = 0
+def build_daily_itineraries(hotel_place, tour_places, all_food, duration, location_coords, radius, rent_car, seed=None, deadline=None):
+    """Build and optimize daily itineraries.
+
+    The tours and meals to use are clustered into compact per-day groups around the
+    hotel first, then every day's distance matrix is fetched concurrently and the days
+    are optimized in the optimizer worker pool.
+    The same `seed` always gives the same itineraries, returned in day order.
+    """
+    rng = random.Random(seed)
+    itineraries = []
+
+    # Decide how many tours (2-3) and meals (3) each day gets
+    tours_per_day = []
+    meals_per_day = []
+    day_rngs = []
+    remaining_tours = len(tour_places)
+    remaining_food = len(all_food)
+    for day in range(duration):
+        # Each day gets its own seeded generator so results don't depend on scheduling
+        day_rngs.append(random.Random(rng.getrandbits(64)))
+        count = min(remaining_tours, rng.randint(2, min(3, remaining_tours)) if remaining_tours >= 2 else remaining_tours)
+        tours_per_day.append(count)
+        remaining_tours -= count
+        meals_per_day.append(min(3, remaining_food))
+        remaining_food -= meals_per_day[-1]
+    tour_count = sum(tours_per_day)
+    food_count = sum(meals_per_day)
+
+    # Group the chosen places into compact days around the hotel before routing
+    if hotel_place and hotel_place.lat is not None and hotel_place.lon is not None:
+        center = (hotel_place.lat, hotel_place.lon)
+    elif location_coords:
+        center = (location_coords.get('lat'), location_coords.get('lng'))
+    else:
+        center = None
+    day_tours, day_meals = clustering.assign_to_days(
+        tour_places[:tour_count], all_food[:food_count], tours_per_day, meals_per_day, center=center,
+    )
 
     for day in range(duration):
         day_itinerary = Itinerary()
         day_itinerary.mode = "driving" if rent_car else "transit"
+        day_itinerary.rng = day_rngs[day]
 
         # Add selected hotel as the first place in the itinerary
         if hotel_place:
             day_itinerary.add_place(hotel_place)
+        for place in day_tours[day] + day_meals[day]:
+            day_itinerary.add_place(place)
+        log.debug("Day %d: Added %d tours and %d food spots", day + 1, len(day_tours[day]), len(day_meals[day]))
+        itineraries.append(day_itinerary)
+
+    # Fetch one trip-wide matrix covering every day, then give each day its view of it
+    trip_matrix = TravelTimeMatrix("driving" if rent_car else "transit")
+    for day_itinerary in itineraries:
+        if day_itinerary.places:
+            trip_matrix.add_group([place.location_key for place in day_itinerary.places])
+    try:
+        with metrics.span("distance_matrix_fetch"):
+            trip_matrix.fetch(deadline=deadline)
+        log.info("Fetched %d matrix elements in %d requests", trip_matrix.elements_fetched, trip_matrix.requests_made)
+    except Exception as matrix_err:
+        log.warning("Error fetching distance matrix: %s", matrix_err)
+    ready = []
+    for day, day_itinerary in enumerate(itineraries):
+        if not day_itinerary.places:
+            continue
+        with metrics.span("create_distance_matrix"):
+            day_itinerary.create_distance_matrix(trip_matrix)
+        if day_itinerary.has_distance_matrix():
+            log.debug("Day %d: Created distance matrix for %d places", day + 1, len(day_itinerary.places))
+            ready.append((day, day_itinerary))
+        else:
+            log.warning("Day %d: No distance matrix, keeping unoptimized schedule", day + 1)
+
+    # Optimize every day in the worker pool; each keeps its hotel as the first stop
+    results = optimize_all([it for _, it in ready])
+    for (day, day_itinerary), result in zip(ready, results):
+        if result is not None:
+            metrics.record("optimize_day", result.elapsed)
+            log.debug(
+                "Day %d: Optimized route (%s, %d starts) in %.1f ms, %.0f seconds, %d back-to-back meals",
+                day + 1, result.method, result.starts, result.elapsed * 1000, result.cost, result.violations,
+            )
 
-        # Add 2-3 tours per day (handle cases with fewer available tour places)
-        tours_per_day = min(len(tour_places), random.randint(2, min(3, len(tour_places))) if len(tour_places) >= 2 else len(tour_places))
-        for _ in range(tours_per_day):
-            if tour_places:
-                tour_count += 1
-                place = tour_places.pop(0)
-                day_itinerary.add_place(place)
-
-        # Add 3 food spots per day
-        food_per_day = 3
-        added_food = 0
-        for _ in range(food_per_day):
-            if all_food:
-                food_count += 1
-                place = all_food.pop(0)
-                day_itinerary.add_place(place)
-                added_food += 1
-        print(f"Day {day + 1}: Added {added_food} food spots, remaining food: {len(all_food)}")
-
-        # Optimize this day's itinerary
-        if len(day_itinerary.places) > 0:
-            try:
-                day_itinerary.create_distance_matrix()
-                print(f"Day {day + 1}: Created distance matrix for {len(day_itinerary.places)} places")
-                # Run hill-climbing optimization
-                max_iterations = 50
-                for iteration in range(max_iterations):
-                    done = day_itinerary.execute_step()
-                    if done:
-                        print(f"Day {day + 1}: Optimization converged at iteration {iteration}")
-                        print(day_itinerary.places)
-                        break
-            except Exception as opt_err:
-                print(f"Day {day + 1}: Error during optimization: {opt_err}")
-                # Use unoptimized schedule if optimization fails
-
+    daily_itineraries = []
+    for day, day_itinerary in enumerate(itineraries):
         day_itinerary.final = list(day_itinerary.places)
 
-        # Ensure the itinerary starts at the hotel
-        if hotel_place:
-            try:
-                hotel_index = day_itinerary.final.index(hotel_place)
-                # Rotate the list so hotel is first
-                day_itinerary.final = day_itinerary.final[hotel_index:] + day_itinerary.final[:hotel_index]
-            except ValueError:
-                pass  # Hotel not found in the list
-
         daily_itineraries.append({
             'day': day + 1,
             'places': [
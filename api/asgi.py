@@ -0,0 +1,205 @@
+"""
+ASGI entry point: serves /api/submit and /api/search-hotels on an event loop so one
+worker keeps many requests in flight while they wait on providers; every other route
+is passed through to the Flask app.
+
+Run from api/ with:  uvicorn asgi:application --workers 1
+Needs httpx, uvicorn and asgiref (see requirements.txt). Request and response bodies
+are the same as the Flask views'.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from asgiref.wsgi import WsgiToAsgi
+import app as flask_views
+import async_search
+import http_client
+import pipeline
+import plans
+import metrics
+import profiling
+import logs
+import config
+
+_flask = WsgiToAsgi(flask_views.app)
+log = logging.getLogger(__name__)
+
+
+class _BadRequest(Exception):
+    pass
+
+
+async def _flask_streamed(scope, receive, send):
+    """
+    Pass a streamed Flask response through, setting flask_views.client_gone when the
+    client disconnects: asgiref stops reading once it has the request body and the server
+    drops writes to a closed connection, so the view would otherwise stream to the end.
+    """
+    gone = threading.Event()
+    body_read = asyncio.Event()
+
+    async def receive_body():
+        message = await receive()
+        if not message.get("more_body"):
+            body_read.set()
+        return message
+
+    async def watch():
+        await body_read.wait()
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        gone.set()
+
+    watcher = asyncio.create_task(watch())
+    # asgiref runs the view in a copy of this context
+    token = flask_views.client_gone.set(gone)
+    try:
+        await _flask(scope, receive_body, send)
+    finally:
+        flask_views.client_gone.reset(token)
+        watcher.cancel()
+
+
+async def _read_json(scope, receive):
+    """The request body as JSON; raises _BadRequest like Flask's request.json would fail."""
+    headers = dict(scope.get("headers", []))
+    if b"application/json" not in headers.get(b"content-type", b""):
+        raise _BadRequest()
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise _BadRequest()
+
+
+def _cors_headers(scope):
+    """Same CORS headers Flask-CORS adds to a response for the configured frontend origin."""
+    origin = dict(scope.get("headers", [])).get(b"origin")
+    if origin is None:
+        # Flask-CORS names the allowed origin even when the request has no Origin header
+        origin = config.FRONTEND_URL.encode("latin-1")
+    elif origin.decode("latin-1") != config.FRONTEND_URL:
+        return []
+    return [(b"access-control-allow-origin", origin), (b"access-control-expose-headers", b"X-Profile-Capture, X-Request-ID")]
+
+
+async def _send_json(scope, send, payload, status=200, extra_headers=()):
+    # Serialize exactly like Flask's jsonify()
+    body = (flask_views.app.json.dumps(payload) + "\n").encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers + _cors_headers(scope) + list(extra_headers)})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def submit(data):
+    """Async /api/submit: provider lookups share the event loop, planning runs in a worker thread."""
+    trip, error = flask_views.parse_submit_request(data)
+    if error:
+        return {'error': error}, 400
+
+    async def make_plan():
+        deadline = pipeline.new_deadline()
+        coroutines = [async_search.search_places(**kwargs) for kwargs in flask_views.submit_searches(trip)]
+        coroutines.append(async_search.fill_locations(trip['must_visit_places'] + [trip['hotel_place']], deadline=deadline))
+        results = await pipeline.run_concurrently_async(coroutines, deadline=deadline, default=[])
+        # Clustering and routing are CPU work plus blocking Distance Matrix calls
+        return await asyncio.to_thread(flask_views.plan_entry, trip, results[:-1], deadline, plans.seed(key))
+
+    key = plans.fingerprint(trip)
+    entry = await plans.plan_cache.aget(key, make_plan)
+    return flask_views.plan_response(entry['plan'], trip), 200
+
+
+async def search_hotels(data):
+    """Async /api/search-hotels: Amadeus when we have coordinates and dates, else Foursquare."""
+    location, location_coords, radius, max_price, check_in_date, check_out_date, num_nights = flask_views.hotel_search_params(data)
+
+    # Use Amadeus API if we have coordinates and dates
+    if location_coords and check_in_date and check_out_date:
+        try:
+            hotels = await async_search.get_hotels(location_coords.get('lat'), location_coords.get('lng'), radius)
+            priced_hotel_list = await async_search.priced_hotels(
+                max_price=max_price * num_nights,
+                check_in_date=check_in_date,
+                check_out_date=check_out_date,
+                hotels=hotels,
+                num_nights=num_nights
+            )
+            return {'hotels': priced_hotel_list}, 200
+        except Exception as amadeus_err:
+            log.warning("Amadeus API error, falling back to Foursquare: %s", amadeus_err)
+            # Fallback to Foursquare if Amadeus fails
+
+    hotels = await async_search.search_places(**flask_views.foursquare_hotel_search(data, location, location_coords, radius, max_price))
+    return {'hotels': flask_views.format_foursquare_hotels(hotels, max_price)}, 200
+
+
+# path -> (handler, extra keys in the 500 response)
+ROUTES = {
+    "/api/submit": (submit, {}),
+    "/api/search-hotels": (search_hotels, {'hotels': []}),
+}
+
+# Flask routes that stream their response
+STREAMED = {"/api/search-hotels/stream"}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await http_client.aclose_all()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    route = ROUTES.get(scope.get("path")) if scope["type"] == "http" else None
+    # CORS preflights go to Flask too, so Flask-CORS answers them exactly as it always has
+    if route is None or scope["method"] != "POST":
+        if scope["type"] == "http" and scope.get("path") in STREAMED:
+            await _flask_streamed(scope, receive, send)
+        else:
+            await _flask(scope, receive, send)
+        return
+
+    handler, error_extra = route
+    trace, token = metrics.start_trace()
+    headers = dict(scope.get("headers", []))
+    rid = logs.new_request_id(headers.get(b"x-request-id", b"").decode("latin-1"))
+    rid_token = logs.request_id.set(rid)
+    profile = None
+    try:
+        try:
+            data = await _read_json(scope, receive)
+        except _BadRequest:
+            payload, status = {'error': 'Invalid JSON data'}, 400
+        else:
+            if scope["path"] in profiling.ROUTES and profiling.requested(headers.get(b"x-profile", b"").decode("latin-1") or None):
+                profile = profiling.begin(scope["path"], rid, data)
+            try:
+                payload, status = await handler(data)
+            except Exception as e:
+                log.exception("Error in %s", handler.__name__)
+                payload, status = {'error': str(e), **error_extra}, 500
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - trace.started, route=scope["path"], status=status)
+        extra_headers = [(b"x-request-id", rid.encode())]
+        if profile is not None:
+            extra_headers.append((b"x-profile-capture", os.path.basename(profile.finish(status)).encode()))
+        if config.SERVER_TIMING:
+            extra_headers += [(b"server-timing", trace.server_timing().encode()), (b"timing-allow-origin", config.FRONTEND_URL.encode())]
+        await _send_json(scope, send, payload, status, extra_headers)
+    finally:
+        if profile is not None:
+            profile.finish(500)
+        logs.request_id.reset(rid_token)
+        metrics.end_trace(token)
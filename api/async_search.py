@@ -0,0 +1,138 @@
+import asyncio
+import collections
+import time
+import httpx
+import logging
+import http_client
+import geocoding
+import metrics
+import search
+from concurrency import Throttled
+from config import AMADEUS_MAX_RETRIES
+
+log = logging.getLogger(__name__)
+
+# Async versions of the provider lookups for the ASGI app (asgi.py). Request building,
+# response parsing and the caches are shared with the sync functions in search.py, so
+# both paths return identical results.
+
+
+async def get_amadeus_access_token():
+    # Usually a cached read; a refresh blocks on the token endpoint, so keep it off the loop
+    return await asyncio.to_thread(search.get_amadeus_access_token)
+
+
+async def search_places(location, query, max_price=None, radius=None, location_coords=None):
+    """Async search.search_places()."""
+    with metrics.span("search_places"):
+        url = search._place_search_url(location, query, max_price, radius, location_coords)
+        if url is None:
+            return []
+
+        async def load():
+            return search._place_results(await http_client.aget(url, headers=search._place_search_headers()))
+
+        try:
+            key = search._place_search_key(location, query, max_price, radius, location_coords)
+            items = await search.place_search_cache.aget(key, load)
+        except Exception as e:
+            log.warning("Exception in search_places: %s", e)
+            return []
+        return search._parse_places(items, query, radius, location_coords)
+
+
+async def get_hotels(lat, lon, radius_miles):
+    """Async search.get_hotels()."""
+    async def load():
+        access_token = await get_amadeus_access_token()
+        with metrics.span("amadeus_hotel_list"):
+            await search.amadeus_rate.acquire_async()
+            url, params, headers = search._hotels_request(lat, lon, radius_miles, access_token)
+            return search._parse_hotels(await http_client.aget(url, headers=headers, params=params))
+
+    try:
+        cached = await search.hotel_list_cache.aget(search._hotel_list_key(lat, lon, radius_miles), load)
+    except search.AmadeusError as e:
+        log.warning("Amadeus get_hotels failed: %s", e)
+        return []
+    return search._nearest_first(lat, lon, cached)
+
+
+async def priced_hotels(max_price, check_in_date, check_out_date, hotels, num_nights, adults=1, currency="USD", limit=20):
+    """
+    Async search.priced_hotels(): cached offers first, then nearest-first batches under
+    the shared Amadeus limits. Batches still running once `limit` hotels are found are
+    cancelled outright.
+    """
+    if not hotels or limit <= 0:
+        return []
+
+    selection = search._HotelSelection(hotels, max_price, check_in_date, check_out_date, num_nights, adults, currency)
+    result = []
+    for hotel_entry in selection.qualifying(await selection.acached_offers()):
+        result.append(hotel_entry)
+        if len(result) >= limit:
+            return result
+    to_price = selection.to_price()
+    if not to_price:
+        return result
+
+    headers = search._amadeus_headers(await get_amadeus_access_token())
+    pending = collections.deque(search._chunk_hotels(to_price))
+    running = set()
+    try:
+        while pending or running:
+            if pending and not running:
+                await search.amadeus_offers_limit.acquire_async()
+                running.add(_start_batch(pending.popleft(), selection.base_params, headers))
+            while pending and search.amadeus_offers_limit.try_acquire():
+                running.add(_start_batch(pending.popleft(), selection.base_params, headers))
+            # Wake up periodically so batches can start when another request frees a slot
+            done, running = await asyncio.wait(running, timeout=0.05, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for hotel_entry in selection.qualifying(task.result()):
+                    result.append(hotel_entry)
+                    if len(result) >= limit:
+                        return result
+    finally:
+        for task in running:
+            task.cancel()
+    log.info("Total priced hotels: %d", len(result))
+    return result
+
+
+def _start_batch(batch, base_params, headers):
+    """Start a batch whose concurrency slot is already held; the slot is freed when it finishes or is cancelled."""
+    task = asyncio.ensure_future(_run_batch(batch, base_params, headers))
+    task.add_done_callback(lambda _: search.amadeus_offers_limit.release())
+    return task
+
+
+async def _run_batch(batch, base_params, headers):
+    """Async search._run_batch()."""
+    url, params, hotel_ids = search._offers_request(batch, base_params)
+    if not hotel_ids:
+        return {}
+    for attempt in range(AMADEUS_MAX_RETRIES + 1):
+        await search.amadeus_rate.acquire_async()
+        start = time.monotonic()
+        try:
+            with metrics.span("amadeus_offer_batch"):
+                result = search._parse_offers(await http_client.aget(url, headers=headers, params=params), hotel_ids)
+        except Throttled as e:
+            search.amadeus_offers_limit.observe(time.monotonic() - start, throttled=True)
+            search.amadeus_rate.pause(e.retry_after)
+            log.info("Amadeus priced_hotels batch throttled (attempt %d), retrying in %ss", attempt + 1, e.retry_after)
+            continue
+        except httpx.HTTPError as e:
+            log.warning("Amadeus priced_hotels batch failed: %s", e)
+            return {}
+        search.amadeus_offers_limit.observe(time.monotonic() - start)
+        await search._astore_offers(result, base_params)
+        return result
+    return {}
+
+
+async def fill_locations(places, deadline=None):
+    # googlemaps is a blocking client; lookups are mostly cache hits, so a worker thread is enough
+    return await asyncio.to_thread(geocoding.fill_locations, places, deadline)
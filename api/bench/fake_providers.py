@@ -0,0 +1,261 @@
+"""
+Stand-ins for the Amadeus, Foursquare and Google Maps endpoints the API calls, for load
+tests and benchmarks that shouldn't touch (or pay for) the real providers.
+
+Responses come from a fixtures file when one matches the request, else they are
+generated synthetically as deterministic functions of the request. Latency, jitter and
+an error rate are configurable; errors are deterministic too (a given request fails on
+the same attempts in every run), so retries behave the same from run to run.
+
+Run from api/bench/:  FAKE_LATENCY_MS=200 uvicorn fake_providers:app --port 8765
+then point the API at it with AMADEUS_BASE_URL / FOURSQUARE_BASE_URL /
+GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8765.
+
+Settings (environment):
+    FAKE_LATENCY_MS         base latency of every response (default 200)
+    FAKE_JITTER_MS          extra latency, uniform in [0, jitter) per request (default 0)
+    FAKE_ERROR_RATE         fraction of requests that fail (default 0)
+    FAKE_ERROR_STATUS       status of failed requests; 429 also sends Retry-After (default 500)
+    FAKE_HOTELS             hotels per Amadeus geocode search (default 20)
+    FAKE_SEED               changes every synthetic value and error draw (default 0)
+    FAKE_FIXTURES           JSON file of recorded responses to serve first
+    FAKE_RECORD             proxy every request to the real provider and append it to FAKE_FIXTURES
+
+GET /_fake/stats returns request and error counts per route; POST /_fake/reset clears them.
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import math
+import os
+import threading
+import urllib.parse
+
+LATENCY = float(os.getenv("FAKE_LATENCY_MS", 200)) / 1000
+JITTER = float(os.getenv("FAKE_JITTER_MS", 0)) / 1000
+ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", 0))
+ERROR_STATUS = int(os.getenv("FAKE_ERROR_STATUS", 500))
+HOTELS_PER_SEARCH = int(os.getenv("FAKE_HOTELS", 20))
+SEED = os.getenv("FAKE_SEED", "0")
+FIXTURES_PATH = os.getenv("FAKE_FIXTURES")
+RECORD = os.getenv("FAKE_RECORD", "").lower() in ("1", "true", "yes")
+
+# Where FAKE_RECORD sends each route, by path prefix
+UPSTREAMS = {
+    "/v1/": "https://test.api.amadeus.com",
+    "/v3/": "https://test.api.amadeus.com",
+    "/places/": "https://places-api.foursquare.com",
+    "/maps/": "https://maps.googleapis.com",
+}
+# Never written to fixtures
+SECRET_PARAMS = {"key", "client_id", "client_secret", "signature"}
+
+
+def _unit(*parts):
+    """Deterministic pseudo-random number in [0, 1) from the parts."""
+    digest = hashlib.sha1("|".join(map(str, (SEED,) + parts)).encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def _coords(location):
+    """'lat,lon' strings as given; anything else hashed to a point near the origin of the fake city."""
+    try:
+        lat, lon = (float(part) for part in location.split(","))
+        return lat, lon
+    except ValueError:
+        return 40.75 + (_unit(location, "lat") - 0.5) / 10, -73.98 + (_unit(location, "lon") - 0.5) / 10
+
+
+def _seconds(origin, destination):
+    (lat1, lon1), (lat2, lon2) = _coords(origin), _coords(destination)
+    miles = math.hypot(lat1 - lat2, (lon1 - lon2) * math.cos(math.radians(lat1))) * 69
+    return int(120 + miles * 180)
+
+
+def token(query):
+    return {"access_token": "fake-token", "expires_in": 1799}
+
+
+def hotels_by_geocode(query):
+    lat, lon = float(query["latitude"]), float(query["longitude"])
+    return {"data": [
+        {
+            "hotelId": f"FAKE{i:04d}",
+            "name": f"Fake Hotel {i}",
+            "geoCode": {"latitude": lat + (_unit(lat, lon, i, "a") - 0.5) / 20, "longitude": lon + (_unit(lat, lon, i, "b") - 0.5) / 20},
+            "address": {"lines": [f"{i} Fake St"], "cityName": "FAKE CITY", "postalCode": "00000", "countryCode": "US"},
+        }
+        for i in range(HOTELS_PER_SEARCH)
+    ]}
+
+
+def hotel_offers(query):
+    data = []
+    for hotel_id in query.get("hotelIds", "").split(","):
+        if not hotel_id or _unit(hotel_id, "available") < 0.2:
+            continue
+        nights_price = 80 + 400 * _unit(hotel_id, query.get("checkInDate"), query.get("checkOutDate"))
+        data.append({
+            "hotel": {"hotelId": hotel_id, "name": f"Fake Hotel {hotel_id[4:]}"},
+            "offers": [{"price": {"total": f"{nights_price:.2f}", "currency": query.get("currency", "USD")}}],
+        })
+    return {"data": data}
+
+
+def place_search(query):
+    lat, lon = _coords(query.get("ll") or query.get("near", "40.75,-73.98"))
+    results = []
+    for i in range(int(query.get("limit", 20))):
+        seed = (query.get("query"), lat, lon, i)
+        results.append({
+            "name": f"Fake {query.get('query', 'place')} {i}",
+            "location": {"formatted_address": f"{i} {query.get('query', 'Place')} Ave, Fake City"},
+            "geocodes": {"main": {"latitude": lat + (_unit(*seed, "a") - 0.5) / 30, "longitude": lon + (_unit(*seed, "b") - 0.5) / 30}},
+        })
+    return {"results": results}
+
+
+def distance_matrix(query):
+    origins = query["origins"].split("|")
+    destinations = query["destinations"].split("|")
+    return {"status": "OK", "rows": [
+        {"elements": [{"status": "OK", "duration": {"value": _seconds(o, d)}} for d in destinations]}
+        for o in origins
+    ]}
+
+
+def geocode(query):
+    if "latlng" in query:
+        return {"status": "OK", "results": [{"formatted_address": f"Near {query['latlng']}, Fake City"}]}
+    lat, lon = _coords(query.get("address", ""))
+    return {"status": "OK", "results": [{
+        "geometry": {"location": {"lat": lat, "lng": lon}},
+        "formatted_address": query.get("address", ""),
+    }]}
+
+
+ROUTES = {
+    "/v1/security/oauth2/token": token,
+    "/v1/reference-data/locations/hotels/by-geocode": hotels_by_geocode,
+    "/v3/shopping/hotel-offers": hotel_offers,
+    "/places/search": place_search,
+    "/maps/api/distancematrix/json": distance_matrix,
+    "/maps/api/geocode/json": geocode,
+}
+
+
+class Fixtures:
+    """
+    Recorded responses: a JSON list of {"path", "query", "status", "body"}. An entry
+    answers a request to its path whose query contains all of the entry's parameters.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = collections.defaultdict(list)
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for entry in json.load(f):
+                    self.entries[entry["path"]].append(entry)
+
+    def find(self, path, query):
+        for entry in self.entries.get(path, ()):
+            if all(query.get(name) == value for name, value in entry["query"].items()):
+                return entry["status"], entry["body"]
+        return None
+
+    def add(self, path, query, status, body):
+        entry = {
+            "path": path,
+            "query": {name: value for name, value in query.items() if name not in SECRET_PARAMS},
+            "status": status,
+            "body": body,
+        }
+        with self.lock:
+            self.entries[path].insert(0, entry)
+            with open(self.path, "w") as f:
+                json.dump([e for entries in self.entries.values() for e in entries], f, indent=1)
+
+
+fixtures = Fixtures(FIXTURES_PATH)
+stats = collections.defaultdict(lambda: {"requests": 0, "errors": 0, "fixtures": 0})
+_attempts = collections.Counter()
+
+
+def _request_key(path, query):
+    return path + "?" + urllib.parse.urlencode(sorted(query.items()))
+
+
+def _should_fail(key):
+    """Deterministic error draw; the attempt number is part of it so retries can succeed."""
+    _attempts[key] += 1
+    return ERROR_RATE > 0 and _unit(key, _attempts[key], "error") < ERROR_RATE
+
+
+async def _record(scope, path, query, body):
+    import httpx
+
+    upstream = next(host for prefix, host in UPSTREAMS.items() if path.startswith(prefix))
+    headers = {k.decode(): v.decode() for k, v in scope["headers"] if k.lower() not in (b"host", b"content-length")}
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = await client.request(scope["method"], upstream + path, params=scope["query_string"].decode(), content=body, headers=headers)
+    payload = response.json()
+    # Tokens are credentials: serve the synthetic token instead of recording a real one
+    if path != "/v1/security/oauth2/token":
+        fixtures.add(path, query, response.status_code, payload)
+    return response.status_code, payload
+
+
+async def _send_json(send, status, payload, headers=()):
+    body = json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json"), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    path = scope["path"]
+    if path == "/_fake/stats":
+        await _send_json(send, 200, stats)
+        return
+    if path == "/_fake/reset":
+        stats.clear()
+        _attempts.clear()
+        await _send_json(send, 200, {})
+        return
+
+    query = dict(urllib.parse.parse_qsl(scope.get("query_string", b"").decode()))
+    body = b""
+    if scope["method"] == "POST":
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        query.update(urllib.parse.parse_qsl(body.decode()))
+
+    handler = ROUTES.get(path)
+    if handler is None:
+        await _send_json(send, 404, {"error": "not found"})
+        return
+    key = _request_key(path, query)
+    route_stats = stats[path]
+    route_stats["requests"] += 1
+    await asyncio.sleep(LATENCY + JITTER * _unit(key, _attempts[key], "jitter"))
+
+    if _should_fail(key):
+        route_stats["errors"] += 1
+        headers = [(b"retry-after", b"1")] if ERROR_STATUS == 429 else []
+        await _send_json(send, ERROR_STATUS, {"error": "injected failure"}, headers)
+        return
+    if RECORD:
+        status, payload = await _record(scope, path, query, body)
+    else:
+        found = fixtures.find(path, query)
+        if found:
+            route_stats["fixtures"] += 1
+        status, payload = found or (200, handler(query))
+    await _send_json(send, status, payload)
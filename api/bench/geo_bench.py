@@ -0,0 +1,93 @@
+"""
+Radius filtering and nearest-place queries: the old per-item haversine loop vs the
+vectorized haversine vs the PlaceIndex.
+
+Run from api/:  python bench/geo_bench.py [--places N] [--queries Q]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from math import radians, cos, sin, asin, sqrt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import geo  # noqa: E402
+
+
+class Point:
+    def __init__(self, lat, lon):
+        self.lat = lat
+        self.lon = lon
+
+
+def loop_within(center, places, radius):
+    """The per-item loop search_places used to run."""
+    kept = []
+    for place in places:
+        lat1, lon1 = radians(center[0]), radians(center[1])
+        lat2, lon2 = radians(place.lat), radians(place.lon)
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+        if 3959 * 2 * asin(sqrt(a)) <= radius:
+            kept.append(place)
+    return kept
+
+
+def loop_nearest(center, places, k):
+    scored = []
+    for place in places:
+        lat1, lon1 = radians(center[0]), radians(center[1])
+        lat2, lon2 = radians(place.lat), radians(place.lon)
+        a = sin((lat2 - lat1)/2)**2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1)/2)**2
+        scored.append((3959 * 2 * asin(sqrt(a)), place))
+    scored.sort(key=lambda pair: pair[0])
+    return [place for _, place in scored[:k]]
+
+
+def vector_within(center, places, lats, lons, radius):
+    mask = geo.within_radius(center[0], center[1], lats, lons, radius)
+    return [place for place, ok in zip(places, mask) if ok]
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, nargs="+", default=[20, 200, 2000, 20000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=2.0, help="miles")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    center = (40.75, -73.98)
+    print(f"{'places':>7} {'query':<8} {'loop us':>10} {'vector us':>10} {'index us':>10} {'speedup':>8}")
+    for n in args.places:
+        # Places spread over ~20 miles around the center, like a city's search results
+        places = [Point(center[0] + rng.uniform(-0.15, 0.15), center[1] + rng.uniform(-0.2, 0.2)) for _ in range(n)]
+        lats = [p.lat for p in places]
+        lons = [p.lon for p in places]
+        index = geo.PlaceIndex().add_all(places)
+        queries = [(center[0] + rng.uniform(-0.1, 0.1), center[1] + rng.uniform(-0.1, 0.1)) for _ in range(args.queries)]
+
+        loop_us, expected = timed(lambda q: loop_within(q, places, args.radius), queries)
+        vector_us, got_vector = timed(lambda q: vector_within(q, places, lats, lons, args.radius), queries)
+        index_us, got_index = timed(lambda q: index.within(q[0], q[1], args.radius), queries)
+        assert got_vector == expected and got_index == expected, "radius results differ"
+        print(f"{n:>7} {'radius':<8} {loop_us:>10.1f} {vector_us:>10.1f} {index_us:>10.1f} {loop_us / index_us:>7.1f}x")
+
+        loop_us, expected = timed(lambda q: loop_nearest(q, places, args.k), queries)
+        index_us, got_index = timed(lambda q: [p for p, _ in index.nearest(q[0], q[1], args.k)], queries)
+        assert got_index == expected, "nearest results differ"
+        print(f"{n:>7} {'nearest':<8} {loop_us:>10.1f} {'':>10} {index_us:>10.1f} {loop_us / index_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
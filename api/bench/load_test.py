@@ -0,0 +1,239 @@
+"""
+Sustained-throughput comparison of the two ways of serving the API: the Flask app on a
+fixed pool of worker threads (like gunicorn --threads N) vs the ASGI app (asgi.py) on
+one event loop. Both run against the fake providers (fake_providers.py) with the same
+artificial latency, with the response caches off so every request reaches them.
+
+Run from api/:  python bench/load_test.py [--endpoint search-hotels|submit]
+                    [--concurrency C] [--duration S] [--threads N] [--latency-ms MS]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(API_DIR, "bench")
+
+PAYLOADS = {
+    "search-hotels": {
+        "location": "New York, NY",
+        "location_coords": {"lat": 40.758, "lng": -73.9855},
+        "radius": 5,
+        "max_price": 300,
+        "check_in_date": "2026-12-01",
+        "check_out_date": "2026-12-04",
+    },
+    "submit": {
+        "location": "New York, NY",
+        "location_coords": {"lat": 40.758, "lng": -73.9855},
+        "radius": 5,
+        "duration": 3,
+        "budget": 2000,
+        "rent_car": False,
+        "selected_tours": ["Museum Tour", "Nature Tour"],
+        "food_percentages": [30, 40, 30],
+        "hotel": {"name": "Fake Hotel 1", "address": "1 Fake St", "lat": 40.76, "lon": -73.98},
+    },
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _app_env(provider_url, caches=False):
+    """Environment for an API process that talks to the fake providers at `provider_url`."""
+    env = dict(os.environ)
+    env.update({
+        "AMADEUS_BASE_URL": provider_url,
+        "FOURSQUARE_BASE_URL": provider_url,
+        "GOOGLE_MAPS_BASE_URL": provider_url,
+        "AMADEUS_CLIENT_ID": "fake",
+        "AMADEUS_CLIENT_SECRET": "fake",
+        "FOURSQUARE_API_KEY": "fake",
+        "GOOGLE_MAPS_API_KEY": "AIzaFakeKeyForLoadTests",
+        # Measure the serving model, not the provider protections
+        "AMADEUS_RATE_LIMIT": "0",
+        "AMADEUS_INITIAL_CONCURRENCY": "1000",
+        "AMADEUS_MIN_CONCURRENCY": "1000",
+        "AMADEUS_MAX_CONCURRENCY": "1000",
+    })
+    if not caches:
+        # ...nor the caches: every request reaches the providers
+        env.update({
+            "PLAN_CACHE_BACKEND": "none",
+            "SEARCH_CACHE_BACKEND": "none",
+            "HOTEL_CACHE_BACKEND": "none",
+            "GEOCODE_CACHE_BACKEND": "memory",
+            "TRAVEL_CACHE_PATH": "",
+        })
+    return env
+
+
+def serve_threaded(port, threads):
+    """Flask app on a fixed pool of `threads` request workers."""
+    import logging
+    sys.path.insert(0, API_DIR)
+    from werkzeug.serving import BaseWSGIServer
+    from app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    pool = ThreadPoolExecutor(max_workers=threads)
+
+    class PooledServer(BaseWSGIServer):
+        request_queue_size = 1024
+
+        def process_request(self, request, client_address):
+            pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledServer("127.0.0.1", port, app).serve_forever()
+
+
+def _start_server(mode, port, env, threads):
+    if mode == "threaded":
+        command = [sys.executable, os.path.abspath(__file__), "--serve-threaded", str(port), "--threads", str(threads)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "asgi:application", "--port", str(port),
+                   "--workers", "1", "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL)
+
+
+async def _drive(url, payload, concurrency, duration):
+    import httpx
+
+    latencies, errors = [], 0
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < stop_at:
+                start = time.monotonic()
+                try:
+                    response = await client.post(url, json=payload)
+                    ok = response.status_code == 200
+                except Exception:
+                    ok = False
+                if ok:
+                    latencies.append(time.monotonic() - start)
+                else:
+                    errors += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return latencies, errors, elapsed
+
+
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def start_providers(**settings):
+    """
+    Start fake_providers.py in a subprocess; keyword arguments become its FAKE_* settings
+    (latency_ms=200 -> FAKE_LATENCY_MS=200).
+
+    Returns:
+        tuple: (process, base url)
+    """
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({f"FAKE_{name.upper()}": str(value) for name, value in settings.items() if value is not None})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_providers:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BENCH_DIR, env=env,
+    )
+    _wait_for_port(port)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def run(mode, endpoint, provider_url, concurrency=64, duration=10, threads=8):
+    """Serve the API in `mode` against the providers and drive `endpoint` for `duration` seconds."""
+    port = _free_port()
+    server = _start_server(mode, port, _app_env(provider_url), threads)
+    try:
+        _wait_for_port(port)
+        url = f"http://127.0.0.1:{port}/api/{endpoint}"
+        payload = PAYLOADS[endpoint]
+        # One warm-up request (imports, token fetch, connection pools)
+        asyncio.run(_drive(url, payload, 1, 0.001))
+        latencies, errors, elapsed = asyncio.run(_drive(url, payload, concurrency, duration))
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "mode": mode,
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--endpoint", choices=sorted(PAYLOADS), default="search-hotels")
+    parser.add_argument("--mode", choices=["both", "threaded", "async"], default="both")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    parser.add_argument("--threads", type=int, default=8, help="worker threads for the threaded server")
+    parser.add_argument("--latency-ms", type=float, default=200, help="fake provider latency")
+    parser.add_argument("--serve-threaded", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_threaded:
+        serve_threaded(args.serve_threaded, args.threads)
+        return
+
+    provider, provider_url = start_providers(latency_ms=args.latency_ms)
+    try:
+        modes = ["threaded", "async"] if args.mode == "both" else [args.mode]
+        results = [run(mode, args.endpoint, provider_url, args.concurrency, args.duration, args.threads) for mode in modes]
+    finally:
+        provider.terminate()
+        provider.wait()
+
+    print(f"{'mode':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}{r['errors']:>8}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
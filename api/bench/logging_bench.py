@@ -0,0 +1,156 @@
+"""
+Request-path cost of logging: the print() calls the API used to make versus logging
+written synchronously on the request thread versus the queue handler in logs.py, at
+INFO (per-item lines dropped at debug level) and at DEBUG.
+
+Each simulated request emits the lines one /api/submit used to print: a few summary
+lines plus one line per parsed place and hotel. Requests run on several threads at
+once, writing to a file or to a pipe whose reader is slow (like a busy log shipper),
+and the time each request spends in logging calls is reported.
+
+Run from api/:  python bench/logging_bench.py [--requests N] [--threads N] [--sink file|pipe]
+                    [--drain-kb KB]
+"""
+import argparse
+import concurrent.futures
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, os.path.join(API_DIR, "bench"))
+import load_test  # noqa: E402
+
+SUMMARY_LINES = 12
+ITEM_LINES = 240
+
+
+def _print_request(sink):
+    for i in range(SUMMARY_LINES):
+        print(f"Day {i % 3 + 1}: Added {i} tours and {i * 2} food spots", file=sink)
+    for i in range(ITEM_LINES):
+        print(f"Fake museum {i}", "Tour", file=sink)
+
+
+def _log_request(log):
+    for i in range(SUMMARY_LINES):
+        log.info("Day %d: Added %d tours and %d food spots", i % 3 + 1, i, i * 2)
+    for i in range(ITEM_LINES):
+        log.debug("Parsed place %r (%s)", f"Fake museum {i}", "Tour")
+
+
+def _slow_pipe(drain_kb):
+    """A pipe whose reader drains `drain_kb` KB every millisecond."""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, "rb") as reader:
+            while reader.read1(int(drain_kb * 1024)):
+                time.sleep(0.001)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    return os.fdopen(write_fd, "w", buffering=1), thread
+
+
+def _open_sink(kind, directory, drain_kb):
+    if kind == "pipe":
+        return _slow_pipe(drain_kb)
+    return open(os.path.join(directory, "log.txt"), "w", buffering=1), None
+
+
+def _time_requests(request, requests, threads):
+    def timed(_):
+        start = time.perf_counter()
+        request()
+        return time.perf_counter() - start
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(timed, range(requests)))
+
+
+def _sync_logger(sink, level):
+    log = logging.getLogger("bench.sync")
+    log.handlers[:] = [logging.StreamHandler(sink)]
+    log.handlers[0].setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log.propagate = False
+    log.setLevel(level)
+    return log
+
+
+def _queue_logger(sink, level):
+    """logs.setup() as the app runs it, writing to `sink` at `level`."""
+    os.environ["LOG_LEVEL"] = logging.getLevelName(level)
+    import config
+    import logs
+
+    logs.shutdown()
+    importlib.reload(config)
+    importlib.reload(logs)
+    stdout, sys.stdout = sys.stdout, sink
+    try:
+        logs.setup()
+    finally:
+        sys.stdout = stdout
+    return logs, logging.getLogger("bench.queue")
+
+
+def run_case(name, sink_kind, requests, threads, drain_kb=4):
+    with tempfile.TemporaryDirectory() as directory:
+        sink, reader = _open_sink(sink_kind, directory, drain_kb)
+        logs = None
+        if name == "print":
+            request = lambda: _print_request(sink)  # noqa: E731
+        elif name.startswith("sync"):
+            log = _sync_logger(sink, logging.DEBUG if name.endswith("debug") else logging.INFO)
+            request = lambda: _log_request(log)  # noqa: E731
+        else:
+            logs, log = _queue_logger(sink, logging.DEBUG if name.endswith("debug") else logging.INFO)
+            request = lambda: _log_request(log)  # noqa: E731
+        wall = time.perf_counter()
+        latencies = _time_requests(request, requests, threads)
+        request_wall = time.perf_counter() - wall
+        dropped = 0
+        if logs is not None:
+            dropped = logs.dropped()
+            logs.shutdown()
+        sink.close()
+        if reader is not None:
+            reader.join()
+    return {
+        "case": name,
+        "sink": sink_kind,
+        "mean_us": sum(latencies) / len(latencies) * 1e6,
+        "p50_us": load_test._percentile(latencies, 50) * 1e6,
+        "p99_us": load_test._percentile(latencies, 99) * 1e6,
+        "requests_per_s": requests / request_wall,
+        "dropped": dropped,
+    }
+
+
+CASES = ("print", "sync-info", "sync-debug", "queue-info", "queue-debug")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sink", nargs="+", choices=("file", "pipe"), default=["file", "pipe"])
+    parser.add_argument("--drain-kb", type=float, default=4, help="KB the pipe reader takes per millisecond")
+    args = parser.parse_args()
+
+    print(f"{ITEM_LINES + SUMMARY_LINES} lines per request ({SUMMARY_LINES} at INFO), {args.threads} threads")
+    for sink_kind in args.sink:
+        for name in CASES:
+            r = run_case(name, sink_kind, args.requests, args.threads, args.drain_kb)
+            print(f"{r['sink']:<5} {r['case']:<12} mean {r['mean_us']:>9.0f} us  p50 {r['p50_us']:>9.0f} us  "
+                  f"p99 {r['p99_us']:>9.0f} us  {r['requests_per_s']:>8.0f} req/s  dropped {r['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
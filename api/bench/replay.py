@@ -0,0 +1,209 @@
+"""
+Replay a profiled request (see profiling.py) offline: the provider responses in its
+capture answer every provider call instead of the network, and the chosen part of the
+request runs under the same stack sampler, so its CPU hot spots can be reproduced and
+compared between changes without any provider.
+
+    request      the whole route (/api/submit or /api/search-hotels) through the Flask app
+    itineraries  build_daily_itineraries() with the places the captured submit planned from
+    parse        the search parsing: every recorded place search, hotel list and offer batch
+
+Caches are off and the optimizer runs in this process, so all of the work is sampled.
+
+Run from api/:  python bench/replay.py CAPTURE.json [--target T] [--repeat N] [--output FILE]
+Writes the samples in collapsed-stack format (default: the capture's name with
+.replay-<target>.folded) and prints the functions with the most samples.
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import sys
+import time
+import urllib.parse
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, os.path.join(API_DIR, "bench"))
+import load_test  # noqa: E402
+
+REPLAY_URL = "http://replay.invalid"
+TARGETS = ("request", "itineraries", "parse")
+
+
+def _key(method, url):
+    import profiling
+
+    parts = urllib.parse.urlsplit(profiling.strip_secrets(url))
+    return method.upper(), parts.path, tuple(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+
+
+def _response(entry, request=None):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.reason = http.client.responses.get(entry["status"], "")
+    response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+    body = entry.get("body")
+    response._content = (body if isinstance(body, str) else json.dumps(body)).encode()
+    response.encoding = "utf-8"
+    response.url = request.url if request is not None else entry["url"]
+    response.request = request
+    return response
+
+
+def replay_adapter(responses):
+    """A requests transport adapter answering from `responses` (a capture's list)."""
+    import requests
+    from requests.adapters import BaseAdapter
+
+    class ReplayAdapter(BaseAdapter):
+        """
+        Matches on method, path and query (credentials aside), ignoring the host. Repeated
+        calls get the recorded responses in order, starting over when they run out. The
+        token endpoint always gets a synthetic token; anything else unrecorded fails.
+        """
+
+        def __init__(self):
+            super().__init__()
+            self.entries = collections.defaultdict(list)
+            self.calls = collections.Counter()
+            for entry in responses:
+                self.entries[_key(entry["method"], entry["url"])].append(entry)
+
+        def send(self, request, **kwargs):
+            key = _key(request.method, request.url)
+            if key[1] == "/v1/security/oauth2/token":
+                return _response({"status": 200, "body": {"access_token": "replay", "expires_in": 1799}}, request)
+            entries = self.entries.get(key)
+            if not entries:
+                raise requests.ConnectionError(f"Not in the capture: {request.method} {request.url}")
+            entry = entries[self.calls[key] % len(entries)]
+            self.calls[key] += 1
+            if "error" in entry:
+                raise requests.ConnectionError(entry["error"])
+            return _response(entry, request)
+
+        def close(self):
+            pass
+
+    return ReplayAdapter()
+
+
+def _parse_all(responses):
+    """Run each recorded search response through the parsing it got in the request."""
+    import search
+
+    for entry in responses:
+        if entry.get("status") != 200:
+            continue
+        parts = urllib.parse.urlsplit(entry["url"])
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        response = _response(entry)
+        if parts.path.endswith("/places/search"):
+            coords = None
+            if "ll" in query:
+                lat, lng = (float(v) for v in query["ll"].split(","))
+                coords = {"lat": lat, "lng": lng}
+            radius = float(query["radius"]) if "radius" in query else None
+            search._parse_places(search._place_results(response), query.get("query", ""), radius, coords)
+        elif parts.path.endswith("/hotels/by-geocode"):
+            search._parse_hotels(response)
+        elif parts.path.endswith("/hotel-offers"):
+            search._parse_offers(response, query.get("hotelIds", "").split(","))
+
+
+def _itinerary_inputs(app, capture):
+    """Arguments build_daily_itineraries() got when the captured submit is replayed once."""
+    calls = []
+    original = app.build_daily_itineraries
+
+    def record(*args, **kwargs):
+        calls.append((args, dict(kwargs, deadline=None)))
+        return original(*args, **kwargs)
+
+    app.build_daily_itineraries = record
+    try:
+        app.app.test_client().post(capture["route"], json=capture["request"])
+    finally:
+        app.build_daily_itineraries = original
+    if not calls:
+        raise SystemExit("The captured request never reached build_daily_itineraries")
+    return original, calls[0]
+
+
+# Innermost frames that mean the thread is blocked (on worker threads or a lock), not busy
+_WAITING = ("(threading.py:", "(queue.py:", "(selectors.py:")
+
+
+def top_functions(stacks, limit=15):
+    """(label, samples) of the innermost frames with the most samples, blocked ones left out."""
+    leaves = collections.Counter()
+    for stack, count in stacks.items():
+        leaf = stack.rsplit(";", 1)[-1]
+        if not any(marker in leaf for marker in _WAITING):
+            leaves[leaf] += count
+    return leaves.most_common(limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("capture", help="a .json capture written by a profiled request")
+    parser.add_argument("--target", choices=TARGETS, default="request")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--interval-ms", type=float, default=1)
+    parser.add_argument("--output", help="collapsed-stack file to write")
+    args = parser.parse_args()
+
+    with open(args.capture) as f:
+        capture = json.load(f)
+    # Before the app is imported: it reads its config then
+    os.environ.update(load_test._app_env(REPLAY_URL, caches=False))
+    os.environ.update({"OPTIMIZER_WORKERS": "1", "PROFILE_REQUESTS": "false", "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")})
+    import app
+    import http_client
+    import profiling
+
+    session = http_client.session_for(REPLAY_URL)
+    session.mount("http://", replay_adapter(capture["responses"]))
+    # googlemaps paces itself to its queries-per-second quota by sleeping; replays needn't
+    gmaps = http_client.get_gmaps_client()
+    gmaps.queries_quota = float("inf")
+
+    if args.target == "request":
+        client = app.app.test_client()
+        run = lambda: client.post(capture["route"], json=capture["request"])  # noqa: E731
+    elif args.target == "itineraries":
+        if capture["route"] != "/api/submit":
+            raise SystemExit("--target itineraries needs a /api/submit capture")
+        build, (call_args, call_kwargs) = _itinerary_inputs(app, capture)
+        run = lambda: build(*call_args, **call_kwargs)  # noqa: E731
+    else:
+        run = lambda: _parse_all(capture["responses"])  # noqa: E731
+
+    sampler = profiling.Sampler(args.interval_ms / 1000)
+    sampler.start()
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    sampler.stop()
+
+    output = args.output or f"{os.path.splitext(args.capture)[0]}.replay-{args.target}.folded"
+    with open(output, "w") as f:
+        f.write(sampler.folded())
+    total = sum(sampler.stacks.values()) or 1
+    busy = sum(count for _, count in top_functions(sampler.stacks, limit=None))
+    print(f"{args.target}: {args.repeat} runs, mean {sum(timings) / len(timings) * 1000:.1f} ms, "
+          f"min {min(timings) * 1000:.1f} ms, {total} samples ({busy / total:.0%} busy)")
+    for label, count in top_functions(sampler.stacks):
+        print(f"{count / total:>6.1%}  {label}")
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmark suite against the fake providers (fake_providers.py), written to a JSON file
+so runs can be compared over time.
+
+    endpoints   end-to-end latency percentiles and throughput of /api/search-hotels and
+                /api/submit, served threaded and async (see load_test.py), caches off
+    optimizer   CPU time of routing.optimize_route per day size, on seeded synthetic days
+    cache       hit rates of every cache and the provider calls they save, over a seeded
+                mix of repeated submit and hotel-search requests through the Flask app
+
+Run from api/:  python bench/run_benchmarks.py [--quick] [--only SECTION ...]
+                    [--latency-ms MS] [--error-rate R] [--output FILE]
+Results go to bench/results/<UTC timestamp>.json unless --output is given.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, os.path.join(API_DIR, "bench"))
+import load_test  # noqa: E402
+
+SECTIONS = ("endpoints", "optimizer", "cache")
+DAY_SIZES = (4, 6, 8, 10, 12, 13, 16, 20, 25, 30)
+
+CITIES = [
+    ("New York, NY", 40.758, -73.9855),
+    ("Chicago, IL", 41.8819, -87.6278),
+    ("Austin, TX", 30.2672, -97.7431),
+]
+TOUR_CHOICES = [["Museum Tour"], ["City Tour", "Nature Tour"], ["Historical Tour", "Museum Tour"]]
+
+
+def _percentiles(values):
+    return {f"p{q}_ms": load_test._percentile(values, q) * 1000 for q in (50, 95, 99)}
+
+
+def bench_endpoints(provider_url, concurrency, duration, threads):
+    return [
+        load_test.run(mode, endpoint, provider_url, concurrency, duration, threads)
+        for endpoint in sorted(load_test.PAYLOADS)
+        for mode in ("threaded", "async")
+    ]
+
+
+def _synthetic_day(size, seed):
+    """Travel-time matrix (seconds) and meal flags for `size` stops scattered over a few miles."""
+    import numpy as np
+    import geo
+
+    rng = random.Random(seed)
+    lats = np.array([40.75 + rng.uniform(-0.04, 0.04) for _ in range(size)])
+    lons = np.array([-73.98 + rng.uniform(-0.05, 0.05) for _ in range(size)])
+    matrix = 120 + 180 * geo.haversine_miles(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+    np.fill_diagonal(matrix, 0.0)
+    # Hotel first, then alternating tours and meals, like a real day
+    flags = [False] + [i % 2 == 1 for i in range(1, size)]
+    return matrix, flags
+
+
+def bench_optimizer(repeats):
+    import routing
+    from config import OPTIMIZER_TIME_BUDGET, OPTIMIZER_MAX_STARTS, OPTIMIZER_EXACT_MAX_STOPS
+
+    results = []
+    for size in DAY_SIZES:
+        cpu, wall, starts, methods = [], [], [], set()
+        for repeat in range(repeats):
+            matrix, flags = _synthetic_day(size, f"{size}-{repeat}")
+            start_cpu, start_wall = time.process_time(), time.perf_counter()
+            result = routing.optimize_route(
+                matrix,
+                rng=random.Random(repeat),
+                violations=routing.adjacency_violations(flags),
+                flags=flags,
+                time_budget=OPTIMIZER_TIME_BUDGET,
+                max_starts=OPTIMIZER_MAX_STARTS,
+                exact_max=OPTIMIZER_EXACT_MAX_STOPS,
+            )
+            cpu.append(time.process_time() - start_cpu)
+            wall.append(time.perf_counter() - start_wall)
+            starts.append(result.starts)
+            methods.add(result.method)
+        results.append({
+            "stops": size,
+            "method": "/".join(sorted(methods)),
+            "cpu_mean_ms": sum(cpu) / len(cpu) * 1000,
+            "cpu_p95_ms": load_test._percentile(cpu, 95) * 1000,
+            "wall_mean_ms": sum(wall) / len(wall) * 1000,
+            "starts_mean": sum(starts) / len(starts),
+        })
+    return results
+
+
+def _workload(requests, seed):
+    """Seeded mix of submit and hotel-search bodies drawn from a few presets, so many repeat."""
+    rng = random.Random(seed)
+    bodies = []
+    for _ in range(requests):
+        location, lat, lng = rng.choice(CITIES)
+        if rng.random() < 0.3:
+            body = dict(load_test.PAYLOADS["search-hotels"], location=location, location_coords={"lat": lat, "lng": lng})
+            bodies.append(("search-hotels", body))
+            continue
+        body = dict(
+            load_test.PAYLOADS["submit"],
+            location=location,
+            location_coords={"lat": lat, "lng": lng},
+            duration=rng.choice([2, 3]),
+            selected_tours=rng.choice(TOUR_CHOICES),
+            must_visit_locations=[{"name": f"{location} Public Library", "type": "Tour", "address": f"1 Library Way, {location}"}],
+            hotel={"name": "Fake Hotel 1", "address": "1 Fake St", "lat": lat + 0.002, "lon": lng - 0.002},
+        )
+        bodies.append(("submit", body))
+    return bodies
+
+
+def _hit_rate(stats):
+    hits = stats.get("fresh_hits", 0) + stats.get("stale_hits", 0)
+    lookups = hits + stats.get("misses", 0)
+    return hits / lookups if lookups else None
+
+
+def bench_cache(provider_url, requests, seed):
+    """Runs the Flask app in this process, so it has to run after the env is set up."""
+    import requests as http
+    import app
+    import geocoding
+    import plans
+    import search
+    import travel_matrix
+
+    http.post(f"{provider_url}/_fake/reset")
+    client = app.app.test_client()
+    latencies, errors = [], 0
+    for endpoint, body in _workload(requests, seed):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.post(f"/api/{endpoint}", json=body)
+        latencies.append(time.perf_counter() - start)
+        errors += response.status_code != 200
+
+    caches = {
+        "plans": plans.plan_cache.stats(),
+        "place_search": search.place_search_cache.stats(),
+        "hotel_list": search.hotel_list_cache.stats(),
+        "geocode": geocoding.geocode_cache.stats(),
+    }
+    for name, stats in caches.items():
+        stats["hit_rate"] = _hit_rate(stats)
+    if search.hotel_offer_cache is not None:
+        caches["hotel_offers"] = search.hotel_offer_cache.stats()
+    if travel_matrix.get_travel_cache() is not None:
+        caches["travel_times"] = travel_matrix.get_travel_cache().stats()
+    return {
+        "requests": requests,
+        "errors": errors,
+        **_percentiles(latencies),
+        "caches": caches,
+        "provider_calls": http.get(f"{provider_url}/_fake/stats").json(),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=API_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_summary(report):
+    results = report["results"]
+    for r in results.get("endpoints", []):
+        print(f"{r['endpoint']:<14}{r['mode']:<10}{r['throughput_rps']:>8.1f} req/s  p50 {r['p50_ms']:>6.0f} ms  p95 {r['p95_ms']:>6.0f} ms  errors {r['errors']}")
+    for r in results.get("optimizer", []):
+        print(f"optimizer {r['stops']:>3} stops  {r['method']:<16} cpu {r['cpu_mean_ms']:>8.2f} ms  p95 {r['cpu_p95_ms']:>8.2f} ms")
+    cache = results.get("cache")
+    if cache:
+        print(f"cache workload  {cache['requests']} requests  p50 {cache['p50_ms']:.0f} ms  p95 {cache['p95_ms']:.0f} ms  errors {cache['errors']}")
+        for name, stats in cache["caches"].items():
+            rate = stats.get("hit_rate")
+            print(f"  {name:<14} hit rate {'-' if rate is None else f'{rate:.0%}'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--quick", action="store_true", help="short runs, for a smoke check")
+    parser.add_argument("--latency-ms", type=float, default=200, help="fake provider latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="fake provider latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of provider requests that fail")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients for the endpoint runs")
+    parser.add_argument("--threads", type=int, default=8, help="worker threads for the threaded server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default bench/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    duration = 3 if args.quick else 15
+    settings = {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "seed": args.seed,
+    }
+    provider, provider_url = load_test.start_providers(**settings)
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # The in-process sections read config at import, so set the env up front
+            os.environ.update(load_test._app_env(provider_url, caches=True))
+            os.environ.update({"CACHE_DIR": cache_dir, "TRAVEL_CACHE_PATH": os.path.join(cache_dir, "travel_times.sqlite3")})
+            if "endpoints" in args.only:
+                results["endpoints"] = bench_endpoints(provider_url, args.concurrency, duration, args.threads)
+            if "optimizer" in args.only:
+                results["optimizer"] = bench_optimizer(5 if args.quick else 30)
+            if "cache" in args.only:
+                results["cache"] = bench_cache(provider_url, 20 if args.quick else 100, args.seed)
+    finally:
+        provider.terminate()
+        provider.wait()
+
+    now = datetime.now(timezone.utc)
+    report = {
+        "timestamp": now.isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": dict(settings, quick=args.quick, concurrency=args.concurrency, threads=args.threads, duration_s=duration),
+        "results": results,
+    }
+    output = args.output or os.path.join(API_DIR, "bench", "results", now.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    _print_summary(report)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
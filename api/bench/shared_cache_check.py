@@ -0,0 +1,107 @@
+"""
+Check that worker processes warm each other through the shared cache tier.
+
+Against the fake providers (fake_providers.py), a worker process runs a seeded mix of
+submit and hotel-search requests through the Flask app; then a second, fresh worker
+runs the same mix. With the "shared" backend the second worker should find nearly
+everything the first one loaded (the token included) and barely call the providers;
+with per-process "memory" caches it starts cold and repeats nearly every call (travel
+times are kept in their file either way). Everything runs locally: the shared tier is a
+SQLite file in a temporary directory.
+
+Run from api/:  python bench/shared_cache_check.py [--backend shared memory] [--requests N]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, os.path.join(API_DIR, "bench"))
+import load_test  # noqa: E402
+import run_benchmarks  # noqa: E402
+
+BACKEND_SETTINGS = ("SEARCH_CACHE_BACKEND", "HOTEL_CACHE_BACKEND", "PLAN_CACHE_BACKEND", "GEOCODE_CACHE_BACKEND", "AMADEUS_TOKEN_CACHE_BACKEND")
+
+
+def _worker(bodies, results):
+    """One API worker process: run `bodies` through the app and report latencies and cache stats."""
+    import app
+    import search
+
+    client = app.app.test_client()
+    latencies, errors = [], 0
+    for endpoint, body in bodies:
+        start = time.perf_counter()
+        response = client.post(f"/api/{endpoint}", json=body)
+        latencies.append(time.perf_counter() - start)
+        errors += response.status_code != 200
+    results.put({
+        "latencies": latencies,
+        "errors": errors,
+        "place_search": search.place_search_cache.stats(),
+        "token": search.amadeus_tokens.stats(),
+    })
+
+
+def run_phase(bodies):
+    """Run `bodies` in a fresh worker process (spawned, so nothing is inherited but the files)."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_worker, args=(bodies, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def check(backend, provider_url, requests, seed):
+    import requests as http
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ.update(load_test._app_env(provider_url, caches=True))
+        os.environ.update({name: backend for name in BACKEND_SETTINGS})
+        os.environ.update({
+            "CACHE_DIR": cache_dir,
+            "SHARED_CACHE_PATH": os.path.join(cache_dir, "shared.sqlite3"),
+            "TRAVEL_CACHE_PATH": os.path.join(cache_dir, "travel_times.sqlite3"),
+            "LOG_LEVEL": "WARNING",
+        })
+        bodies = run_benchmarks._workload(requests, seed)
+        phases = []
+        for name in ("first worker", "second worker"):
+            http.post(f"{provider_url}/_fake/reset")
+            result = run_phase(bodies)
+            calls = http.get(f"{provider_url}/_fake/stats").json()
+            phases.append((name, result, sum(route["requests"] for route in calls.values())))
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", nargs="+", choices=("shared", "memory"), default=["shared", "memory"])
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=50, help="fake provider latency")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    provider, provider_url = load_test.start_providers(latency_ms=args.latency_ms, seed=args.seed)
+    try:
+        for backend in args.backend:
+            for name, result, provider_calls in check(backend, provider_url, args.requests, args.seed):
+                latencies = result["latencies"]
+                searches = result["place_search"]
+                print(f"{backend:<7} {name:<14} provider calls {provider_calls:>5}  "
+                      f"p50 {load_test._percentile(latencies, 50) * 1000:>7.1f} ms  "
+                      f"place-search hits {searches['fresh_hits']:>4}/{searches['fresh_hits'] + searches['misses']:<4} "
+                      f"token fetches {result['token']['refreshes']}  errors {result['errors']}")
+    finally:
+        provider.terminate()
+        provider.wait()
+
+
+if __name__ == "__main__":
+    main()
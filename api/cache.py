@@ -0,0 +1,592 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import CACHE_DIR, SHARED_CACHE_PATH, SHARED_CACHE_LOCAL_ENTRIES, SHARED_CACHE_LOCAL_TTL, SHARED_CACHE_MMAP_SIZE
+from config import SHARED_CACHE_BUSY_TIMEOUT
+
+log = logging.getLogger(__name__)
+
+# True while a request has to see what the providers return now (profiled requests, see
+# profiling.py): cache reads are skipped, but what is loaded is still stored
+bypass_reads = contextvars.ContextVar("bypass_reads", default=False)
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache stored in a local SQLite file.
+
+    Values are JSON-encoded. Every entry has an expiry time (`ttl` seconds after it was
+    written) and a last-access time; once the table holds more than `max_entries`, the
+    least recently used entries are evicted. Safe to share between threads, and between
+    processes on the same host (SQLite handles the file locking).
+
+    A cache is never worth failing a request over: when the file is locked for longer
+    than `busy_timeout` (or otherwise fails), reads count as misses and writes are
+    skipped, with a warning. Reads only write back an entry's access time when it is more
+    than `touch_interval` seconds old, so hits rarely need the write lock; LRU order is
+    kept to that resolution.
+
+    Args:
+        path (str): SQLite file, created along with its directory if missing
+        table (str): table name, so several caches can share one file
+        ttl (float): default time-to-live in seconds (None = never expires)
+        max_entries (int): LRU bound on the number of rows
+        mmap_size (int): bytes of the file to read through a memory map (0 = off); processes
+            mapping the same file share those pages in the OS page cache
+        busy_timeout (float): seconds to wait for another connection's lock
+        touch_interval (float): how stale an access time may get before a read refreshes it
+    """
+
+    def __init__(self, path, table, ttl=None, max_entries=100000, mmap_size=0, busy_timeout=5, touch_interval=60):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Entries may be credentials (see TokenManager), so only the owner gets to read the
+        # file; SQLite gives its -wal and -shm files the same permissions
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        # On a throwaway connection: caches are created at import time, and a connection
+        # opened then would be inherited by every process a pre-forking server forks
+        conn = sqlite3.connect(path, timeout=max(busy_timeout, 5))
+        try:
+            # WAL from the start, so readers never wait on a writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+        finally:
+            conn.close()
+
+    def _conn(self):
+        """This thread's connection, opened on first use in each process (SQLite connections don't survive fork())."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.mmap_size:
+                conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that are cached and unexpired."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        stale = []
+        now = time.time()
+        try:
+            conn = self._conn()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, value, accessed_at FROM {self.table} WHERE key IN ({marks}) AND (expires_at IS NULL OR expires_at > ?)",
+                    (*chunk, now),
+                ).fetchall()
+                for key, value, accessed_at in rows:
+                    found[key] = json.loads(value)
+                    if accessed_at < now - self.touch_interval:
+                        stale.append(key)
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            found = {}
+        if stale:
+            self._touch(stale, now)
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _touch(self, keys, now):
+        """Refresh the access time of `keys`; best effort, without waiting: a busy file just leaves them older."""
+        conn = self._conn()
+        try:
+            conn.execute("PRAGMA busy_timeout = 0")
+            with conn:
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key IN ({','.join('?' * len(chunk))})", (now, *chunk))
+        except sqlite3.Error as e:
+            log.debug("Skipped access-time update in %s: %s", self.table, e)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+
+    def _failed(self, operation, error):
+        with self._stats_lock:
+            self.errors += 1
+        log.warning("Cache %s on %s failed, continuing without it: %s", operation, self.table, error)
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    async def aget_many(self, keys):
+        """get_many() for callers on an event loop: the file is read in a worker thread."""
+        return await asyncio.to_thread(self.get_many, keys)
+
+    def set_many(self, items, ttl=None):
+        """Store every (key, value) in `items`, then evict down to max_entries."""
+        items = dict(items)
+        if not items:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        rows = [(key, json.dumps(value), expires_at, now) for key, value in items.items()]
+        try:
+            with self._conn() as conn:
+                conn.executemany(f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)", rows)
+                evicted = self._evict(conn, now)
+        except sqlite3.Error as e:
+            self._failed("write", e)
+            return
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    async def aset_many(self, items, ttl=None):
+        """set_many() for callers on an event loop: the file is written in a worker thread."""
+        await asyncio.to_thread(self.set_many, items, ttl)
+
+    def delete(self, key):
+        try:
+            with self._conn() as conn:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def clear(self):
+        try:
+            with self._conn() as conn:
+                conn.execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then the least recently used past max_entries; returns how many LRU entries went."""
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+            (excess,),
+        )
+        return excess
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "errors": self.errors,
+            }
+
+
+class MemoryCache:
+    """In-process LRU cache with the same interface as SQLiteCache (values are stored as-is)."""
+
+    def __init__(self, ttl=None, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        now = time.time()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                value, expires_at = entry
+                if expires_at is not None and expires_at <= now:
+                    del self._entries[key]
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+                self.hits += 1
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    async def aget_many(self, keys):
+        return self.get_many(keys)
+
+    def set_many(self, items, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            for key, value in dict(items).items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    async def aset_many(self, items, ttl=None):
+        self.set_many(items, ttl=ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+class SharedCache:
+    """
+    Cache tier shared by every worker process on the host: a small in-process LRU in
+    front of a SQLite file all workers open (see SQLiteCache).
+
+    Reads try the local LRU, then the file, copying what they find there into the LRU;
+    writes go to both. So whatever one worker loads is a hit in every other worker, and a
+    restarted worker starts warm. Local copies live at most `local_ttl` seconds, which
+    bounds how long a worker keeps serving an entry that another worker has since
+    replaced or deleted (and how far past its expiry it may be served). Memory per cache
+    is bounded by `local_entries`; the file by the shared cache's max_entries.
+
+    Same interface as SQLiteCache and MemoryCache, including the aget_many/aset_many
+    coroutines, which serve local copies on the event loop and reach the file from a
+    worker thread.
+
+    Args:
+        shared (SQLiteCache): the tier every worker opens
+        local_entries (int): LRU bound on this worker's copies
+        local_ttl (float): seconds a local copy is served without checking the file
+    """
+
+    def __init__(self, shared, local_entries=1000, local_ttl=30):
+        self.shared = shared
+        self.local = MemoryCache(ttl=local_ttl, max_entries=local_entries)
+        self.local_ttl = local_ttl
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        found = self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            self._keep(found, self.shared.get_many(missing))
+        return found
+
+    async def aget_many(self, keys):
+        """get_many() for callers on an event loop: only the file is read in a worker thread."""
+        keys = list(dict.fromkeys(keys))
+        found = self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            self._keep(found, await self.shared.aget_many(missing))
+        return found
+
+    def _keep(self, found, shared):
+        if shared:
+            self.local.set_many(shared)
+        found.update(shared)
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items, ttl=None):
+        items = dict(items)
+        self.shared.set_many(items, ttl=ttl)
+        self._set_local(items, ttl)
+
+    async def aset_many(self, items, ttl=None):
+        items = dict(items)
+        await self.shared.aset_many(items, ttl=ttl)
+        self._set_local(items, ttl)
+
+    def _set_local(self, items, ttl):
+        self.local.set_many(items, ttl=self.local_ttl if ttl is None else min(ttl, self.local_ttl))
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    def delete(self, key):
+        self.shared.delete(key)
+        self.local.delete(key)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+    def stats(self):
+        local, shared = self.local.stats(), self.shared.stats()
+        # Every lookup goes through the local tier; its misses are the shared tier's lookups
+        lookups = local["hits"] + local["misses"]
+        hits = local["hits"] + shared["hits"]
+        return {
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": shared["evictions"],
+            "errors": shared["errors"],
+            "local": local,
+            "shared": shared,
+        }
+
+
+def open_cache(backend, table, ttl=None, max_entries=10000, path=None):
+    """
+    Create a cache backend by name.
+
+    Caches are opened at import time, so a file-backed one that can't be opened (a
+    read-only or missing CACHE_DIR, a file another worker holds locked while creating it)
+    falls back to a MemoryCache with a warning rather than failing the import.
+
+    Args:
+        backend (str): "shared" (SharedCache over SHARED_CACHE_PATH unless `path` is given),
+            "memory", "disk" (SQLite under CACHE_DIR unless `path` is given) or "none"
+        table (str): cache name; also the SQLite table and default file name
+
+    Returns:
+        SharedCache | MemoryCache | SQLiteCache | None
+    """
+    backend = (backend or "none").lower()
+    if backend == "memory":
+        return MemoryCache(ttl=ttl, max_entries=max_entries)
+    if backend == "none":
+        return None
+    if backend not in ("shared", "disk"):
+        raise ValueError(f"Unknown cache backend: {backend}")
+    try:
+        if backend == "shared":
+            shared = SQLiteCache(path or SHARED_CACHE_PATH, table, ttl=ttl, max_entries=max_entries,
+                                 mmap_size=SHARED_CACHE_MMAP_SIZE, busy_timeout=SHARED_CACHE_BUSY_TIMEOUT)
+            return SharedCache(shared, local_entries=min(max_entries, SHARED_CACHE_LOCAL_ENTRIES), local_ttl=SHARED_CACHE_LOCAL_TTL)
+        return SQLiteCache(path or os.path.join(CACHE_DIR, f"{table}.sqlite3"), table, ttl=ttl, max_entries=max_entries)
+    except (OSError, sqlite3.Error) as e:
+        log.warning("Could not open the %s cache %r, keeping it in memory: %s", backend, table, e)
+        return MemoryCache(ttl=ttl, max_entries=max_entries)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one; the others wait for its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+
+class ReadThroughCache:
+    """
+    Cache in front of a loader function.
+
+    Entries are fresh for `ttl` seconds and then served stale for up to `stale_ttl` more
+    while one background load refreshes them. Concurrent misses for the same key share a
+    single load. Loader errors are raised to the caller and never cached.
+
+    Args:
+        backend: MemoryCache or SQLiteCache (or None to disable caching)
+        ttl (float): seconds an entry is fresh
+        stale_ttl (float): extra seconds a stale entry may be served while revalidating
+        should_cache (callable): optional predicate; loaded values it rejects are returned but not stored
+    """
+
+    def __init__(self, backend, ttl, stale_ttl=0, should_cache=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.should_cache = should_cache
+        self.flights = SingleFlight()
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.load_errors = 0
+        self._stats_lock = threading.Lock()
+        self._async_flights = {}
+
+    def get(self, key, load):
+        """Return the cached value for `key`, calling `load()` on a miss."""
+        if self.backend is None:
+            return load()
+        if bypass_reads.get():
+            return self._load(key, load)
+        entry = self.backend.get(key)
+        if entry is not None:
+            if time.time() < entry["fresh_until"]:
+                self._count("fresh_hits")
+                return entry["value"]
+            self._count("stale_hits")
+            if not self.flights.in_flight(key):
+                threading.Thread(target=self._revalidate, args=(key, load), daemon=True).start()
+            return entry["value"]
+        self._count("misses")
+        return self.flights.do(key, lambda: self._load(key, load))
+
+    async def aget(self, key, load):
+        """
+        get() for coroutines: `load` is an async function. Concurrent misses on the same
+        event loop share one load; stale entries are refreshed by a background task. The
+        backend is reached through its aget_many/aset_many, so file I/O stays off the loop.
+        """
+        if self.backend is None:
+            return await load()
+        if bypass_reads.get():
+            value = await load()
+            await self._astore(key, value)
+            return value
+        entry = (await self.backend.aget_many([key])).get(key)
+        if entry is not None:
+            if time.time() < entry["fresh_until"]:
+                self._count("fresh_hits")
+                return entry["value"]
+            self._count("stale_hits")
+            if key not in self._async_flights:
+                self._async_flight(key, load)
+            return entry["value"]
+        self._count("misses")
+        task = self._async_flights.get(key)
+        if task is None:
+            task = self._async_flight(key, load)
+        else:
+            self.flights.coalesced += 1
+        # shield: a cancelled caller mustn't cancel the load other callers are waiting on
+        return await asyncio.shield(task)
+
+    def _async_flight(self, key, load):
+        async def run():
+            try:
+                value = await load()
+            except Exception:
+                self._count("load_errors")
+                raise
+            finally:
+                self._async_flights.pop(key, None)
+            await self._astore(key, value)
+            return value
+
+        task = self._async_flights[key] = asyncio.ensure_future(run())
+        # Background refreshes are never awaited; retrieve their errors so they aren't reported as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    def _load(self, key, load):
+        try:
+            value = load()
+        except Exception:
+            self._count("load_errors")
+            raise
+        self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        if self.should_cache is None or self.should_cache(value):
+            self.backend.set(key, self._entry(value), ttl=self.ttl + self.stale_ttl)
+
+    async def _astore(self, key, value):
+        if self.should_cache is None or self.should_cache(value):
+            await self.backend.aset_many({key: self._entry(value)}, ttl=self.ttl + self.stale_ttl)
+
+    def _entry(self, value):
+        return {"value": value, "fresh_until": time.time() + self.ttl}
+
+    def _revalidate(self, key, load):
+        try:
+            self.flights.do(key, lambda: self._load(key, load))
+        except Exception as e:
+            log.warning("Background refresh failed for %s: %s", key, e)
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {
+                "fresh_hits": self.fresh_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.flights.coalesced,
+                "load_errors": self.load_errors,
+            }
+        if self.backend is not None:
+            stats["backend"] = self.backend.stats()
+        return stats
@@ -0,0 +1,132 @@
+import math
+import numpy as np
+import geo
+from place import PlaceSet
+
+
+def _coords(places):
+    """(indices of places with coordinates, their lats, their lons)."""
+    place_set = PlaceSet(places)
+    located = np.flatnonzero(place_set.located)
+    return located.tolist(), place_set.lats[located], place_set.lons[located]
+
+
+def _capacitated_assign(distances, capacities):
+    """
+    Give each point (column of `distances`) to a cluster (row) without exceeding
+    `capacities`: the closest (point, cluster) pairs are taken first.
+
+    Returns:
+        np.ndarray: cluster of each point
+    """
+    remaining = list(capacities)
+    labels = np.full(distances.shape[1], -1, dtype=np.intp)
+    for flat in np.argsort(distances, axis=None, kind="stable"):
+        cluster, point = divmod(int(flat), distances.shape[1])
+        if labels[point] == -1 and remaining[cluster] > 0:
+            labels[point] = cluster
+            remaining[cluster] -= 1
+    return labels
+
+
+def _sweep(lats, lons, center, capacities):
+    """Initial clusters: sort points by bearing around `center` and cut consecutive runs of each capacity."""
+    angles = np.arctan2(lats - center[0], (lons - center[1]) * math.cos(math.radians(center[0])))
+    order = np.argsort(angles, kind="stable")
+    labels = np.empty(len(order), dtype=np.intp)
+    start = 0
+    for cluster, capacity in enumerate(capacities):
+        labels[order[start:start + capacity]] = cluster
+        start += capacity
+    return labels
+
+
+def assign_to_days(tours, meals, tours_per_day, meals_per_day, center=None, iterations=10):
+    """
+    Split tours and meals into compact daily groups before routing.
+
+    Tours are first swept around `center` (the hotel, usually) into wedges of each day's
+    size; then a capacity-constrained k-means refines the groups, with every day's
+    center pulled by both its tours and its meals. Places without coordinates fill any
+    remaining slots in their original order. Deterministic for a given input.
+
+    Args:
+        tours (list[Place]): tours to schedule, exactly sum(tours_per_day) of them at most
+        meals (list[Place]): meals to schedule, exactly sum(meals_per_day) of them at most
+        tours_per_day (list[int]): how many tours each day takes
+        meals_per_day (list[int]): how many meals each day takes
+        center (tuple): (lat, lon) the days radiate from; defaults to the places' centroid
+
+    Returns:
+        tuple: (tours for each day, meals for each day), lists of lists in day order
+    """
+    days = len(tours_per_day)
+    tour_ids, tour_lats, tour_lons = _coords(tours)
+    meal_ids, meal_lats, meal_lons = _coords(meals)
+    all_lats = np.concatenate([tour_lats, meal_lats])
+    all_lons = np.concatenate([tour_lons, meal_lons])
+    if days == 0 or not len(all_lats):
+        return _fill([[] for _ in range(days)], tours, tours_per_day), _fill([[] for _ in range(days)], meals, meals_per_day)
+    if center is None or center[0] is None or center[1] is None:
+        center = (float(all_lats.mean()), float(all_lons.mean()))
+    center = (float(center[0]), float(center[1]))
+
+    # Seats left for located places once unlocated ones are accounted for
+    tour_caps = _located_capacities(tours_per_day, len(tour_ids))
+    meal_caps = _located_capacities(meals_per_day, len(meal_ids))
+
+    # Start from wedges around the center (meals follow the tours' wedges when there are tours)
+    if len(tour_ids):
+        tour_labels = _sweep(tour_lats, tour_lons, center, tour_caps)
+        centers = _centers(tour_lats, tour_lons, tour_labels, days, center)
+        meal_labels = _capacitated_assign(geo.haversine_miles(centers[:, :1], centers[:, 1:], meal_lats[None, :], meal_lons[None, :]), meal_caps)
+    else:
+        tour_labels = np.empty(0, dtype=np.intp)
+        meal_labels = _sweep(meal_lats, meal_lons, center, meal_caps)
+
+    for _ in range(iterations):
+        centers = _centers(all_lats, all_lons, np.concatenate([tour_labels, meal_labels]), days, center)
+        new_tours = _capacitated_assign(geo.haversine_miles(centers[:, :1], centers[:, 1:], tour_lats[None, :], tour_lons[None, :]), tour_caps)
+        new_meals = _capacitated_assign(geo.haversine_miles(centers[:, :1], centers[:, 1:], meal_lats[None, :], meal_lons[None, :]), meal_caps)
+        if np.array_equal(new_tours, tour_labels) and np.array_equal(new_meals, meal_labels):
+            break
+        tour_labels, meal_labels = new_tours, new_meals
+
+    day_tours = [[] for _ in range(days)]
+    for i, label in zip(tour_ids, tour_labels):
+        day_tours[label].append(tours[i])
+    day_meals = [[] for _ in range(days)]
+    for i, label in zip(meal_ids, meal_labels):
+        day_meals[label].append(meals[i])
+    return _fill(day_tours, tours, tours_per_day), _fill(day_meals, meals, meals_per_day)
+
+
+def _located_capacities(per_day, located):
+    """Trim per-day capacities (from the last day back) so they add up to the located places."""
+    caps = list(per_day)
+    excess = sum(caps) - located
+    for day in reversed(range(len(caps))):
+        if excess <= 0:
+            break
+        cut = min(caps[day], excess)
+        caps[day] -= cut
+        excess -= cut
+    return caps
+
+
+def _centers(lats, lons, labels, days, fallback):
+    centers = np.empty((days, 2))
+    for day in range(days):
+        mask = labels == day
+        centers[day] = (lats[mask].mean(), lons[mask].mean()) if mask.any() else fallback
+    return centers
+
+
+def _fill(day_places, places, per_day):
+    """Add the places without coordinates to the days that still have room."""
+    assigned = set(id(place) for day in day_places for place in day)
+    leftover = [place for place in places if id(place) not in assigned]
+    for day, capacity in enumerate(per_day):
+        while leftover and len(day_places[day]) < capacity:
+            day_places[day].append(leftover.pop(0))
+    return day_places
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+
+
+class Throttled(RuntimeError):
+    """A provider answered 429 Too Many Requests."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _wait(cancelled, seconds):
+    """Sleep for `seconds`; return False early if `cancelled` (a threading.Event) gets set."""
+    if cancelled is None:
+        time.sleep(seconds)
+        return True
+    return not cancelled.wait(seconds)
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit for one provider that adapts to how the provider is coping (AIMD).
+
+    Every call that finishes faster than `target_latency` grows the limit by about one
+    slot per limit's worth of calls; a slow call shrinks it by 10% and a 429 halves it.
+    The limit is shared by all requests, so a struggling provider is backed off globally.
+
+    Args:
+        initial (int): starting number of concurrent calls
+        minimum (int): never go below this many
+        maximum (int): never go above this many
+        target_latency (float): seconds; slower calls count as congestion
+    """
+
+    def __init__(self, initial, minimum, maximum, target_latency):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.throttled = 0
+        self.slow = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self):
+        """Take a slot if one is free; never waits."""
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        """Wait for a free slot."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self, poll=0.01):
+        """Wait for a free slot without blocking the event loop."""
+        while not self.try_acquire():
+            await asyncio.sleep(poll)
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def observe(self, latency, throttled=False):
+        """Adjust the limit from one call's outcome."""
+        with self._cond:
+            if throttled:
+                self.throttled += 1
+                self.limit = max(self.minimum, self.limit / 2)
+            elif latency > self.target_latency:
+                self.slow += 1
+                self.limit = max(self.minimum, self.limit * 0.9)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            # A grown limit may admit waiting callers
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "slow": self.slow,
+            }
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` calls per second on average, in bursts of up to `burst`.
+
+    pause() blocks every caller for a while, e.g. to honour a Retry-After header.
+    A rate of 0 disables the limiter.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cancelled=None):
+        """Take one token, waiting as needed. Returns False if `cancelled` is set while waiting."""
+        if not self.rate:
+            return True
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if not _wait(cancelled, wait):
+                return False
+
+    def _take(self):
+        """Take a token if one is available; otherwise return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return max(self.paused_until - now, (1 - self.tokens) / self.rate)
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits with asyncio.sleep (cancellation just cancels the wait)."""
+        if not self.rate:
+            return
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
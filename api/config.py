@@ -9,5 +9,114 @@ AMADEUS_CLIENT_ID = os.getenv('AMADEUS_CLIENT_ID')
 AMADEUS_CLIENT_SECRET = os.getenv('AMADEUS_CLIENT_SECRET')
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
+# Amadeus OAuth token reuse (seconds before expiry)
+AMADEUS_TOKEN_REFRESH_MARGIN = float(os.getenv('AMADEUS_TOKEN_REFRESH_MARGIN', 60))
+AMADEUS_TOKEN_EARLY_REFRESH = float(os.getenv('AMADEUS_TOKEN_EARLY_REFRESH', 300))
+# Where workers share the token (a cache backend; none = each worker fetches its own).
+# Off by default: "shared" or "disk" saves one token fetch per worker, but keeps the
+# bearer token in plaintext in the cache file (created readable by its owner only)
+AMADEUS_TOKEN_CACHE_BACKEND = os.getenv('AMADEUS_TOKEN_CACHE_BACKEND', 'none')
+
+# Outbound HTTP connection pools and timeouts (seconds)
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+# The async path keeps many requests on one event loop, so it allows more connections per host
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv('HTTP_ASYNC_MAX_CONNECTIONS', 100))
+# ...but keeps only a few idle: httpx scans every pooled connection per queued request
+HTTP_ASYNC_MAX_KEEPALIVE = int(os.getenv('HTTP_ASYNC_MAX_KEEPALIVE', 20))
+
+# /api/submit provider fan-out
+SEARCH_MAX_CONCURRENCY = int(os.getenv('SEARCH_MAX_CONCURRENCY', 8))
+SUBMIT_DEADLINE_SECONDS = float(os.getenv('SUBMIT_DEADLINE_SECONDS', 25))
+
+# Per-day route optimization worker processes (1 = optimize inline)
+OPTIMIZER_WORKERS = int(os.getenv('OPTIMIZER_WORKERS', min(4, os.cpu_count() or 1)))
+# Per-day search: seeded multi-start restarts (the budget that decides the route), and a
+# wall-clock limit in seconds that only cuts short a search a badly overloaded host stalls
+OPTIMIZER_MAX_STARTS = int(os.getenv('OPTIMIZER_MAX_STARTS', 10))
+OPTIMIZER_TIME_BUDGET = float(os.getenv('OPTIMIZER_TIME_BUDGET', 1.0))
+# Days with at most this many stops (hotel included) are solved exactly; keep it around 12
+OPTIMIZER_EXACT_MAX_STOPS = int(os.getenv('OPTIMIZER_EXACT_MAX_STOPS', 12))
+
+# Local cache files
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+# The "shared" cache backend: one SQLite file that every worker process on the host maps
+# into memory (one table per cache), fronted in each worker by a small LRU whose entries
+# live at most SHARED_CACHE_LOCAL_TTL seconds. A worker waits at most
+# SHARED_CACHE_BUSY_TIMEOUT seconds for another's lock before treating the file as a miss.
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(CACHE_DIR, 'shared.sqlite3'))
+SHARED_CACHE_LOCAL_ENTRIES = int(os.getenv('SHARED_CACHE_LOCAL_ENTRIES', 1000))
+SHARED_CACHE_LOCAL_TTL = float(os.getenv('SHARED_CACHE_LOCAL_TTL', 30))
+SHARED_CACHE_MMAP_SIZE = int(os.getenv('SHARED_CACHE_MMAP_SIZE', 64 * 1024 * 1024))
+SHARED_CACHE_BUSY_TIMEOUT = float(os.getenv('SHARED_CACHE_BUSY_TIMEOUT', 0.2))
+
+# Persistent travel-time cache (empty path disables it); grid is in degrees, 0 = exact coordinates
+TRAVEL_CACHE_PATH = os.getenv('TRAVEL_CACHE_PATH', os.path.join(CACHE_DIR, 'travel_times.sqlite3'))
+TRAVEL_CACHE_TTL = float(os.getenv('TRAVEL_CACHE_TTL', 7 * 24 * 3600))
+TRAVEL_CACHE_MAX_ENTRIES = int(os.getenv('TRAVEL_CACHE_MAX_ENTRIES', 200000))
+TRAVEL_CACHE_GRID = float(os.getenv('TRAVEL_CACHE_GRID', 0.0005))
+
+# Foursquare search result cache: backend is shared, memory, disk or none; grid in degrees, radius step in meters
+SEARCH_CACHE_BACKEND = os.getenv('SEARCH_CACHE_BACKEND', 'shared')
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', 24 * 3600))
+SEARCH_CACHE_STALE_TTL = float(os.getenv('SEARCH_CACHE_STALE_TTL', 6 * 3600))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 5000))
+SEARCH_CACHE_GRID = float(os.getenv('SEARCH_CACHE_GRID', 0.001))
+SEARCH_CACHE_RADIUS_STEP = float(os.getenv('SEARCH_CACHE_RADIUS_STEP', 250))
+
+# Geocoding cache (forward and reverse), persisted in the shared tier by default
+GEOCODE_CACHE_BACKEND = os.getenv('GEOCODE_CACHE_BACKEND', 'shared')
+GEOCODE_CACHE_TTL = float(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', 50000))
+
+# Amadeus hotel-offer batches: hotels per request, adaptive concurrency bounds and the
+# provider-wide rate limit (requests per second; the test environment allows 10)
+AMADEUS_OFFERS_BATCH_SIZE = int(os.getenv('AMADEUS_OFFERS_BATCH_SIZE', 5))
+AMADEUS_INITIAL_CONCURRENCY = int(os.getenv('AMADEUS_INITIAL_CONCURRENCY', 5))
+AMADEUS_MIN_CONCURRENCY = int(os.getenv('AMADEUS_MIN_CONCURRENCY', 1))
+AMADEUS_MAX_CONCURRENCY = int(os.getenv('AMADEUS_MAX_CONCURRENCY', 10))
+AMADEUS_TARGET_LATENCY = float(os.getenv('AMADEUS_TARGET_LATENCY', 3.0))
+AMADEUS_RATE_LIMIT = float(os.getenv('AMADEUS_RATE_LIMIT', 10))
+AMADEUS_MAX_RETRIES = int(os.getenv('AMADEUS_MAX_RETRIES', 2))
+
+# Amadeus hotel caches: hotel lists per area (grid in degrees) and short-lived offers
+HOTEL_CACHE_BACKEND = os.getenv('HOTEL_CACHE_BACKEND', 'shared')
+HOTEL_CACHE_GRID = float(os.getenv('HOTEL_CACHE_GRID', 0.001))
+HOTEL_CACHE_MAX_ENTRIES = int(os.getenv('HOTEL_CACHE_MAX_ENTRIES', 20000))
+HOTEL_LIST_CACHE_TTL = float(os.getenv('HOTEL_LIST_CACHE_TTL', 7 * 24 * 3600))
+HOTEL_OFFER_CACHE_TTL = float(os.getenv('HOTEL_OFFER_CACHE_TTL', 15 * 60))
+
+# Finished /api/submit plans, keyed by a normalized request fingerprint; grid in degrees
+PLAN_CACHE_BACKEND = os.getenv('PLAN_CACHE_BACKEND', 'shared')
+PLAN_CACHE_TTL = float(os.getenv('PLAN_CACHE_TTL', 3600))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv('PLAN_CACHE_MAX_ENTRIES', 1000))
+PLAN_CACHE_GRID = float(os.getenv('PLAN_CACHE_GRID', 0.001))
+
+# Send a Server-Timing header with per-stage timings on every API response
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+
+# Opt-in request profiling (profiling.py): every /api/submit and /api/search-hotels
+# request when PROFILE_REQUESTS is set, else only those sending X-Profile: <PROFILE_TOKEN>
+# (never, without a token). Captures go to PROFILE_DIR; stacks are sampled every
+# PROFILE_INTERVAL_MS.
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(CACHE_DIR, 'profiles'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+
+# Logging: level, 'text' or 'json' lines, the most records queued for the writer
+# thread before new ones are dropped, and the fraction of DEBUG records kept
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
+
+# Provider endpoints (overridable to point at stand-ins for load tests)
+AMADEUS_BASE_URL = os.getenv('AMADEUS_BASE_URL', 'https://test.api.amadeus.com')
+FOURSQUARE_BASE_URL = os.getenv('FOURSQUARE_BASE_URL', 'https://places-api.foursquare.com')
+GOOGLE_MAPS_BASE_URL = os.getenv('GOOGLE_MAPS_BASE_URL', 'https://maps.googleapis.com')
+
 # For backward compatibility
 ROUTES_API_KEY = GOOGLE_MAPS_API_KEY
\ No newline at end of file
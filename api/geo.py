@@ -0,0 +1,153 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_MILES = 3959
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+
+
+def haversine_miles(lat, lon, lats, lons):
+    """
+    Great-circle distance in miles from (lat, lon) to every point of `lats`/`lons`.
+
+    All arguments may be scalars or arrays (they broadcast), so one call measures a
+    whole batch of places without a Python loop.
+    """
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def within_radius(lat, lon, lats, lons, radius_miles):
+    """Boolean mask of the points within `radius_miles` of (lat, lon)."""
+    return haversine_miles(lat, lon, lats, lons) <= radius_miles
+
+
+def cell(lat, lon, cell_degrees):
+    """The (row, col) cell of a grid of `cell_degrees` containing a point."""
+    return math.floor(lat / cell_degrees), math.floor(lon / cell_degrees)
+
+
+def region_key(lat, lon, cell_degrees):
+    """
+    Cache key of the grid cell containing a point ("row,col"), the cell a PlaceIndex of
+    the same `cell_degrees` buckets it in; exact coordinates when cell_degrees is 0.
+    """
+    if not cell_degrees:
+        return f"{float(lat):.6f},{float(lon):.6f}"
+    row, col = cell(float(lat), float(lon), cell_degrees)
+    return f"{row},{col}"
+
+
+def snap(value, grid):
+    """Snap a coordinate to a grid of `grid` degrees (no-op when grid is 0), e.g. for request fingerprints."""
+    return round(round(float(value) / grid) * grid, 6) if grid else float(value)
+
+
+class PlaceIndex:
+    """
+    Grid-bucket spatial index over places from any provider.
+
+    Places (anything with .lat/.lon, or explicit coordinates) are bucketed into cells of
+    `cell_degrees`; a query only measures the places in the cells overlapping its
+    bounding box, with one vectorized haversine over those candidates.
+
+    Args:
+        cell_degrees (float): cell size; ~0.01 degrees is about 0.7 miles
+    """
+
+    def __init__(self, cell_degrees=0.01):
+        self.cell_degrees = cell_degrees
+        self.items = []
+        self.buckets = {}
+        self._lats = []
+        self._lons = []
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def cell(self, lat, lon):
+        """The (row, col) grid cell containing a point (see region_key())."""
+        return cell(lat, lon, self.cell_degrees)
+
+    def add(self, item, lat=None, lon=None):
+        """Index `item` at (lat, lon), defaulting to item.lat/item.lon. Items without coordinates are skipped."""
+        lat = getattr(item, "lat", None) if lat is None else lat
+        lon = getattr(item, "lon", None) if lon is None else lon
+        if lat is None or lon is None:
+            return False
+        lat, lon = float(lat), float(lon)
+        self.buckets.setdefault(self.cell(lat, lon), []).append(len(self.items))
+        self.items.append(item)
+        self._lats.append(lat)
+        self._lons.append(lon)
+        self._arrays = None
+        return True
+
+    def add_all(self, items):
+        for item in items:
+            self.add(item)
+        return self
+
+    def _coords(self):
+        if self._arrays is None:
+            self._arrays = (np.array(self._lats, dtype=float), np.array(self._lons, dtype=float))
+        return self._arrays
+
+    def _candidates(self, lat, lon, radius_miles):
+        """Ids of the places in the cells overlapping the query's bounding box."""
+        dlat = radius_miles / MILES_PER_DEGREE
+        cos_lat = math.cos(math.radians(lat))
+        dlon = radius_miles / (MILES_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+        row0, col0 = self.cell(lat - dlat, lon - min(dlon, 180.0))
+        row1, col1 = self.cell(lat + dlat, lon + min(dlon, 180.0))
+        if dlon >= 180.0 or (row1 - row0 + 1) * (col1 - col0 + 1) > len(self.buckets):
+            # Big box: cheaper to walk the occupied cells than the box's cells
+            ids = [i for (row, col), bucket in self.buckets.items()
+                   if row0 <= row <= row1 and (dlon >= 180.0 or col0 <= col <= col1) for i in bucket]
+        else:
+            ids = [i for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)
+                   for i in self.buckets.get((row, col), ())]
+        return np.array(sorted(ids), dtype=np.intp)
+
+    def within(self, lat, lon, radius_miles):
+        """Places within `radius_miles` of (lat, lon), in the order they were added."""
+        ids = self._candidates(lat, lon, radius_miles)
+        if not len(ids):
+            return []
+        lats, lons = self._coords()
+        ids = ids[haversine_miles(lat, lon, lats[ids], lons[ids]) <= radius_miles]
+        return [self.items[i] for i in ids]
+
+    def nearest(self, lat, lon, k=1, max_miles=None):
+        """
+        The `k` places closest to (lat, lon) (optionally only those within `max_miles`).
+
+        Returns:
+            list[tuple]: (place, miles), nearest first
+        """
+        if not self.items or k <= 0:
+            return []
+        lats, lons = self._coords()
+        if len(self.items) <= 256:
+            # Measuring everything at once beats walking cells for small indexes
+            distances = haversine_miles(lat, lon, lats, lons)
+            order = [i for i in np.argsort(distances, kind="stable")[:k] if max_miles is None or distances[i] <= max_miles]
+            return [(self.items[i], float(distances[i])) for i in order]
+        radius = self.cell_degrees * MILES_PER_DEGREE
+        while True:
+            if max_miles is not None:
+                radius = min(radius, max_miles)
+            ids = self._candidates(lat, lon, radius)
+            distances = haversine_miles(lat, lon, lats[ids], lons[ids])
+            inside = distances <= radius
+            # Done once k places are inside the circle (nothing outside it can be closer)
+            if inside.sum() >= k or len(ids) == len(self.items) or radius == max_miles:
+                ids, distances = ids[inside], distances[inside]
+                if len(ids) < k and max_miles is None:
+                    ids = np.arange(len(self.items))
+                    distances = haversine_miles(lat, lon, lats, lons)
+                order = np.argsort(distances, kind="stable")[:k]
+                return [(self.items[ids[i]], float(distances[i])) for i in order]
+            radius *= 2
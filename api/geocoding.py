@@ -0,0 +1,66 @@
+import re
+from http_client import get_gmaps_client
+from cache import ReadThroughCache, open_cache
+from config import GEOCODE_CACHE_BACKEND, GEOCODE_CACHE_TTL, GEOCODE_CACHE_MAX_ENTRIES
+import pipeline
+import metrics
+
+# Forward (address -> coordinates) and reverse (coordinates -> address) results.
+# Empty results are cached too, so unknown addresses aren't looked up on every request.
+geocode_cache = ReadThroughCache(
+    open_cache(GEOCODE_CACHE_BACKEND, "geocodes", max_entries=GEOCODE_CACHE_MAX_ENTRIES),
+    ttl=GEOCODE_CACHE_TTL,
+)
+
+
+def normalize_address(address):
+    """Lower-case, collapse whitespace and drop stray punctuation so equivalent addresses share a key."""
+    text = re.sub(r"\s+", " ", str(address).lower()).strip()
+    text = re.sub(r"\s*,\s*", ", ", text)
+    return text.strip(" ,.")
+
+
+def geocode(address):
+    """
+    Resolve an address to coordinates.
+
+    Returns:
+        dict | None: {'lat', 'lng', 'formatted_address'}, or None if Google found nothing
+    """
+    def load():
+        with metrics.span("geocode"):
+            results = get_gmaps_client().geocode(address)
+        if not results:
+            return None
+        location = results[0]['geometry']['location']
+        return {
+            'lat': location['lat'],
+            'lng': location['lng'],
+            'formatted_address': results[0].get('formatted_address'),
+        }
+
+    return geocode_cache.get("fwd|" + normalize_address(address), load)
+
+
+def reverse_geocode(lat, lon):
+    """Resolve coordinates (rounded to ~1 m) to a formatted address, or None."""
+    lat, lon = round(float(lat), 5), round(float(lon), 5)
+
+    def load():
+        with metrics.span("reverse_geocode"):
+            results = get_gmaps_client().reverse_geocode((lat, lon))
+        return results[0]['formatted_address'] if results else None
+
+    return geocode_cache.get(f"rev|{lat:.5f},{lon:.5f}", load)
+
+
+def fill_locations(places, deadline=None):
+    """
+    Fill in coordinates/addresses for many Place objects at once.
+
+    Lookups run concurrently; identical addresses share one lookup. A place whose
+    lookup fails or misses the deadline is left as it was.
+    """
+    places = [place for place in places if place is not None]
+    pipeline.run_concurrently([place.fill_location for place in places], deadline=deadline)
+    return places
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+import urllib.parse
+import requests
+import googlemaps
+from requests.adapters import HTTPAdapter
+from config import HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, ROUTES_API_KEY, GOOGLE_MAPS_BASE_URL
+from config import HTTP_ASYNC_MAX_CONNECTIONS, HTTP_ASYNC_MAX_KEEPALIVE
+import metrics
+import profiling
+
+try:
+    import httpx
+except ImportError:  # only needed by the async (ASGI) path
+    httpx = None
+
+# One keep-alive session (and so one connection pool) per provider host
+_sessions = {}
+_lock = threading.Lock()
+_gmaps = None
+
+# Async clients, one per (event loop, host); an httpx client can't be shared across loops
+_async_clients = {}
+
+# Provider label for the metrics, by path prefix (hosts can be shared by stand-ins)
+_PROVIDER_PATHS = (("/maps/api/", "google"), ("/places/", "foursquare"), ("/v1/", "amadeus"), ("/v2/", "amadeus"), ("/v3/", "amadeus"))
+
+
+def _observe(url, status, seconds):
+    parts = urllib.parse.urlsplit(str(url))
+    provider = next((name for prefix, name in _PROVIDER_PATHS if parts.path.startswith(prefix)), parts.netloc)
+    metrics.provider_call(provider, parts.path, status, seconds)
+
+
+def _observe_response(response, *args, **kwargs):
+    # Response hook on every pooled session, so googlemaps' calls are counted (and captured) too
+    _observe(response.url, response.status_code, response.elapsed.total_seconds())
+    if profiling.active():
+        profiling.record_response(response.request.method, response.url, response.status_code,
+                                  response.headers, response.content, response.elapsed.total_seconds())
+
+
+def session_for(url):
+    """Return the shared requests.Session for the host of `url`, creating it on first use."""
+    host = urllib.parse.urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.hooks["response"].append(_observe_response)
+            _sessions[host] = session
+    return session
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Send a request through the pooled session for the url's host.
+
+    Args:
+        method (str): HTTP method
+        url (str): full request url
+        timeout (float | tuple): overrides the default (connect, read) timeout
+
+    Returns:
+        requests.Response
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    started = time.perf_counter()
+    try:
+        return session_for(url).request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException as e:
+        _observe(url, "error", time.perf_counter() - started)
+        profiling.record_error(method, url, e)
+        raise
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def close_all():
+    """Close every pooled session (their connections are reopened on next use)."""
+    global _gmaps
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _gmaps = None
+
+
+def get_gmaps_client():
+    """Return the process-wide googlemaps.Client (on the pooled Google session), creating it on first use."""
+    global _gmaps
+    if _gmaps is None:
+        session = session_for(GOOGLE_MAPS_BASE_URL)
+        with _lock:
+            if _gmaps is None:
+                _gmaps = googlemaps.Client(
+                    key=ROUTES_API_KEY,
+                    connect_timeout=HTTP_CONNECT_TIMEOUT,
+                    read_timeout=HTTP_READ_TIMEOUT,
+                    requests_session=session,
+                    base_url=GOOGLE_MAPS_BASE_URL,
+                )
+    return _gmaps
+
+
+def async_client_for(url):
+    """Return the httpx.AsyncClient for the url's host on the running event loop, creating it on first use."""
+    if httpx is None:
+        raise RuntimeError("The async path needs httpx (pip install httpx)")
+    key = (id(asyncio.get_running_loop()), urllib.parse.urlsplit(url).netloc)
+    client = _async_clients.get(key)
+    if client is None:
+        client = _async_clients[key] = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_ASYNC_MAX_CONNECTIONS, max_keepalive_connections=HTTP_ASYNC_MAX_KEEPALIVE),
+        )
+    return client
+
+
+async def arequest(method, url, timeout=None, **kwargs):
+    """
+    Async counterpart of request(): send a request through the pooled httpx client for
+    the url's host. The response has the same status_code/json()/text/url/headers.
+    """
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    started = time.perf_counter()
+    try:
+        response = await async_client_for(url).request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        _observe(url, "error", time.perf_counter() - started)
+        profiling.record_error(method, url, e)
+        raise
+    seconds = time.perf_counter() - started
+    _observe(response.url, response.status_code, seconds)
+    if profiling.active():
+        profiling.record_response(method, response.url, response.status_code, response.headers, response.content, seconds)
+    return response
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url, **kwargs):
+    return await arequest("POST", url, **kwargs)
+
+
+async def aclose_all():
+    """Close the running loop's async clients."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _async_clients if key[0] == loop_id]:
+        await _async_clients.pop(key).aclose()
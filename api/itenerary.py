@@ -1,9 +1,20 @@
 import math
 import random
-import googlemaps
+import threading
+import multiprocessing
+import concurrent.futures
+import logging
+import numpy as np
 from functools import  lru_cache
 from place import PlaceType
-from config import ROUTES_API_KEY
+from config import OPTIMIZER_WORKERS, OPTIMIZER_TIME_BUDGET, OPTIMIZER_MAX_STARTS, OPTIMIZER_EXACT_MAX_STOPS
+from http_client import get_gmaps_client
+from travel_matrix import TravelTimeMatrix
+from routing import optimize_route, tour_cost, adjacency_violations
+
+log = logging.getLogger(__name__)
+
+UNREACHABLE_SECONDS = 10 ** 9
 
 
 class Itinerary:
@@ -17,105 +28,153 @@ class Itinerary:
         self.final = []
         self.restarts = 0
         self.path = []
-        self.gmaps = googlemaps.Client(key=ROUTES_API_KEY)
+        self.rng = random.Random()
         self.mode = "transit"
         self.cache = {}
-        self.distance_matrix = {}
+        self.distance_matrix = None
+        self.matrix_places = []
+        self._rows = None
+
+    @property
+    def gmaps(self):
+        return get_gmaps_client()
 
     def add_place(self, place):
         """Add a place to the itinerary."""
         self.places.append(place)
 
+    def rows_of(self, places):
+        """Matrix row of each place; rows are assigned per place, so equal locations never collide."""
+        if self._rows is None:
+            self._rows = {id(place): i for i, place in enumerate(self.matrix_places)}
+        return np.array([self._rows[id(place)] for place in places], dtype=np.intp)
+
     def distance_between(self, place1, place2):
-        """Calculate the travel duration between two places using Google Maps API, with caching."""
-        return self.distance_matrix[place1.location][place2.location]
+        """Look up the travel duration between two places in this day's distance matrix."""
+        i, j = self.rows_of([place1, place2])
+        return float(self.distance_matrix[i, j])
+
+    def has_distance_matrix(self):
+        return self.distance_matrix is not None
 
 
     def random_path(self, places):
         """Generate a random path (random TSP initialization)."""
         places = places[:]
-        random.shuffle(places)
+        self.rng.shuffle(places)
         return places
 
     def cost_of(self, places):
-        """Calculate the total distance of a path."""
-        total_distance = 0.0
-        for i in range(len(places) - 1):
-            total_distance += self.distance_between(places[i], places[i + 1])
-        # Add the distance back to the starting point to complete the tour
-        total_distance += self.distance_between(places[-1], places[0])
-        return total_distance
-
-
-    def create_distance_matrix(self):
-        destinations = []
-        for place in self.places:
-            destinations.append(place.location)
-        matrix = self.gmaps.distance_matrix(destinations, destinations, mode=self.mode)
-        i = 0
-        for row in matrix['rows']:
-            j = 0
-            distance_matrix = {}
-            for element in row['elements']:
-                if element['status'] == 'OK':
-                    duration_value = element['duration']['value']
-                else:
-                    duration_value = math.inf
-                
-                # Set distance to a large penalty if two places have the same type to bias against adjacent placement
-                if i != j and self.places[i].type == self.places[j].type and self.places[i].type == PlaceType.FOOD:
-                    duration_value += 1000000  
-        
-                
-                distance_matrix[destinations[j]] = duration_value
-                j += 1
-            self.distance_matrix[destinations[i]] = distance_matrix
-            i += 1
-
-
-    def execute_step(self):
-        """Perform a local search to improve the places."""
-        if improve(self.places, self) > 0.1:
-            return False
-        # Accept final schedule if it improves the cost
-        if self.cost_of(self.places) < self.optimal:
-            self.optimal = self.cost_of(self.places)
-            self.final = list(self.places)
-            print(f"New optimal found: {self.optimal} seconds")
-            print("Final itinerary:")
-            for p in self.final:
-                print(f" - {p}")
-        while self.restarts < 10:
-            self.restarts += 1
-            self.places = self.random_path(self.places)
-            return False
-        return True
-
-
-def improve(places, solver):
-    improvement = 0.0
-    for i in range(len(places) - 1):
-        for j in range(i + 1, len(places)):
-            current_distance = (
-                solver.distance_between(places[i], places[i + 1]) +
-                solver.distance_between(places[j], places[(j + 1) % len(places)])
-            )
-            new_distance = (
-                solver.distance_between(places[i], places[j]) +
-                solver.distance_between(places[i + 1], places[(j + 1) % len(places)])
-            )
-            local_distance = current_distance - new_distance
-            if local_distance > 0:
-                places = swap(places, i, j)
-                improvement += local_distance
-    return improvement
-
-
-def swap(places, i, j):
-    if i > j:
-        return places
-    temp = list(places[i + 1:j + 1])
-    temp.reverse()
-    new_path = places[:i + 1] + temp + places[j + 1:]
-    places[:] = new_path
-    return places
+        """Calculate the total distance of a path, including the leg back to the start."""
+        return float(tour_cost(self.distance_matrix, self.rows_of(places)))
+
+
+    def create_distance_matrix(self, trip_matrix=None):
+        """Build this day's dense matrix from a trip-wide matrix, fetching a single-day matrix if none is given."""
+        locations = [place.location_key for place in self.places]
+        if trip_matrix is None:
+            trip_matrix = TravelTimeMatrix(self.mode)
+            trip_matrix.add_group(locations)
+            trip_matrix.fetch(client=self.gmaps)
+        durations = trip_matrix.submatrix(locations)
+        if np.isnan(durations).any():
+            self.distance_matrix = None
+            return
+        # Unreachable legs get a large finite cost so move deltas stay well defined
+        durations = np.where(np.isinf(durations), UNREACHABLE_SECONDS, durations)
+        self.distance_matrix = np.ascontiguousarray(durations, dtype=np.float64)
+        self.matrix_places = list(self.places)
+        self._rows = None
+
+    def __getstate__(self):
+        # Row lookup is keyed by object id, so rebuild it after pickling
+        state = self.__dict__.copy()
+        state['_rows'] = None
+        return state
+
+    def optimize(self, time_budget=OPTIMIZER_TIME_BUDGET, max_starts=OPTIMIZER_MAX_STARTS):
+        """
+        Optimize the visiting order with the hotel (if any) as a fixed first stop.
+
+        Two food stops in a row count as a rule violation, kept apart from the travel
+        time: the route with the fewest violations wins, then the shortest. Small days
+        are solved exactly; larger ones start local search from the current order, so
+        the result is never worse than it, and shuffle restarts with this itinerary's
+        `rng`. Returns the routing.RouteResult.
+        """
+        depot = next((i for i, place in enumerate(self.places) if place.type == PlaceType.HOTEL), 0)
+        start = self.places[depot:] + self.places[:depot]
+        food = [place.type == PlaceType.FOOD for place in self.matrix_places]
+        result = optimize_route(
+            self.distance_matrix,
+            self.rows_of(start),
+            rng=self.rng,
+            violations=adjacency_violations(food),
+            flags=food,
+            time_budget=time_budget,
+            max_starts=max_starts,
+            exact_max=OPTIMIZER_EXACT_MAX_STOPS,
+        )
+        self.places = [self.matrix_places[k] for k in result.order]
+        self.final = list(self.places)
+        self.optimal = result.cost
+        self.restarts = result.starts - 1
+        return result
+
+
+def _optimize_order(itinerary):
+    """Worker entry point: optimize a day and return the new order as indices into its original places."""
+    positions = {id(place): i for i, place in enumerate(itinerary.places)}
+    try:
+        result = itinerary.optimize()
+    except Exception as e:
+        # Keep the unoptimized schedule if optimization fails
+        log.warning("Error during optimization: %s", e)
+        return list(range(len(positions))), None
+    return [positions[id(place)] for place in itinerary.places], result
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # forkserver avoids forking a multi-threaded server process
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = concurrent.futures.ProcessPoolExecutor(max_workers=OPTIMIZER_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def optimize_all(itineraries):
+    """
+    Optimize several days at once in the optimizer worker pool.
+
+    Each itinerary must already have its distance matrix and its own seeded `rng`, so
+    the result does not depend on which worker runs which day. Itineraries are
+    reordered in place and returned in the order given.
+
+    Returns:
+        list: for each itinerary, its routing.RouteResult, or None if optimization failed
+    """
+    originals = [list(it.places) for it in itineraries]
+    if OPTIMIZER_WORKERS > 1 and len(itineraries) > 1:
+        try:
+            outcomes = list(_get_pool().map(_optimize_order, itineraries))
+        except Exception as e:
+            log.warning("Optimizer pool unavailable, optimizing inline: %s", e)
+            outcomes = [_optimize_order(it) for it in itineraries]
+    else:
+        outcomes = [_optimize_order(it) for it in itineraries]
+
+    results = []
+    for itinerary, places, (order, result) in zip(itineraries, originals, outcomes):
+        itinerary.places = [places[i] for i in order]
+        itinerary.final = list(itinerary.places)
+        if result is not None:
+            itinerary.optimal = result.cost
+        results.append(result)
+    return results
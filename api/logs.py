@@ -0,0 +1,149 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_DEBUG_SAMPLE_RATE
+
+# Correlation id of the request being handled; worker threads inherit it the same way
+# they inherit the metrics trace (see pipeline.run_concurrently)
+request_id = contextvars.ContextVar("request_id", default="-")
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# LogRecord attributes that aren't structured fields passed with extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id", "asctime"}
+
+_listener = None
+_handler = None
+
+
+def new_request_id(incoming=None):
+    """The caller's X-Request-ID when it looks sane, else a fresh id."""
+    if incoming and _VALID_REQUEST_ID.match(incoming):
+        return incoming
+    return uuid.uuid4().hex[:16]
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """Plain lines with the request id, and any extra= fields as key=value after the message."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value!r}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _ContextFilter(logging.Filter):
+    """Runs in the caller's thread, before queueing: stamps the request id and samples DEBUG records."""
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1 and random.random() >= LOG_DEBUG_SAMPLE_RATE:
+            return False
+        record.request_id = request_id.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without blocking: when the queue is full the
+    record is dropped (and counted) rather than stalling the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback here (arguments may change after we return),
+        # but keep the record's extra fields for the JSON formatter
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: the stop sentinel mustn't be dropped like a record would be
+        self.queue.put(self._sentinel)
+
+
+def setup():
+    """
+    Route all logging through a bounded queue to one writer thread (stdout), at LOG_LEVEL,
+    as JSON lines or text (LOG_FORMAT). Safe to call more than once.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = _QueueHandler(log_queue)
+    _handler.addFilter(_ContextFilter())
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    if root.getEffectiveLevel() > logging.DEBUG:
+        # httpx logs every provider call at INFO; those are counted in metrics instead
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    _listener = _QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread."""
+    global _listener, _handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _listener.stop()
+    _listener = _handler = None
+
+
+def dropped():
+    """Records dropped because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
@@ -0,0 +1,173 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+# Prometheus' default latency buckets (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _label_key(labels):
+    # Values as text, so a label that is sometimes a number and sometimes not (status 200
+    # or "error") still sorts, and 200 and "200" are one series
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def render(self):
+        with self.lock:
+            return [f"{self.name}{_label_text(labels)} {value}" for labels, value in sorted(self.values.items())]
+
+
+class Histogram:
+    """Observation counts per bucket (cumulative, as Prometheus expects) plus sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for labels, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_text(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(labels)} {total}")
+                lines.append(f"{self.name}_count{_label_text(labels)} {cumulative}")
+        return lines
+
+
+def _register(metric):
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def counter(name, help_text):
+    """Return the process-wide counter `name`, creating it on first use."""
+    return _register(Counter(name, help_text))
+
+
+def histogram(name, help_text, buckets=BUCKETS):
+    """Return the process-wide histogram `name`, creating it on first use."""
+    return _register(Histogram(name, help_text, buckets))
+
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = histogram("tripplanner_http_request_duration_seconds", "API request latency by route and status")
+STAGE_SECONDS = histogram("tripplanner_stage_duration_seconds", "Time spent in each stage of a request")
+PROVIDER_REQUESTS = counter("tripplanner_provider_requests_total", "Calls to external providers by endpoint and status")
+PROVIDER_SECONDS = histogram("tripplanner_provider_request_duration_seconds", "External provider call latency")
+MATRIX_ELEMENTS = counter("tripplanner_matrix_elements_total", "Distance Matrix elements requested from Google")
+MATRIX_CACHED = counter("tripplanner_matrix_cached_elements_total", "Distance Matrix elements served from the travel-time cache")
+
+
+class Trace:
+    """Stage timings of one request, summed per stage, for the Server-Timing header."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def server_timing(self):
+        """Server-Timing header value: one entry per stage (summed over its calls) plus the total."""
+        with self.lock:
+            stages = sorted(self.stages.items())
+        entries = [f'{stage};dur={total * 1000:.1f};desc="{count}x"' for stage, (total, count) in stages]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# The running request's trace. Worker threads see it when started through
+# contextvars.copy_context() (pipeline.run_concurrently does this; asyncio does it itself).
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace():
+    """Begin tracing the current request; returns (trace, token for end_trace)."""
+    trace = Trace()
+    return trace, _trace.set(trace)
+
+
+def end_trace(token):
+    _trace.reset(token)
+
+
+def record(stage, seconds):
+    """Record a stage that was timed elsewhere (e.g. in a worker process)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time the enclosed block as one call of `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def provider_call(provider, endpoint, status, seconds):
+    PROVIDER_REQUESTS.inc(provider=provider, endpoint=endpoint, status=status)
+    PROVIDER_SECONDS.observe(seconds, provider=provider, endpoint=endpoint)
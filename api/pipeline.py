@@ -0,0 +1,98 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import time
+from config import SEARCH_MAX_CONCURRENCY, SUBMIT_DEADLINE_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+def new_deadline(seconds=SUBMIT_DEADLINE_SECONDS):
+    """Return a monotonic timestamp `seconds` from now."""
+    return time.monotonic() + seconds
+
+
+def remaining(deadline):
+    """Seconds left before `deadline` (never negative), or None if there is no deadline."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def run_concurrently(tasks, max_workers=SEARCH_MAX_CONCURRENCY, deadline=None, default=None):
+    """
+    Run independent provider lookups at the same time and return their results in task order.
+
+    A task that raises, or that has not finished by `deadline`, contributes `default`
+    instead of its result, so one slow or failing provider never sinks the whole request.
+
+    Args:
+        tasks (list[callable]): zero-argument callables
+        max_workers (int): upper bound on lookups in flight for this call
+        deadline (float): monotonic timestamp from new_deadline(), or None to wait indefinitely
+        default: value used for failed or late tasks
+
+    Returns:
+        list: one result per task, in the same order as `tasks`
+    """
+    if not tasks:
+        return []
+
+    results = [default] * len(tasks)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))))
+    try:
+        # Each task runs in a copy of the caller's context, so it reports to the same trace
+        futures = {executor.submit(contextvars.copy_context().run, task): i for i, task in enumerate(tasks)}
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=remaining(deadline)):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    log.warning("Provider lookup %d failed: %s", i, e)
+        except concurrent.futures.TimeoutError:
+            late = sum(1 for f in futures if not f.done())
+            log.warning("Deadline reached with %d provider lookups still pending", late)
+    finally:
+        # Don't block on (or start) lookups we've given up on
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+async def run_concurrently_async(coroutines, max_workers=SEARCH_MAX_CONCURRENCY, deadline=None, default=None):
+    """
+    Event-loop counterpart of run_concurrently(): await the coroutines together, at most
+    `max_workers` at a time, and return their results in order, with `default` for any
+    that raise or miss `deadline` (those still running or waiting for a slot at the
+    deadline are cancelled).
+    """
+    if not coroutines:
+        return []
+
+    slots = asyncio.Semaphore(max(1, max_workers))
+
+    async def bounded(coroutine):
+        try:
+            async with slots:
+                return await coroutine
+        finally:
+            # Never started if it was cancelled while waiting for a slot
+            coroutine.close()
+
+    tasks = [asyncio.ensure_future(bounded(coroutine)) for coroutine in coroutines]
+    done, late = await asyncio.wait(tasks, timeout=remaining(deadline))
+    if late:
+        log.warning("Deadline reached with %d provider lookups still pending", len(late))
+        for task in late:
+            task.cancel()
+    results = []
+    for i, task in enumerate(tasks):
+        if task in late:
+            results.append(default)
+        elif task.exception() is not None:
+            log.warning("Provider lookup %d failed: %s", i, task.exception())
+            results.append(default)
+        else:
+            results.append(task.result())
+    return results
@@ -1,6 +1,7 @@
+import sys
 from enum import Enum
-import googlemaps
-from config import ROUTES_API_KEY
+import numpy as np
+import geocoding
 
 
 class PlaceType(Enum):
@@ -13,17 +14,61 @@ class PlaceType(Enum):
         return self.value
 
 class Place:
-    def __init__(self, name, location, type=0, address=None, lat=None, lon=None):
+    """
+    A stop that can go into an itinerary.
+
+    Slotted to keep per-request allocations small. `dedupe_key` (name + address,
+    lower-cased) and `location_key` (the routing location) are interned strings kept
+    up to date as the fields change, so dedupe sets and matrix lookups hash them cheaply.
+    `category` is an optional finer tag within the type, e.g. 'fast'/'local'/'fancy' food.
+    """
+
+    __slots__ = ("_name", "_address", "_location", "type", "lat", "lon", "category", "dedupe_key", "location_key")
+
+    def __init__(self, name, location, type=0, address=None, lat=None, lon=None, category=None):
         # location: string used for routing (address or "lat,lon")
         # address: human-readable address to display in UI
+        self._name = name
+        self._address = address if address is not None else location
         self.location = location
-        self.address = address if address is not None else location
         self.type = PlaceType(type)
-        self.name = name
+        self.category = category
         # optional coordinates
         self.lat = lat
         self.lon = lon
 
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+        self._update_dedupe_key()
+
+    @property
+    def address(self):
+        return self._address
+
+    @address.setter
+    def address(self, value):
+        self._address = value
+        self._update_dedupe_key()
+
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = value
+        self.location_key = sys.intern(value) if isinstance(value, str) else value
+        self._update_dedupe_key()
+
+    def _update_dedupe_key(self):
+        if hasattr(self, "_location"):
+            self.dedupe_key = sys.intern(f"{str(self._name).lower()}\x1f{str(self._address).lower()}")
+
     def __str__(self):
         return "{}, {}".format(self.name, self.address)
 
@@ -31,28 +76,85 @@ class Place:
         if self.lat is not None and self.lon is not None and self.address is not None:
             return
 
-        gmaps = googlemaps.Client(key=ROUTES_API_KEY)
-
         if self.address and (self.lat is None or self.lon is None):
             # Forward geocoding
-            geocode_result = gmaps.geocode(self.address)
+            geocode_result = geocoding.geocode(self.address)
             if geocode_result:
-                location = geocode_result[0]['geometry']['location']
-                self.lat = location['lat']
-                self.lon = location['lng']
+                self.lat = geocode_result['lat']
+                self.lon = geocode_result['lng']
                 if not self.address:
-                    self.address = geocode_result[0]['formatted_address']
+                    self.address = geocode_result['formatted_address']
         elif self.lat is not None and self.lon is not None and not self.address:
             # Reverse geocoding
-            reverse_result = gmaps.reverse_geocode((self.lat, self.lon))
-            if reverse_result:
-                self.address = reverse_result[0]['formatted_address']
+            formatted_address = geocoding.reverse_geocode(self.lat, self.lon)
+            if formatted_address:
+                self.address = formatted_address
 
         # Update location string
         if self.lat is not None and self.lon is not None:
             self.location = f"{self.lat},{self.lon}"
         elif self.address:
             self.location = self.address
+
+
+# Small integer code per PlaceType for the columnar arrays
+TYPE_CODES = {place_type: code for code, place_type in enumerate(PlaceType)}
+
+
+class PlaceSet:
+    """
+    Columnar view over a list of places for the routing and geo code.
+
+    `lats`/`lons` are float arrays (NaN where a place has no coordinates) and `types`
+    holds TYPE_CODES, so distance, radius and type filters run as array operations;
+    `places` keeps the objects in the same order.
+    """
+
+    __slots__ = ("places", "lats", "lons", "types")
+
+    def __init__(self, places=()):
+        self.places = [place for place in places if place is not None]
+        self.lats = np.array([np.nan if p.lat is None else float(p.lat) for p in self.places], dtype=float)
+        self.lons = np.array([np.nan if p.lon is None else float(p.lon) for p in self.places], dtype=float)
+        self.types = np.array([TYPE_CODES[p.type] for p in self.places], dtype=np.int8)
+
+    def __len__(self):
+        return len(self.places)
+
+    def __iter__(self):
+        return iter(self.places)
+
+    def __getitem__(self, i):
+        return self.places[i]
+
+    @property
+    def located(self):
+        """Mask of the places that have coordinates."""
+        return ~(np.isnan(self.lats) | np.isnan(self.lons))
+
+    def of_type(self, place_type):
+        return self.types == TYPE_CODES[PlaceType(place_type)]
+
+    def take(self, selector):
+        """A new PlaceSet of the places picked by a boolean mask or index array."""
+        subset = PlaceSet.__new__(PlaceSet)
+        indices = np.flatnonzero(selector) if np.asarray(selector).dtype == bool else np.asarray(selector, dtype=np.intp)
+        subset.places = [self.places[i] for i in indices]
+        subset.lats = self.lats[indices]
+        subset.lons = self.lons[indices]
+        subset.types = self.types[indices]
+        return subset
+
+    def dedupe(self, seen=None):
+        """The first place of each dedupe_key not already in `seen` (which is updated)."""
+        seen = set() if seen is None else seen
+        keep = []
+        for i, place in enumerate(self.places):
+            if place.dedupe_key not in seen:
+                seen.add(place.dedupe_key)
+                keep.append(i)
+        return self.take(np.array(keep, dtype=np.intp))
+
         
 
     
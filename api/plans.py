@@ -0,0 +1,58 @@
+import hashlib
+import json
+import geo
+from cache import ReadThroughCache, open_cache
+from config import PLAN_CACHE_BACKEND, PLAN_CACHE_TTL, PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_GRID
+
+# Bump when the plan format or the planning steps change, so old cached plans are ignored
+PLAN_VERSION = 1
+
+# Finished plans as {"plan": response, "complete": bool}. Plans made while a search came
+# back empty, a must-visit place couldn't be geocoded or the deadline ran out are
+# returned once but never stored.
+plan_cache = ReadThroughCache(
+    open_cache(PLAN_CACHE_BACKEND, "plans", max_entries=PLAN_CACHE_MAX_ENTRIES),
+    ttl=PLAN_CACHE_TTL,
+    should_cache=lambda entry: entry["complete"],
+)
+
+
+def _text(value):
+    """Case- and whitespace-insensitive form of a free-text field."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _coord(value):
+    return None if value is None else geo.snap(value, PLAN_CACHE_GRID)
+
+
+def fingerprint(trip):
+    """
+    Hash of everything in a parsed /api/submit request (see app.parse_submit_request)
+    that changes the plan: location, coordinates snapped to PLAN_CACHE_GRID, radius,
+    tours, food split, must-visit places, hotel, duration and travel mode. Fields only
+    echoed back (like the budget) are left out.
+
+    Returns:
+        str: hex digest
+    """
+    coords = trip['location_coords'] or {}
+    hotel = trip['hotel_place']
+    key = {
+        "version": PLAN_VERSION,
+        "location": _text(trip['location']),
+        "coords": [_coord(coords.get('lat')), _coord(coords.get('lng'))],
+        "radius": round(float(trip['radius'])),
+        "tours": list(trip['selected_tours']),
+        "food": [float(p) for p in trip['food_percentages']],
+        "must_visit": [[_text(p.name), p.type.value, _text(p.address)] for p in trip['must_visit_places']],
+        "hotel": [_text(hotel.name), _text(hotel.address), _coord(hotel.lat), _coord(hotel.lon)] if hotel else None,
+        "duration": trip['duration'],
+        "mode": "driving" if trip['rent_car'] else "transit",
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def seed(key):
+    """Random seed for planning a request, derived from its fingerprint."""
+    return int(key[:16], 16)
@@ -0,0 +1,196 @@
+"""
+Opt-in profiling of single /api/submit and /api/search-hotels requests.
+
+A profiled request (see requested()) runs with a stack sampler and with cache reads
+bypassed, so that every provider response it depends on is fetched and recorded. When
+it finishes, two files are written to PROFILE_DIR:
+
+    <name>.folded   sampled stacks in the collapsed format flame-graph tools read
+                    (flamegraph.pl, speedscope, inferno)
+    <name>.json     the request body, the response status and every provider response
+                    seen, for replaying offline with bench/replay.py
+
+Credentials are never written: the token response body and the key/secret query
+parameters are dropped.
+"""
+import collections
+import contextvars
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import cache
+from config import PROFILE_REQUESTS, PROFILE_TOKEN, PROFILE_DIR, PROFILE_INTERVAL_MS
+
+CAPTURE_VERSION = 1
+
+# Routes that can be profiled
+ROUTES = ("/api/submit", "/api/search-hotels")
+
+SECRET_PARAMS = {"key", "client_id", "client_secret", "signature"}
+_KEPT_HEADERS = ("content-type", "retry-after")
+_TOKEN_PATH = "/v1/security/oauth2/token"
+_API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_capture = contextvars.ContextVar("profile_capture", default=None)
+
+
+def requested(header_value):
+    """Whether to profile a request that sent `header_value` as its X-Profile header."""
+    if PROFILE_REQUESTS:
+        return True
+    return bool(PROFILE_TOKEN) and header_value is not None and hmac.compare_digest(header_value, PROFILE_TOKEN)
+
+
+def strip_secrets(url):
+    """`url` without its credential query parameters."""
+    parts = urllib.parse.urlsplit(str(url))
+    query = [(name, value) for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if name not in SECRET_PARAMS]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """
+    Wall-clock stack sampler: every `interval` seconds a background thread records the
+    stack of each thread that is running this app's code, counted per collapsed stack
+    ("thread;outer;...;inner"). Idle threads (pool workers waiting for work, the log
+    writer) are left out. Other requests in flight on the same worker are sampled too.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    in_app = in_app or frame.f_code.co_filename.startswith(_API_DIR)
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if in_app:
+                    stack.append(names.get(ident, str(ident)))
+                    self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        """Collapsed stacks, one "frame;frame;... count" line each."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class Capture:
+    """One profiled request: its stack samples and the provider responses it received."""
+
+    def __init__(self, route, request_id, body):
+        self.route = route
+        self.request_id = request_id
+        self.body = body
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.responses = []
+        self.lock = threading.Lock()
+        self.sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+        self.tokens = None
+        self.path = None
+
+    def add(self, entry):
+        with self.lock:
+            self.responses.append(entry)
+
+    def finish(self, status):
+        """Stop profiling and write the capture; returns the path of its .json file (once)."""
+        if self.tokens is None:
+            return self.path
+        self.sampler.stop()
+        capture_token, bypass_token = self.tokens
+        _capture.reset(capture_token)
+        cache.bypass_reads.reset(bypass_token)
+        self.tokens = None
+
+        stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(self.started_at))
+        name = f"{stamp}-{self.route.strip('/').replace('/', '-')}-{self.request_id}"
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, name + ".folded"), "w") as f:
+            f.write(self.sampler.folded())
+        self.path = os.path.join(PROFILE_DIR, name + ".json")
+        with open(self.path, "w") as f:
+            json.dump({
+                "version": CAPTURE_VERSION,
+                "route": self.route,
+                "request_id": self.request_id,
+                "started_at": self.started_at,
+                "seconds": time.perf_counter() - self.started,
+                "status": status,
+                "request": self.body,
+                "samples": self.sampler.samples,
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "responses": self.responses,
+            }, f, indent=1)
+        return self.path
+
+
+def begin(route, request_id, body):
+    """Start profiling the current request; end it with Capture.finish() in the same context."""
+    capture = Capture(route, request_id, body)
+    capture.tokens = (_capture.set(capture), cache.bypass_reads.set(True))
+    capture.sampler.start()
+    return capture
+
+
+def active():
+    return _capture.get() is not None
+
+
+def record_response(method, url, status, headers, content, seconds):
+    """Add a provider response (requests or httpx) to the running capture, if any."""
+    capture = _capture.get()
+    if capture is None:
+        return
+    url = strip_secrets(url)
+    if urllib.parse.urlsplit(url).path == _TOKEN_PATH:
+        body = None
+    else:
+        try:
+            body = json.loads(content)
+        except ValueError:
+            body = content.decode("utf-8", "replace")
+    capture.add({
+        "method": method,
+        "url": url,
+        "status": status,
+        "headers": {name: headers[name] for name in _KEPT_HEADERS if name in headers},
+        "body": body,
+        "seconds": seconds,
+    })
+
+
+def record_error(method, url, error):
+    """Add a provider call that failed without a response to the running capture, if any."""
+    capture = _capture.get()
+    if capture is not None:
+        capture.add({"method": method, "url": strip_secrets(url), "error": f"{type(error).__name__}: {error}"})
@@ -0,0 +1,341 @@
+import logging
+import random
+import time
+from functools import lru_cache
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Moves must save more than this (seconds) to count as an improvement
+EPSILON = 1e-9
+
+
+class RouteResult:
+    """Best tour found by optimize_route, and which solver found it."""
+
+    def __init__(self, order, cost, starts, elapsed, method="local-search", violations=0):
+        self.order = order
+        self.cost = cost
+        self.starts = starts
+        self.elapsed = elapsed
+        self.method = method
+        self.violations = violations
+
+
+def _successors(order):
+    return np.concatenate((order[1:], order[:1]))
+
+
+@lru_cache(maxsize=64)
+def _upper_mask(n):
+    return np.triu(np.ones((n, n), dtype=bool), 1)
+
+
+def tour_cost(matrix, order):
+    """Cost of the closed tour visiting matrix rows in `order`."""
+    order = np.asarray(order, dtype=np.intp)
+    return matrix[order, _successors(order)].sum()
+
+
+def two_opt_gains(matrix, order):
+    """
+    Exact cost reduction of every 2-opt move, vectorized.
+
+    gains[i, j] (i < j) is the saving from reversing order[i + 1 .. j]. The reversed
+    segment's inner legs are re-costed in the other direction, so the gain is exact for
+    asymmetric (e.g. transit) matrices too. Entries with j <= i are 0. Position 0 is
+    never moved, so a depot placed there stays first.
+    """
+    n = len(order)
+    succ = _successors(order)
+    edge = matrix[order, succ]
+    current = edge[:, None] + edge[None, :]
+    new = matrix[order[:, None], order[None, :]] + matrix[succ[:, None], succ[None, :]]
+    # prefix[k] = sum over m < k of (reverse leg - forward leg) along the path order[0..n-1]
+    flip = matrix[order[1:], order[:-1]] - matrix[order[:-1], order[1:]]
+    prefix = np.concatenate(([0.0], np.cumsum(flip), [flip.sum()]))
+    inner = prefix[None, :n] - prefix[1:n + 1, None]
+    return np.where(_upper_mask(n), current - new - inner, 0.0)
+
+
+def two_opt_step(matrix, order, first_improvement=False):
+    """Apply one improving 2-opt move in place; returns the saving (0.0 if none)."""
+    gains = two_opt_gains(matrix, order)
+    if first_improvement:
+        flat = np.flatnonzero(gains > EPSILON)
+        if not len(flat):
+            return 0.0
+        i, j = np.unravel_index(flat[0], gains.shape)
+    else:
+        i, j = np.unravel_index(np.argmax(gains), gains.shape)
+    gain = gains[i, j]
+    if gain <= EPSILON:
+        return 0.0
+    order[i + 1:j + 1] = order[i + 1:j + 1][::-1].copy()
+    return float(gain)
+
+
+def or_opt_gains(matrix, order, length):
+    """
+    Exact cost reduction of relocating every run of `length` stops, vectorized.
+
+    Returns (forward, backward): arrays indexed [s - 1, p] giving the saving from moving
+    order[s .. s + length - 1] (s >= 1, so position 0 never moves) into the gap after
+    order[p], as-is or reversed. Gaps touching the run itself are -inf.
+    """
+    n = len(order)
+    starts = np.arange(1, n - length + 1)
+    first = order[starts]
+    last = order[starts + length - 1]
+    prev = order[starts - 1]
+    nxt = order[(starts + length) % n]
+    removed = matrix[prev, first] + matrix[last, nxt] - matrix[prev, nxt]
+
+    # Inner legs of each run, walked forwards and backwards
+    fwd = np.concatenate(([0.0], np.cumsum(matrix[order[:-1], order[1:]])))
+    bwd = np.concatenate(([0.0], np.cumsum(matrix[order[1:], order[:-1]])))
+    flip = (bwd[starts + length - 1] - bwd[starts]) - (fwd[starts + length - 1] - fwd[starts])
+
+    a = order
+    b = _successors(order)
+    base = matrix[a, b][None, :]
+    forward = removed[:, None] - (matrix[a[None, :], first[:, None]] + matrix[last[:, None], b[None, :]] - base)
+    backward = removed[:, None] - (matrix[a[None, :], last[:, None]] + matrix[first[:, None], b[None, :]] - base) - flip[:, None]
+
+    gaps = np.arange(n)[None, :]
+    touching = (gaps >= starts[:, None] - 1) & (gaps <= starts[:, None] + length - 1)
+    forward[touching] = -np.inf
+    backward[touching] = -np.inf
+    return forward, backward
+
+
+def or_opt_step(matrix, order, max_segment=3, first_improvement=False):
+    """
+    Apply one improving Or-opt move in place: relocate a run of 1..max_segment stops
+    (optionally reversed) to another gap in the tour. Position 0 is never moved.
+    Returns the saving (0.0 if none).
+    """
+    n = len(order)
+    best_gain, best_move = EPSILON, None
+    for length in range(1, min(max_segment, n - 2) + 1):
+        forward, backward = or_opt_gains(matrix, order, length)
+        for gains, reverse in ((forward, False), (backward, True)):
+            if first_improvement:
+                flat = np.flatnonzero(gains > EPSILON)
+                if not len(flat):
+                    continue
+                k = flat[0]
+            else:
+                k = np.argmax(gains)
+            s, p = np.unravel_index(k, gains.shape)
+            if gains[s, p] > best_gain:
+                best_gain, best_move = float(gains[s, p]), (s + 1, length, p, reverse)
+        if first_improvement and best_move is not None:
+            break
+
+    if best_move is None:
+        return 0.0
+    s, length, p, reverse = best_move
+    seg = order[s:s + length]
+    if reverse:
+        seg = seg[::-1]
+    if p < s:
+        moved = np.concatenate((order[:p + 1], seg, order[p + 1:s], order[s + length:]))
+    else:
+        moved = np.concatenate((order[:s], order[s + length:p + 1], seg, order[p + 1:]))
+    order[:] = moved
+    return best_gain
+
+
+def local_search(matrix, order, first_improvement=False, or_opt=True):
+    """Run 2-opt, then Or-opt, until neither finds an improving move. Reorders `order` in place."""
+    if len(order) < 4:
+        # Every tour through three or fewer stops is reachable by one 2-opt move
+        while two_opt_step(matrix, order, first_improvement) > 0:
+            pass
+        return order
+    while True:
+        if two_opt_step(matrix, order, first_improvement) > 0:
+            continue
+        if or_opt and or_opt_step(matrix, order, first_improvement=first_improvement) > 0:
+            continue
+        return order
+
+
+def adjacency_violations(flags):
+    """0/1 matrix marking every leg between two flagged stops, e.g. two meals in a row."""
+    flags = np.asarray(flags, dtype=bool)
+    violations = np.outer(flags, flags).astype(np.float64)
+    np.fill_diagonal(violations, 0.0)
+    return violations
+
+
+def violation_weight(matrix):
+    """
+    Weight that makes one rule violation cost more than any difference in travel time.
+
+    No tour leaves a stop more than once, so its travel cost is at most the sum of the
+    row maxima; weighting violations above that ranks tours by (violations, travel).
+    """
+    return float(np.max(matrix, axis=1).sum()) + 1.0
+
+
+def alternate(order, flags):
+    """Reorder so flagged stops are spread between unflagged ones where possible; order[0] stays first."""
+    flagged = [k for k in order[1:] if flags[k]]
+    others = [k for k in order[1:] if not flags[k]]
+    route = [order[0]]
+    # Start with a flagged stop when the depot itself isn't one
+    take_flagged = not flags[order[0]]
+    while flagged or others:
+        pick = flagged if (take_flagged and flagged) or not others else others
+        route.append(pick.pop(0))
+        take_flagged = not take_flagged
+    return np.array(route, dtype=np.intp)
+
+
+@lru_cache(maxsize=16)
+def _held_karp_tables(m):
+    """
+    Subset bookkeeping for Held-Karp over m stops, shared by every solve of that size.
+
+    Returns (member, layers): member[mask, j] is True when stop j is in `mask`, and
+    layers[k] lists the masks with k + 1 stops.
+    """
+    masks = np.arange(1 << m)
+    member = ((masks[:, None] >> np.arange(m)) & 1).astype(bool)
+    sizes = member.sum(axis=1)
+    layers = [masks[sizes == k] for k in range(1, m + 1)]
+    return member, layers
+
+
+def held_karp(matrix, order):
+    """
+    Exact shortest closed tour starting and ending at order[0], by bitmask dynamic programming.
+
+    Runs in O(2^m * m^2) for m = len(order) - 1 stops, vectorized one subset size at a
+    time. Exact for asymmetric matrices.
+
+    Returns:
+        tuple: (best order as an array starting with order[0], its cost)
+    """
+    order = np.asarray(order, dtype=np.intp)
+    depot, stops = order[0], order[1:]
+    m = len(stops)
+    if m < 2:
+        return order.copy(), float(tour_cost(matrix, order))
+
+    legs = matrix[np.ix_(stops, stops)]
+    member, layers = _held_karp_tables(m)
+    # cost[mask, j]: cheapest path from the depot through exactly `mask`, ending at stop j
+    cost = np.full((1 << m, m), np.inf)
+    parent = np.full((1 << m, m), -1, dtype=np.intp)
+    singles = np.arange(m)
+    cost[1 << singles, singles] = matrix[depot, stops]
+
+    for layer in layers[1:]:
+        prev = layer[:, None] ^ (1 << singles)[None, :]
+        # candidates[l, j, i] = cost[mask without j, i] + leg i -> j
+        candidates = cost[prev] + legs.T[None, :, :]
+        best = np.argmin(candidates, axis=2)
+        value = np.take_along_axis(candidates, best[:, :, None], axis=2)[:, :, 0]
+        inside = member[layer]
+        cost[layer] = np.where(inside, value, np.inf)
+        parent[layer] = np.where(inside, best, -1)
+
+    full = (1 << m) - 1
+    totals = cost[full] + matrix[stops, depot]
+    last = int(np.argmin(totals))
+    best_cost = float(totals[last])
+
+    path = []
+    mask = full
+    while last >= 0:
+        path.append(last)
+        last, mask = int(parent[mask, last]), mask ^ (1 << last)
+    route = np.concatenate(([depot], stops[path[::-1]]))
+    return route, best_cost
+
+
+def optimize_route(matrix, order=None, rng=None, time_budget=1.0, max_starts=10, max_stall=4, first_improvement=False, exact_max=12, violations=None, flags=None):
+    """
+    Find a short closed tour with the first stop of `order` as a fixed depot.
+
+    `matrix` holds raw travel times only. Ordering rules come in separately as a
+    0/1 `violations` matrix (see adjacency_violations); tours are then ranked by number
+    of violations first and travel time second, and the result reports the two apart.
+
+    Days with at most `exact_max` stops (depot included) are solved exactly with
+    held_karp. Larger days use seeded multi-start local search: the first start is
+    `order` itself, so the result is never worse than the given route; when `flags` is
+    given the second start spreads the flagged stops out (see alternate), and later
+    starts shuffle every stop except the depot using `rng`. The search stops after
+    `max_starts` starts or after `max_stall` starts in a row without a better tour, so
+    the same matrix, order and seed always give the same tour, however loaded the host.
+    `time_budget` is only a safety net: a search still running after that many seconds
+    stops before its next start (at least one start always runs), and says so in the
+    log, since its result then depends on timing.
+
+    Args:
+        matrix (np.ndarray): n x n travel costs
+        order (sequence[int]): initial route, depot first (defaults to 0..n-1)
+        rng (random.Random): source of restart shuffles
+        time_budget (float): wall-clock seconds after which the search is cut short
+        max_starts (int): maximum number of starts, including the first
+        max_stall (int): give up after this many consecutive non-improving starts
+        exact_max (int): largest day (in stops) handed to the exact solver
+        violations (np.ndarray): n x n 0/1 matrix of legs that break an ordering rule
+        flags (sequence[bool]): stops the rule applies to, used to seed a rule-friendly start
+
+    Returns:
+        RouteResult
+    """
+    started = time.perf_counter()
+    n = matrix.shape[0]
+    rng = rng or random.Random()
+    order = np.arange(n, dtype=np.intp) if order is None else np.array(order, dtype=np.intp)
+    objective = matrix
+    if violations is not None and n:
+        objective = matrix + violation_weight(matrix) * violations
+
+    def result(route, starts, method="local-search"):
+        return RouteResult(
+            route,
+            float(tour_cost(matrix, route)) if n else 0.0,
+            starts,
+            time.perf_counter() - started,
+            method=method,
+            violations=int(round(tour_cost(violations, route))) if violations is not None and n else 0,
+        )
+
+    if n < 3:
+        return result(order, 1)
+    if n <= exact_max:
+        route, _ = held_karp(objective, order)
+        return result(route, 1, method="held-karp")
+
+    seeds = [order]
+    if flags is not None:
+        seeds.append(alternate(order, flags))
+    best_order, best_cost = None, np.inf
+    starts = 0
+    stall = 0
+    while starts < max_starts and stall < max_stall:
+        if starts and time.perf_counter() - started >= time_budget:
+            log.warning("Route search over %d stops cut short by its %.2fs time limit after %d of %d starts", n, time_budget, starts, max_starts)
+            break
+        if starts < len(seeds):
+            start = seeds[starts].copy()
+        else:
+            tail = order[1:].tolist()
+            rng.shuffle(tail)
+            start = np.array([order[0]] + tail, dtype=np.intp)
+        candidate = local_search(objective, start, first_improvement)
+        cost = float(tour_cost(objective, candidate))
+        starts += 1
+        if cost < best_cost - EPSILON:
+            best_order, best_cost = candidate, cost
+            stall = 0
+        else:
+            stall += 1
+    return result(best_order, starts)
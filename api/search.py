@@ -3,42 +3,128 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS  # Import CORS
 import os
 import requests
+import http_client
 import urllib.parse
 from datetime import datetime
 from place import Place
 from place import PlaceType
 from config import FOURSQUARE_API_KEY
 import concurrent.futures
+from cache import ReadThroughCache, open_cache, bypass_reads
+from config import SEARCH_CACHE_BACKEND, SEARCH_CACHE_TTL, SEARCH_CACHE_STALE_TTL, SEARCH_CACHE_MAX_ENTRIES
+from config import SEARCH_CACHE_GRID, SEARCH_CACHE_RADIUS_STEP
 
 # Amadeus configuration
 from config import AMADEUS_CLIENT_ID, AMADEUS_CLIENT_SECRET
-AMADEUS_BASE_URL = "https://test.api.amadeus.com"
-
-def get_amadeus_access_token():
+from config import AMADEUS_TOKEN_REFRESH_MARGIN, AMADEUS_TOKEN_EARLY_REFRESH, AMADEUS_TOKEN_CACHE_BACKEND
+from config import AMADEUS_OFFERS_BATCH_SIZE, AMADEUS_INITIAL_CONCURRENCY, AMADEUS_MIN_CONCURRENCY
+from config import AMADEUS_MAX_CONCURRENCY, AMADEUS_TARGET_LATENCY, AMADEUS_RATE_LIMIT, AMADEUS_MAX_RETRIES
+from config import HOTEL_CACHE_BACKEND, HOTEL_CACHE_GRID, HOTEL_CACHE_MAX_ENTRIES, HOTEL_LIST_CACHE_TTL, HOTEL_OFFER_CACHE_TTL
+from token_manager import TokenManager
+from concurrency import AdaptiveLimit, RateLimiter, Throttled
+import collections
+import contextvars
+import threading
+import time
+import geo
+import logging
+import metrics
+from config import AMADEUS_BASE_URL, FOURSQUARE_BASE_URL
+
+log = logging.getLogger(__name__)
+
+def _fetch_amadeus_token():
     """
-    Retrieve an OAuth2 access token from Amadeus.
-    Expects AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET to be set in the environment.
-    """
-    if not AMADEUS_CLIENT_ID or not AMADEUS_CLIENT_SECRET:
-        raise RuntimeError("Amadeus credentials not configured. Set AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET.")
+    Request a new OAuth2 access token from Amadeus.
 
+    Returns:
+        tuple: (access_token, expires_in_seconds)
+    """
     token_url = f"{AMADEUS_BASE_URL}/v1/security/oauth2/token"
     data = {
         "grant_type": "client_credentials",
         "client_id": AMADEUS_CLIENT_ID,
         "client_secret": AMADEUS_CLIENT_SECRET,
     }
-    resp = requests.post(token_url, data=data)
+    with metrics.span("amadeus_token"):
+        resp = http_client.post(token_url, data=data)
     if resp.status_code != 200:
         raise RuntimeError(f"Failed to obtain Amadeus token: {resp.status_code} - {resp.text}")
     payload = resp.json()
-    return payload.get("access_token")
+    return payload.get("access_token"), payload.get("expires_in", 0)
+
+
+# Shared by every request in this process, and by every worker when a token cache is configured
+amadeus_tokens = TokenManager(
+    _fetch_amadeus_token,
+    refresh_margin=AMADEUS_TOKEN_REFRESH_MARGIN,
+    early_refresh=AMADEUS_TOKEN_EARLY_REFRESH,
+    store=open_cache(AMADEUS_TOKEN_CACHE_BACKEND, "tokens", max_entries=10),
+    # Tokens only work against the endpoint and client they were issued for
+    key=f"amadeus|{AMADEUS_BASE_URL}|{AMADEUS_CLIENT_ID}",
+)
+
+# Provider-wide limits on Amadeus calls: a fixed request rate, and a concurrency limit
+# for offer batches that backs off on slow responses and 429s
+amadeus_rate = RateLimiter(AMADEUS_RATE_LIMIT)
+amadeus_offers_limit = AdaptiveLimit(
+    AMADEUS_INITIAL_CONCURRENCY,
+    AMADEUS_MIN_CONCURRENCY,
+    AMADEUS_MAX_CONCURRENCY,
+    AMADEUS_TARGET_LATENCY,
+)
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers.get("Retry-After", 1))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class AmadeusError(RuntimeError):
+    """An Amadeus request failed (kept out of the caches)."""
+
+
+# Hotel lists per searched area, and unfiltered offers per (hotel, dates, adults, currency).
+# An empty list (Amadeus has no hotels there, or briefly lost them) is returned but not
+# stored, so the area is asked again next time instead of staying empty for the whole TTL.
+hotel_list_cache = ReadThroughCache(
+    open_cache(HOTEL_CACHE_BACKEND, "hotel_lists", max_entries=HOTEL_CACHE_MAX_ENTRIES),
+    ttl=HOTEL_LIST_CACHE_TTL,
+    should_cache=bool,
+)
+hotel_offer_cache = open_cache(HOTEL_CACHE_BACKEND, "hotel_offers", ttl=HOTEL_OFFER_CACHE_TTL, max_entries=HOTEL_CACHE_MAX_ENTRIES)
+
+
+def get_amadeus_access_token():
+    """
+    Retrieve an OAuth2 access token from Amadeus, reusing the cached token until shortly before it expires.
+    Expects AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET to be set in the environment.
+    """
+    if not AMADEUS_CLIENT_ID or not AMADEUS_CLIENT_SECRET:
+        raise RuntimeError("Amadeus credentials not configured. Set AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET.")
+    return amadeus_tokens.get()
+
+
+def _amadeus_headers(access_token):
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/json",
+    }
+
+
+def _hotel_list_key(lat, lon, radius_miles):
+    return f"{geo.region_key(lat, lon, HOTEL_CACHE_GRID)}|{float(radius_miles):g}"
 
 
 def get_hotels(lat, lon, radius_miles):
     """
     Step 1: Given a center point and radius, return a list of hotels from Amadeus.
 
+    Hotel lists barely change, so they are cached by (grid cell of the center, radius)
+    for HOTEL_LIST_CACHE_TTL.
+
     Args:
         lat (float): latitude of center
         lon (float): longitude of center
@@ -46,10 +132,38 @@ def get_hotels(lat, lon, radius_miles):
 
     Returns:
         list[tuple]: each tuple is (hotel_dict, location_tuple) where hotel_dict has {hotelId, name},
-                     and location_tuple is (lat, lon, address)
+                     and location_tuple is (lat, lon, address), nearest to the center first
+    """
+    try:
+        cached = hotel_list_cache.get(_hotel_list_key(lat, lon, radius_miles), lambda: _fetch_hotels(lat, lon, radius_miles))
+    except AmadeusError as e:
+        log.warning("Amadeus get_hotels failed: %s", e)
+        return []
+    return _nearest_first(lat, lon, cached)
+
+
+def _nearest_first(lat, lon, hotels):
+    """
+    Hotel tuples sorted by distance from the center, by a nearest query over a PlaceIndex
+    of the hotels (any without coordinates go last). Cached lists come back as JSON lists.
     """
+    hotels = [(hotel, tuple(loc)) for hotel, loc in hotels]
+    index = geo.PlaceIndex()
+    unplaced = [entry for entry in hotels if not index.add(entry, entry[1][0], entry[1][1])]
+    return [entry for entry, _ in index.nearest(lat, lon, k=len(index))] + unplaced
+
+
+def _fetch_hotels(lat, lon, radius_miles):
+    """Fetch the hotel list from Amadeus; raises AmadeusError on a non-200 response so errors are never cached."""
     access_token = get_amadeus_access_token()
+    with metrics.span("amadeus_hotel_list"):
+        amadeus_rate.acquire()
+        url, params, headers = _hotels_request(lat, lon, radius_miles, access_token)
+        return _parse_hotels(http_client.get(url, headers=headers, params=params))
+
 
+def _hotels_request(lat, lon, radius_miles, access_token):
+    """(url, params, headers) of the hotels-by-geocode request."""
     url = f"{AMADEUS_BASE_URL}/v1/reference-data/locations/hotels/by-geocode"
     params = {
         "latitude": lat,
@@ -57,16 +171,16 @@ def get_hotels(lat, lon, radius_miles):
         "radius": radius_miles,
         "radiusUnit": "MILE",
     }
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Accept": "application/json",
-    }
+    return url, params, _amadeus_headers(access_token)
+
 
-    resp = requests.get(url, headers=headers, params=params)
-    print(f"Amadeus get_hotels request: {resp.url}")
+def _parse_hotels(resp):
+    """Turn a hotels-by-geocode response (requests or httpx) into get_hotels() tuples."""
+    log.debug("Amadeus get_hotels request: %s", resp.url)
+    if resp.status_code == 401:
+        amadeus_tokens.invalidate()
     if resp.status_code != 200:
-        print(f"Amadeus get_hotels error: {resp.status_code} - {resp.text}")
-        return []
+        raise AmadeusError(f"Amadeus get_hotels error: {resp.status_code} - {resp.text}")
 
     data = resp.json().get("data", [])
     hotels = []
@@ -75,9 +189,7 @@ def get_hotels(lat, lon, radius_miles):
             hotel_id = item.get("hotelId")
             name = item.get("name") or item.get("hotel", {}).get("name")
             geo = item.get("geoCode", {})
-            print(geo['latitude'])
             address_obj = item.get("address", {})
-            print(address_obj['lines'][0] if 'lines' in address_obj and address_obj['lines'] else None)
             address = ", ".join(
                 filter(
                     None,
@@ -97,11 +209,11 @@ def get_hotels(lat, lon, radius_miles):
             location_tuple = (geo['latitude'], geo['longitude'], address or "Unknown")
             hotels.append((hotel_dict, location_tuple))
         except Exception as e:
-            print(f"Error parsing Amadeus hotel item: {e}")
+            log.warning("Error parsing Amadeus hotel item: %s", e)
     return hotels
 
 
-def _chunk_hotels(hotels, batch_size=5):
+def _chunk_hotels(hotels, batch_size=AMADEUS_OFFERS_BATCH_SIZE):
     """
     Helper to split a list of hotels into batches of valid size for the offers API.
     """
@@ -109,74 +221,140 @@ def _chunk_hotels(hotels, batch_size=5):
         yield hotels[i : i + batch_size]
 
 
-def _process_batch(access_token, batch, base_params, headers, hotels_dict, max_price):
+def _offer_key(hotel_id, base_params):
+    return "|".join(str(part) for part in (
+        hotel_id,
+        base_params["checkInDate"],
+        base_params["checkOutDate"],
+        base_params["adults"],
+        base_params["currency"],
+    ))
+
+
+def _process_batch(access_token, batch, base_params, headers):
     """
-    Process a batch of hotels to get priced offers.
+    Fetch the offers for a batch of hotels, with no price filter applied.
+
+    Returns:
+        dict: hotelId -> {"name", "totals"} for every hotel in the batch, where totals are
+              the stay prices of its offers in the order Amadeus listed them ([] when the
+              hotel has no availability); {} if the request failed.
+
+    Raises Throttled on a 429 so the caller can back off and retry.
     """
-    url = f"{AMADEUS_BASE_URL}/v3/shopping/hotel-offers"
-    hotel_ids = [h[0].get("hotelId") for h in batch if h[0].get("hotelId")]
+    url, params, hotel_ids = _offers_request(batch, base_params)
     if not hotel_ids:
-        return []
+        return {}
+    try:
+        resp = http_client.get(url, headers=headers, params=params)
+    except requests.RequestException as e:
+        log.warning("Amadeus priced_hotels batch failed: %s", e)
+        return {}
+    return _parse_offers(resp, hotel_ids)
 
+
+def _offers_request(batch, base_params):
+    """(url, params, hotel_ids) of the hotel-offers request for a batch."""
+    url = f"{AMADEUS_BASE_URL}/v3/shopping/hotel-offers"
+    hotel_ids = [h[0].get("hotelId") for h in batch if h[0].get("hotelId")]
     params = base_params.copy()
     params["hotelIds"] = ",".join(hotel_ids)
+    return url, params, hotel_ids
+
 
-    resp = requests.get(url, headers=headers, params=params)
-    print(f"Amadeus priced_hotels batch request: {resp.url}")
+def _parse_offers(resp, hotel_ids):
+    """Turn a hotel-offers response (requests or httpx) into _process_batch()'s result."""
+    log.debug("Amadeus priced_hotels batch request: %s", resp.url)
+    if resp.status_code == 429:
+        raise Throttled("Amadeus rate limit hit", retry_after=_retry_after(resp))
+    if resp.status_code == 401:
+        amadeus_tokens.invalidate()
     if resp.status_code != 200:
-        print(f"Amadeus priced_hotels batch error: {resp.status_code} - {resp.text}")
-        return []
+        log.warning("Amadeus priced_hotels batch error: %s - %s", resp.status_code, resp.text)
+        return {}
 
-    data = resp.json().get("data", [])
-    batch_result = []
-    for item in data:
+    # Hotels missing from the response have nothing available for these dates
+    offers_by_hotel = {hotel_id: {"name": None, "totals": []} for hotel_id in hotel_ids}
+    for item in resp.json().get("data", []):
         try:
             hotel_info = item.get("hotel", {})
             hotel_id = hotel_info.get("hotelId")
-            offers = item.get("offers", [])
-            if not hotel_id or not offers:
-                continue
-
-            # Find the location_tuple from input hotels
-            location_tuple = hotels_dict.get(hotel_id)
-            if not location_tuple:
+            if not hotel_id:
                 continue
-
-            lat, lon, addr = location_tuple
-            hotel_name = hotels_dict.get(hotel_id + "_name", "Unknown")
-
-            # Find any offer for hotel within the price range
-            qualifying_price = None
-            for offer in offers:
-                price_info = offer.get("price", {})
-                total_str = price_info.get("total")
+            totals = []
+            for offer in item.get("offers", []):
                 try:
-                    total_val = float(total_str)
+                    totals.append(float(offer.get("price", {}).get("total")))
                 except (TypeError, ValueError):
                     continue
-                if total_val <= max_price: 
-                    qualifying_price = total_val
-                    break
-            if qualifying_price is None:
-                continue
+            offers_by_hotel[hotel_id] = {"name": hotel_info.get("name"), "totals": totals}
+        except Exception as e:
+            log.warning("Error parsing Amadeus offer item: %s", e)
+    return offers_by_hotel
+
+
+def _hotel_entry(hotel_id, offers, hotels_dict, max_price, num_nights):
+    """Build the response entry for a hotel from its cached offers, or None if no offer is within max_price."""
+    location_tuple = hotels_dict.get(hotel_id)
+    if not location_tuple:
+        return None
+
+    # Take the first offer within the price range
+    qualifying_price = next((total for total in offers["totals"] if total <= max_price), None)
+    if qualifying_price is None:
+        return None
+
+    lat, lon, addr = location_tuple
+    return {
+        "hotelId": hotel_id,
+        "name": offers["name"] or hotels_dict.get(hotel_id + "_name", "Unknown"),
+        "lat": lat,
+        "lon": lon,
+        "address": addr,
+        "price": qualifying_price / num_nights,
+    }
 
-            hotel_entry = {
-                "hotelId": hotel_id,
-                "name": hotel_info.get("name") or hotel_name,
-                "lat": lat,
-                "lon": lon,
-                "address": addr,
-                "price": qualifying_price / (base_params.get("num_nights", 1)),
-            }
 
-            batch_result.append(hotel_entry)
-            print(f"Added hotel: {hotel_entry}")
-        except Exception as e:
-            print(f"Error parsing Amadeus offer item: {e}")
-    return batch_result
+def _run_batch(cancelled, access_token, batch, base_params, headers):
+    """
+    Price one batch within the provider's rate limit, retrying on 429, and feed each
+    attempt's latency to the adaptive concurrency limit. Successful results go into the
+    offer cache. Gives up (returning {}) as soon as `cancelled` is set.
+    """
+    for attempt in range(AMADEUS_MAX_RETRIES + 1):
+        if not amadeus_rate.acquire(cancelled):
+            return {}
+        start = time.monotonic()
+        try:
+            with metrics.span("amadeus_offer_batch"):
+                result = _process_batch(access_token, batch, base_params, headers)
+        except Throttled as e:
+            amadeus_offers_limit.observe(time.monotonic() - start, throttled=True)
+            amadeus_rate.pause(e.retry_after)
+            log.info("Amadeus priced_hotels batch throttled (attempt %d), retrying in %ss", attempt + 1, e.retry_after)
+            continue
+        amadeus_offers_limit.observe(time.monotonic() - start)
+        _store_offers(result, base_params)
+        return result
+    return {}
+
+
+def _store_offers(offers_by_hotel, base_params):
+    if hotel_offer_cache is not None and offers_by_hotel:
+        hotel_offer_cache.set_many(_offer_items(offers_by_hotel, base_params))
+
 
+async def _astore_offers(offers_by_hotel, base_params):
+    """_store_offers() for the event loop."""
+    if hotel_offer_cache is not None and offers_by_hotel:
+        await hotel_offer_cache.aset_many(_offer_items(offers_by_hotel, base_params))
 
-def priced_hotels(max_price, check_in_date, check_out_date, hotels, num_nights, adults=1, currency="USD"):
+
+def _offer_items(offers_by_hotel, base_params):
+    return {_offer_key(hotel_id, base_params): offers for hotel_id, offers in offers_by_hotel.items()}
+
+
+def priced_hotels(max_price, check_in_date, check_out_date, hotels, num_nights, adults=1, currency="USD", limit=20):
     """
     Step 2: Given a price ceiling, dates, and a hotel list from get_hotels,
     return a list of hotels that have at least one offer within the price range.
@@ -188,140 +366,279 @@ def priced_hotels(max_price, check_in_date, check_out_date, hotels, num_nights,
         hotels (list[tuple]): list from get_hotels(), each (hotel_dict, location_tuple)
         adults (int): number of adults
         currency (str): currency code, e.g. 'USD'
+        limit (int): stop after this many hotels
 
     Returns:
         list[dict]: one entry per hotel that has any matching offer,
                     each dict includes location info from get_hotels and 'price' field.
     """
-    if not hotels:
-        return []
+    result = list(iter_priced_hotels(max_price, check_in_date, check_out_date, hotels, num_nights,
+                                     adults=adults, currency=currency, limit=limit))
+    log.info("Total priced hotels: %d", len(result))
+    return result
+
+
+class _HotelSelection:
+    """Per-search state shared by the sync and async hotel pricing paths."""
+
+    def __init__(self, hotels, max_price, check_in_date, check_out_date, num_nights, adults, currency):
+        self.hotels = hotels
+        self.max_price = max_price
+        self.num_nights = num_nights
+        self.seen_ids = set()
+        self.cached = {}
+
+        # Create a dict for quick lookup of location and name
+        self.hotels_dict = {}
+        for h in hotels:
+            h_dict, loc = h
+            hotel_id = h_dict.get("hotelId")
+            if hotel_id:
+                self.hotels_dict[hotel_id] = loc
+                self.hotels_dict[hotel_id + "_name"] = h_dict.get("name", "Unknown")
+
+        self.base_params = {
+            "checkInDate": check_in_date,
+            "checkOutDate": check_out_date,
+            "adults": adults,
+            "currency": currency,
+        }
+
+    def cached_offers(self):
+        """Offers already in the offer cache, by hotelId, in hotel order."""
+        if hotel_offer_cache is None or bypass_reads.get():
+            return {}
+        keys = self._offer_keys()
+        return self._keep_cached(keys, hotel_offer_cache.get_many(keys.values()))
+
+    async def acached_offers(self):
+        """cached_offers() for the event loop."""
+        if hotel_offer_cache is None or bypass_reads.get():
+            return {}
+        keys = self._offer_keys()
+        return self._keep_cached(keys, await hotel_offer_cache.aget_many(keys.values()))
+
+    def _offer_keys(self):
+        return {h[0].get("hotelId"): _offer_key(h[0].get("hotelId"), self.base_params) for h in self.hotels if h[0].get("hotelId")}
+
+    def _keep_cached(self, keys, found):
+        self.cached = {hotel_id: found[key] for hotel_id, key in keys.items() if key in found}
+        return self.cached
+
+    def to_price(self):
+        """Hotels whose offers still have to be fetched."""
+        return [h for h in self.hotels if h[0].get("hotelId") not in self.cached]
+
+    def qualifying(self, offers_by_hotel):
+        """Entries for the not-yet-returned hotels with an offer within budget."""
+        for hotel_id, offers in offers_by_hotel.items():
+            if hotel_id in self.seen_ids:
+                continue
+            hotel_entry = _hotel_entry(hotel_id, offers, self.hotels_dict, self.max_price, self.num_nights)
+            if hotel_entry is not None:
+                self.seen_ids.add(hotel_id)
+                yield hotel_entry
+
+
+def iter_priced_hotels(max_price, check_in_date, check_out_date, hotels, num_nights, adults=1, currency="USD", limit=20,
+                       stop=None, keep_alive=False):
+    """
+    Streaming form of priced_hotels(): yield each qualifying hotel as soon as its batch resolves.
+
+    Offers are cached unfiltered per (hotel, dates, adults, currency) for
+    HOTEL_OFFER_CACHE_TTL, so hotels priced recently are answered from the cache
+    whatever the budget, and only the rest are sent to Amadeus.
+
+    Batches that haven't started are cancelled once `limit` hotels have been yielded, the
+    caller closes the generator or sets `stop` (a threading.Event, e.g. when the client
+    disconnected); throttled batches stop retrying, and a request already sent to Amadeus
+    finishes in the background with its offers cached but not yielded.
+
+    With `keep_alive`, a batch that adds no hotel yields None, so a streaming view still
+    writes (and so notices a closed connection) while nothing qualifies.
+    """
+    if not hotels or limit <= 0:
+        return
+
+    selection = _HotelSelection(hotels, max_price, check_in_date, check_out_date, num_nights, adults, currency)
+
+    # Answer what we can from the offer cache, nearest first
+    for hotel_entry in selection.qualifying(selection.cached_offers()):
+        yield hotel_entry
+        if len(selection.seen_ids) >= limit:
+            return
+    to_price = selection.to_price()
+    if not to_price:
+        return
+    base_params = selection.base_params
 
     access_token = get_amadeus_access_token()
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Accept": "application/json",
+    headers = _amadeus_headers(access_token)
+
+    # Batches start nearest-first (get_hotels order) as the shared concurrency limit frees
+    # slots; once we return, nothing more is started and `cancelled` stops retries
+    pending = collections.deque(_chunk_hotels(to_price))
+    running = set()
+    cancelled = threading.Event()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=AMADEUS_MAX_CONCURRENCY)
+    try:
+        while pending or running:
+            if pending and not running:
+                amadeus_offers_limit.acquire()
+                running.add(_start_batch(executor, cancelled, access_token, pending.popleft(), base_params, headers))
+            while pending and amadeus_offers_limit.try_acquire():
+                running.add(_start_batch(executor, cancelled, access_token, pending.popleft(), base_params, headers))
+            # Wake up periodically so batches can start when another request frees a slot
+            done, running = concurrent.futures.wait(running, timeout=0.05, return_when=concurrent.futures.FIRST_COMPLETED)
+            if stop is not None and stop.is_set():
+                return
+            for future in done:
+                found = len(selection.seen_ids)
+                for hotel_entry in selection.qualifying(future.result()):
+                    yield hotel_entry
+                    if len(selection.seen_ids) >= limit:
+                        return
+                if keep_alive and len(selection.seen_ids) == found:
+                    yield None
+    finally:
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _start_batch(executor, cancelled, access_token, batch, base_params, headers):
+    """Submit a batch whose concurrency slot is already held; the slot is freed when it finishes or is cancelled."""
+    # copy_context: the batch's spans belong to the request that started it
+    future = executor.submit(contextvars.copy_context().run, _run_batch, cancelled, access_token, batch, base_params, headers)
+    future.add_done_callback(lambda _: amadeus_offers_limit.release())
+    return future
+
+
+def _place_search_headers():
+    return {
+        "accept": "application/json",
+        "X-Places-Api-Version": "2025-06-17",
+        "Authorization": f"Bearer {FOURSQUARE_API_KEY}",
     }
 
-    # Create a dict for quick lookup of location and name
-    hotels_dict = {}
-    for h in hotels:
-        h_dict, loc = h
-        hotel_id = h_dict.get("hotelId")
-        if hotel_id:
-            hotels_dict[hotel_id] = loc
-            hotels_dict[hotel_id + "_name"] = h_dict.get("name", "Unknown")
-
-    base_params = {
-        "checkInDate": check_in_date,
-        "checkOutDate": check_out_date,
-        "adults": adults,
-        "currency": currency,
-        "priceRange": f"0-{max_price}",
-        "num_nights": num_nights,
-    }
 
-    result = []
-    seen_ids = set()
-
-    # Process hotels in parallel batches
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = []
-        for batch in _chunk_hotels(hotels, batch_size=5):
-            futures.append(executor.submit(_process_batch, access_token, batch, base_params, headers, hotels_dict, max_price))
-
-        for future in concurrent.futures.as_completed(futures):
-            batch_result = future.result()
-            for hotel_entry in batch_result:
-                hotel_id = hotel_entry["hotelId"]
-                if hotel_id not in seen_ids:
-                    result.append(hotel_entry)
-                    seen_ids.add(hotel_id)
-                    if len(result) >= 20:
-                        return result[:20]
-
-    print(f"Total priced hotels: {len(result)}")
-    return result
+def _fetch_place_results(url):
+    """Fetch raw Foursquare search results; raises on a non-200 response so errors are never cached."""
+    return _place_results(http_client.get(url, headers=_place_search_headers()))
+
+
+def _place_results(response):
+    """Raw results of a Foursquare search response (requests or httpx)."""
+    log.debug("Foursquare API request to: %s (status %s)", response.url, response.status_code)
+    if response.status_code != 200:
+        raise RuntimeError(f"Error fetching places: {response.status_code} - {response.text}")
+    return response.json().get('results', [])
+
 
+# Raw results keyed by _place_search_key(); each call still builds its own Place objects
+place_search_cache = ReadThroughCache(
+    open_cache(SEARCH_CACHE_BACKEND, "place_searches", max_entries=SEARCH_CACHE_MAX_ENTRIES),
+    ttl=SEARCH_CACHE_TTL,
+    stale_ttl=SEARCH_CACHE_STALE_TTL,
+)
 
 
 def search_places(location, query, max_price=None, radius=None, location_coords=None):
     """Search places using Foursquare Places API and return list of Place objects with address and coords."""
+    with metrics.span("search_places"):
+        url = _place_search_url(location, query, max_price, radius, location_coords)
+        if url is None:
+            return []
+        try:
+            items = place_search_cache.get(_place_search_key(location, query, max_price, radius, location_coords), lambda: _fetch_place_results(url))
+        except Exception as e:
+            log.warning("Exception in search_places: %s", e)
+            return []
+        return _parse_places(items, query, radius, location_coords)
+
+
+def _place_search_url(location, query, max_price=None, radius=None, location_coords=None):
+    """Foursquare search url for the request exactly as given, or None without a location."""
     if location is None:
-        return []
-    location_str = str(location_coords['lat']) + "," + str(location_coords['lng']) if location_coords else location
-    
+        return None
+    location_str = f"{location_coords['lat']},{location_coords['lng']}" if location_coords else location
+
     # Build URL with parameters
     if location_coords and radius:
-        url = f"https://places-api.foursquare.com/places/search?query={urllib.parse.quote(query)}&ll={urllib.parse.quote(location_str)}&radius={urllib.parse.quote(str(int(radius)))}&sort=POPULARITY&limit=20"
+        url = f"{FOURSQUARE_BASE_URL}/places/search?query={urllib.parse.quote(query)}&ll={urllib.parse.quote(location_str)}&radius={urllib.parse.quote(str(int(radius)))}&sort=POPULARITY&limit=20"
     else:
-        url = f"https://places-api.foursquare.com/places/search?query={urllib.parse.quote(query)}&near={urllib.parse.quote(location_str)}&sort=POPULARITY&limit=20"
-    
+        url = f"{FOURSQUARE_BASE_URL}/places/search?query={urllib.parse.quote(query)}&near={urllib.parse.quote(str(location_str))}&sort=POPULARITY&limit=20"
+
     # Add max_price if provided (for hotels)
-    if max_price is not None:
-        if max_price < 150:
-            url += f"&max_price={0}"
-        elif max_price < 300:
-            url += f"&max_price={1}"
-        elif max_price < 450:
-            url += f"&max_price={2}"
-        else:
-            url += f"&max_price={3}"
-               
-    headers = {
-        "accept": "application/json",
-        "X-Places-Api-Version": "2025-06-17",
-        "Authorization": f"Bearer {FOURSQUARE_API_KEY}",
-    }
-    try:
-        response = requests.get(url, headers=headers)
-        print(f"Foursquare API request to: {url}")
-        print(f"Response status: {response.status_code}")
-        if response.status_code == 200:
-            items = response.json().get('results', [])
-            places = []
-            for item in items:
-                try:
-                    place_name = item.get('name', 'Unknown')
-                    loc = item.get('location', {})
-                    # prefer formatted_address, fall back to components
-                    place_addr = loc.get('formatted_address') or \
-                        ", ".join(filter(None, [loc.get('address'), loc.get('locality'), loc.get('region'), loc.get('country')])) or 'Unknown'
-
-                    geocodes = item.get('geocodes', {})
-                    main = geocodes.get('main', {})
-                    lat = main.get('latitude') if main else None
-                    lon = main.get('longitude') if main else None
-
-                    if location_coords and radius and lat and lon:
-                        # Calculate distance in miles using Haversine formula
-                        from math import radians, cos, sin, asin, sqrt
-                        lat1, lon1 = radians(location_coords['lat']), radians(location_coords['lng'])
-                        lat2, lon2 = radians(lat), radians(lon)
-                        dlat = lat2 - lat1
-                        dlon = lon2 - lon1
-                        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                        c = 2 * asin(sqrt(a))
-                        distance_miles = 3959 * c  
-                        
-                        if distance_miles > radius:
-                            continue  # Skip places outside radius
-
-                    location_str = f"{lat},{lon}" if lat and lon else place_addr
-
-                    # Use vague category type instead of specific query
-                    category_type = get_category_type(query)
-                    print(place_name, category_type)
-                    place = Place(place_name, location_str, type=category_type, address=place_addr, lat=lat, lon=lon)
-                    places.append(place)
-                except Exception as item_err:
-                    print(f"Error parsing place item: {item_err}")
-            return places
-        else:
-            print(f"Error fetching places: {response.status_code} - {response.text}")
-            return []
-    except Exception as e:
-        print(f"Exception in search_places: {e}")
-        return []
+    level = _price_level(max_price)
+    if level is not None:
+        url += f"&max_price={level}"
+    return url
+
+
+def _place_search_key(location, query, max_price=None, radius=None, location_coords=None):
+    """
+    Cache key of a search: the normalized query, the center's grid cell (or the normalized
+    place name) and the radius rounded up to SEARCH_CACHE_RADIUS_STEP, so near-identical
+    searches share an entry. Only the key is normalized; the request keeps its own values.
+    """
+    normalized_query = " ".join(query.lower().split())
+    if location_coords and radius:
+        radius_bucket = int(math.ceil(radius / SEARCH_CACHE_RADIUS_STEP) * SEARCH_CACHE_RADIUS_STEP) if SEARCH_CACHE_RADIUS_STEP else int(radius)
+        where = f"ll={geo.region_key(location_coords['lat'], location_coords['lng'], SEARCH_CACHE_GRID)}|radius={radius_bucket}"
+    elif location_coords:
+        where = f"near={geo.region_key(location_coords['lat'], location_coords['lng'], SEARCH_CACHE_GRID)}"
+    else:
+        where = "near=" + " ".join(str(location).lower().split())
+    return f"{normalized_query}|{where}|max_price={_price_level(max_price)}"
+
+
+def _price_level(max_price):
+    """Foursquare's 0-3 price level for a hotel budget, or None without one."""
+    if max_price is None:
+        return None
+    if max_price < 150:
+        return 0
+    if max_price < 300:
+        return 1
+    if max_price < 450:
+        return 2
+    return 3
+
+
+def _parse_places(items, query, radius=None, location_coords=None):
+    """Build Place objects from raw Foursquare results, dropping those outside the radius."""
+    places = []
+    for item in items:
+        try:
+            place_name = item.get('name', 'Unknown')
+            loc = item.get('location', {})
+            # prefer formatted_address, fall back to components
+            place_addr = loc.get('formatted_address') or \
+                ", ".join(filter(None, [loc.get('address'), loc.get('locality'), loc.get('region'), loc.get('country')])) or 'Unknown'
+
+            geocodes = item.get('geocodes', {})
+            main = geocodes.get('main', {})
+            lat = main.get('latitude') if main else None
+            lon = main.get('longitude') if main else None
+
+            location_str = f"{lat},{lon}" if lat and lon else place_addr
+
+            # Use vague category type instead of specific query
+            category_type = get_category_type(query)
+            log.debug("Parsed place %r (%s)", place_name, category_type)
+            place = Place(place_name, location_str, type=category_type, address=place_addr, lat=lat, lon=lon)
+            places.append(place)
+        except Exception as item_err:
+            log.warning("Error parsing place item: %s", item_err)
+
+    if location_coords and radius:
+        # Drop located places outside the radius (a radius query on an index of them)
+        index = geo.PlaceIndex()
+        located = [place for place in places if place.lat and place.lon and index.add(place)]
+        inside = set(map(id, index.within(location_coords['lat'], location_coords['lng'], radius)))
+        dropped = set(id(place) for place in located) - inside
+        places = [place for place in places if id(place) not in dropped]
+    return places
 
 def get_category_type(query):
     """Map specific query strings to vague category types."""
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The API modules are imported flat (import cache, import routing), as when run from api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Caches the modules open at import time go to a scratch directory, not api/.cache
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="tripplanner-tests-"))
+
+
+@pytest.fixture(scope="session")
+def fake_providers():
+    """Base url of the provider stand-ins (bench/fake_providers.py), one process per test run."""
+    from bench import load_test
+
+    process, url = load_test.start_providers(latency_ms=20)
+    yield url
+    process.terminate()
+    process.wait()
@@ -0,0 +1,58 @@
+import pytest
+import requests
+
+from bench import load_test
+
+ORIGIN = {"Origin": "http://localhost:3000"}
+
+
+@pytest.fixture(scope="module")
+def servers(fake_providers):
+    """The Flask app on a thread pool and the ASGI app, both against the fake providers."""
+    started = {}
+    for mode in ("threaded", "async"):
+        port = load_test._free_port()
+        started[mode] = (load_test._start_server(mode, port, load_test._app_env(fake_providers), threads=4), f"http://127.0.0.1:{port}")
+    for _, url in started.values():
+        load_test._wait_for_port(int(url.rsplit(":", 1)[1]))
+    yield {mode: url for mode, (_, url) in started.items()}
+    for process, _ in started.values():
+        process.terminate()
+        process.wait()
+
+
+def both(servers, method, path, **kwargs):
+    return [requests.request(method, servers[mode] + path, timeout=60, **kwargs) for mode in ("threaded", "async")]
+
+
+def cors(response):
+    return {k.lower(): v for k, v in response.headers.items() if k.lower().startswith("access-control")}
+
+
+def test_hotel_search_matches_flask(servers):
+    flask, asgi = both(servers, "POST", "/api/search-hotels", json=load_test.PAYLOADS["search-hotels"], headers=ORIGIN)
+
+    assert flask.status_code == asgi.status_code == 200
+    assert sorted(flask.json()["hotels"], key=lambda h: h["hotelId"]) == sorted(asgi.json()["hotels"], key=lambda h: h["hotelId"])
+    assert flask.json()["hotels"]
+    assert cors(flask) == cors(asgi)
+
+
+def test_submit_matches_flask(servers):
+    flask, asgi = both(servers, "POST", "/api/submit", json=load_test.PAYLOADS["submit"], headers=ORIGIN)
+
+    assert flask.status_code == asgi.status_code == 200
+    assert flask.json() == asgi.json()
+    assert flask.json()["daily_itineraries"]
+
+
+def test_bad_requests_match_flask(servers):
+    for method, path, kwargs in (
+        ("POST", "/api/submit", {"data": b"not json", "headers": {"Content-Type": "text/plain"}}),
+        ("POST", "/api/submit", {"json": {"location": "New York"}}),
+        ("OPTIONS", "/api/search-hotels", {"headers": dict(ORIGIN, **{"Access-Control-Request-Method": "POST"})}),
+    ):
+        flask, asgi = both(servers, method, path, **kwargs)
+        assert flask.status_code == asgi.status_code
+        assert flask.json() == asgi.json()
+        assert cors(flask) == cors(asgi)
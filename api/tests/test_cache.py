@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from cache import MemoryCache, ReadThroughCache, SharedCache, SQLiteCache, bypass_reads, open_cache
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def shared_cache(path, local_ttl=30):
+    return SharedCache(SQLiteCache(str(path), "items", ttl=60), local_entries=100, local_ttl=local_ttl)
+
+
+def in_other_process(code):
+    """Run `code` in a fresh interpreter (another worker) and return what it prints."""
+    result = subprocess.run([sys.executable, "-c", code], cwd=API_DIR, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def test_shared_cache_is_visible_across_processes(tmp_path):
+    path = tmp_path / "shared.sqlite3"
+    cache = shared_cache(path)
+    cache.set("from-parent", {"n": 1})
+
+    printed = in_other_process(
+        "from cache import SharedCache, SQLiteCache\n"
+        f"cache = SharedCache(SQLiteCache({str(path)!r}, 'items', ttl=60))\n"
+        "print(cache.get('from-parent'))\n"
+        "cache.set('from-child', [1, 2])\n"
+    )
+
+    assert printed == "{'n': 1}"
+    assert cache.get("from-child") == [1, 2]
+
+
+def test_local_copy_expires_after_local_ttl(tmp_path):
+    path = tmp_path / "shared.sqlite3"
+    worker = shared_cache(path, local_ttl=0.2)
+    other = shared_cache(path, local_ttl=0.2)
+    other.set("key", "old")
+    assert worker.get("key") == "old"
+
+    other.set("key", "new")
+    # Served from the local copy until it expires, then re-read from the file
+    assert worker.get("key") == "old"
+    time.sleep(0.3)
+    assert worker.get("key") == "new"
+
+
+def test_local_ttl_never_outlives_entry_ttl(tmp_path):
+    cache = shared_cache(tmp_path / "shared.sqlite3", local_ttl=30)
+    cache.set("key", "value", ttl=0.1)
+    time.sleep(0.2)
+    assert cache.get("key") is None
+
+
+@pytest.mark.parametrize("backend", ["memory", "shared"])
+def test_read_through_does_not_store_rejected_values(tmp_path, backend):
+    store = MemoryCache() if backend == "memory" else shared_cache(tmp_path / "shared.sqlite3")
+    cache = ReadThroughCache(store, ttl=60, should_cache=lambda value: bool(value))
+    loads = []
+
+    def load(value):
+        loads.append(value)
+        return value
+
+    assert cache.get("empty", lambda: load([])) == []
+    assert cache.get("empty", lambda: load(["a"])) == ["a"]
+    assert cache.get("empty", lambda: load(["b"])) == ["a"]
+    assert loads == [[], ["a"]]
+
+
+def test_read_through_bypass_reloads_and_stores():
+    cache = ReadThroughCache(MemoryCache(), ttl=60)
+    assert cache.get("key", lambda: "cached") == "cached"
+
+    token = bypass_reads.set(True)
+    try:
+        assert cache.get("key", lambda: "fresh") == "fresh"
+    finally:
+        bypass_reads.reset(token)
+    # What the bypassing request loaded is what everyone else now gets
+    assert cache.get("key", lambda: "unused") == "fresh"
+
+
+def test_locked_file_reads_and_skips_writes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, "items", busy_timeout=0.05, touch_interval=0)
+    cache.set("key", "value")
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        assert cache.get("key") == "value"
+        assert time.perf_counter() - started < 0.05
+        cache.set("other", "value")
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    assert cache.get("other") is None
+    assert cache.stats()["errors"] == 1
+
+
+@pytest.mark.parametrize("backend", ["shared", "disk"])
+def test_unopenable_cache_file_falls_back_to_memory(tmp_path, backend):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+
+    cache = open_cache(backend, "items", ttl=60, path=str(blocker / "cache.sqlite3"))
+
+    assert isinstance(cache, MemoryCache)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
@@ -0,0 +1,76 @@
+import random
+
+from clustering import assign_to_days
+from place import Place, PlaceType
+
+NEIGHBOURHOODS = [(40.70, -74.02), (40.80, -73.95), (40.72, -73.85)]
+
+
+def place(name, type, lat=None, lon=None):
+    return Place(name, f"{lat},{lon}" if lat is not None else f"{name} address", type, lat=lat, lon=lon)
+
+
+def neighbourhood_places(tours_each=3, meals_each=2, seed=0):
+    """Tours and meals scattered within ~0.3 miles of each neighbourhood, shuffled."""
+    rng = random.Random(seed)
+    tours, meals = [], []
+    for n, (lat, lon) in enumerate(NEIGHBOURHOODS):
+        for i in range(tours_each):
+            tours.append(place(f"tour {n}.{i}", PlaceType.TOUR, lat + rng.uniform(-0.004, 0.004), lon + rng.uniform(-0.004, 0.004)))
+        for i in range(meals_each):
+            meals.append(place(f"meal {n}.{i}", PlaceType.FOOD, lat + rng.uniform(-0.004, 0.004), lon + rng.uniform(-0.004, 0.004)))
+    rng.shuffle(tours)
+    rng.shuffle(meals)
+    return tours, meals
+
+
+def neighbourhoods(day):
+    return {p.name.split()[1].split(".")[0] for p in day}
+
+
+def test_each_day_keeps_to_one_neighbourhood():
+    tours, meals = neighbourhood_places()
+
+    day_tours, day_meals = assign_to_days(tours, meals, [3, 3, 3], [2, 2, 2], center=(40.75, -73.95))
+
+    for tours_of_day, meals_of_day in zip(day_tours, day_meals):
+        assert len(neighbourhoods(tours_of_day + meals_of_day)) == 1
+    assert sorted(next(iter(neighbourhoods(t + m))) for t, m in zip(day_tours, day_meals)) == ["0", "1", "2"]
+
+
+def test_days_get_exactly_their_share():
+    tours, meals = neighbourhood_places(tours_each=4, meals_each=3)
+
+    day_tours, day_meals = assign_to_days(tours, meals, [5, 4, 3], [3, 3, 3])
+
+    assert [len(day) for day in day_tours] == [5, 4, 3]
+    assert [len(day) for day in day_meals] == [3, 3, 3]
+    assert sorted(id(p) for day in day_tours for p in day) == sorted(id(p) for p in tours)
+    assert sorted(id(p) for day in day_meals for p in day) == sorted(id(p) for p in meals)
+
+
+def test_places_without_coordinates_fill_the_remaining_slots():
+    tours, meals = neighbourhood_places(tours_each=1, meals_each=0)
+    unplaced = [place("mystery tour", PlaceType.TOUR), place("another", PlaceType.TOUR)]
+
+    day_tours, _ = assign_to_days(tours + unplaced, [], [2, 2, 1], [0, 0, 0])
+
+    assert [len(day) for day in day_tours] == [2, 2, 1]
+    assigned = [p for day in day_tours for p in day]
+    assert all(p in assigned for p in unplaced)
+
+
+def test_only_unlocated_places_keep_their_order():
+    unplaced = [place(f"tour {i}", PlaceType.TOUR) for i in range(4)]
+
+    day_tours, day_meals = assign_to_days(unplaced, [], [2, 2], [0, 0])
+
+    assert day_tours == [unplaced[:2], unplaced[2:]]
+    assert day_meals == [[], []]
+
+
+def test_assignment_is_deterministic():
+    first = assign_to_days(*neighbourhood_places(seed=3), [3, 3, 3], [2, 2, 2])
+    second = assign_to_days(*neighbourhood_places(seed=3), [3, 3, 3], [2, 2, 2])
+
+    assert [[p.name for p in day] for day in first[0] + first[1]] == [[p.name for p in day] for day in second[0] + second[1]]
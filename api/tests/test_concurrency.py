@@ -0,0 +1,111 @@
+import threading
+import time
+
+import search
+from concurrency import AdaptiveLimit, RateLimiter, Throttled
+
+
+def test_fast_calls_grow_the_limit_up_to_the_maximum():
+    limit = AdaptiveLimit(initial=2, minimum=1, maximum=4, target_latency=1.0)
+
+    for _ in range(2):
+        limit.observe(0.1)
+    assert limit.stats()["limit"] == 2
+
+    for _ in range(100):
+        limit.observe(0.1)
+    assert limit.stats()["limit"] == 4
+
+
+def test_slow_calls_and_throttling_shrink_the_limit_to_the_minimum():
+    limit = AdaptiveLimit(initial=20, minimum=2, maximum=20, target_latency=1.0)
+
+    limit.observe(5.0)
+    assert limit.stats()["limit"] == 18
+    limit.observe(0.1, throttled=True)
+    assert limit.stats()["limit"] == 9
+
+    for _ in range(10):
+        limit.observe(0.1, throttled=True)
+    assert limit.stats() == {"limit": 2, "in_flight": 0, "throttled": 11, "slow": 1}
+
+
+def test_acquire_waits_for_a_released_slot():
+    limit = AdaptiveLimit(initial=1, minimum=1, maximum=1, target_latency=1.0)
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (limit.acquire(), acquired.set()), daemon=True).start()
+    assert not acquired.wait(0.1)
+
+    limit.release()
+    assert acquired.wait(1)
+
+
+def test_rate_limiter_allows_a_burst_then_the_rate():
+    limiter = RateLimiter(rate=20, burst=5)
+    started = time.monotonic()
+
+    for _ in range(10):
+        assert limiter.acquire()
+
+    assert 0.2 <= time.monotonic() - started < 0.5
+
+
+def test_rate_limiter_pause_holds_callers_and_can_be_cancelled():
+    limiter = RateLimiter(rate=100)
+    limiter.pause(5)
+    cancelled = threading.Event()
+    threading.Timer(0.1, cancelled.set).start()
+    started = time.monotonic()
+
+    assert not limiter.acquire(cancelled)
+    assert time.monotonic() - started < 1
+
+
+def test_rate_of_zero_never_waits():
+    limiter = RateLimiter(rate=0)
+    limiter.pause(5)
+
+    assert limiter.acquire()
+
+
+def test_throttled_batch_backs_off_and_retries(monkeypatch):
+    limit = AdaptiveLimit(initial=8, minimum=1, maximum=8, target_latency=10.0)
+    outcomes = [Throttled("slow down", retry_after=0.1), {"H1": {"name": "Hotel", "totals": [100.0]}}]
+    monkeypatch.setattr(search, "amadeus_offers_limit", limit)
+    monkeypatch.setattr(search, "amadeus_rate", RateLimiter(rate=100))
+    monkeypatch.setattr(search, "hotel_offer_cache", None)
+
+    def process(*args):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(search, "_process_batch", process)
+    started = time.monotonic()
+
+    result = search._run_batch(threading.Event(), "token", [], {}, {})
+
+    assert result == {"H1": {"name": "Hotel", "totals": [100.0]}}
+    assert time.monotonic() - started >= 0.1
+    assert limit.stats()["throttled"] == 1 and limit.stats()["limit"] == 4
+
+
+def test_cancelled_batch_stops_retrying(monkeypatch):
+    monkeypatch.setattr(search, "amadeus_rate", RateLimiter(rate=100))
+    monkeypatch.setattr(search, "amadeus_offers_limit", AdaptiveLimit(1, 1, 1, 10.0))
+    calls = []
+
+    def process(*args):
+        calls.append(1)
+        raise Throttled("slow down", retry_after=5)
+
+    monkeypatch.setattr(search, "_process_batch", process)
+    cancelled = threading.Event()
+    threading.Timer(0.1, cancelled.set).start()
+
+    assert search._run_batch(cancelled, "token", [], {}, {}) == {}
+    assert calls == [1]
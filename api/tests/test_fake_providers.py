@@ -0,0 +1,74 @@
+import json
+
+import pytest
+import requests
+
+from bench import load_test
+
+GEOCODE = "/maps/api/geocode/json"
+OFFERS = "/v3/shopping/hotel-offers"
+
+
+@pytest.fixture
+def start(request):
+    """Start a provider process with the given FAKE_* settings; stopped after the test."""
+    def start(**settings):
+        process, url = load_test.start_providers(latency_ms=0, **settings)
+        request.addfinalizer(lambda: (process.terminate(), process.wait()))
+        return url
+    return start
+
+
+def offers(url, hotel_ids="FAKE0001,FAKE0002,FAKE0003"):
+    return requests.get(f"{url}{OFFERS}", params={"hotelIds": hotel_ids, "checkInDate": "2026-12-01", "checkOutDate": "2026-12-04"})
+
+
+def test_responses_are_a_function_of_the_request_and_seed(fake_providers, start):
+    first = offers(fake_providers).json()
+
+    assert offers(fake_providers).json() == first
+    assert offers(start()).json() == first
+    assert offers(start(seed=1)).json() != first
+
+
+def test_stats_count_requests_per_route_until_reset(fake_providers):
+    requests.post(f"{fake_providers}/_fake/reset")
+    offers(fake_providers)
+    offers(fake_providers)
+    requests.get(f"{fake_providers}{GEOCODE}", params={"address": "1 Main St"})
+
+    stats = requests.get(f"{fake_providers}/_fake/stats").json()
+    assert stats[OFFERS]["requests"] == 2 and stats[GEOCODE]["requests"] == 1
+
+    requests.post(f"{fake_providers}/_fake/reset")
+    assert requests.get(f"{fake_providers}/_fake/stats").json() == {}
+
+
+def test_injected_errors_repeat_run_to_run(start):
+    settings = {"error_rate": 0.5, "error_status": 429}
+    runs = []
+    for url in (start(**settings), start(**settings)):
+        responses = [offers(url) for _ in range(12)]
+        runs.append([response.status_code for response in responses])
+        assert all(response.headers.get("retry-after") == "1" for response in responses if response.status_code == 429)
+
+    assert runs[0] == runs[1]
+    assert set(runs[0]) == {200, 429}
+
+
+def test_fixtures_answer_before_synthetic_responses(start, tmp_path):
+    path = tmp_path / "fixtures.json"
+    path.write_text(json.dumps([{
+        "path": GEOCODE,
+        "query": {"address": "Recorded Pl"},
+        "status": 200,
+        "body": {"status": "OK", "results": [{"formatted_address": "From the fixture"}]},
+    }]))
+    url = start(fixtures=str(path))
+
+    recorded = requests.get(f"{url}{GEOCODE}", params={"address": "Recorded Pl", "key": "x"}).json()
+    synthetic = requests.get(f"{url}{GEOCODE}", params={"address": "Other Pl"}).json()
+
+    assert recorded["results"][0]["formatted_address"] == "From the fixture"
+    assert synthetic["results"][0]["formatted_address"] == "Other Pl"
+    assert requests.get(f"{url}/_fake/stats").json()[GEOCODE]["fixtures"] == 1
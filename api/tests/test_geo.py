@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+import geo
+import search
+
+
+class Point:
+    def __init__(self, lat, lon):
+        self.lat = lat
+        self.lon = lon
+
+
+def scattered(n, seed, spread=0.2):
+    rng = random.Random(seed)
+    return [Point(40.75 + rng.uniform(-spread, spread), -73.98 + rng.uniform(-spread, spread)) for _ in range(n)]
+
+
+def distance(point, lat=40.75, lon=-73.98):
+    return float(geo.haversine_miles(lat, lon, point.lat, point.lon))
+
+
+@pytest.mark.parametrize("n", [10, 300, 3000])
+def test_within_matches_a_full_scan(n):
+    points = scattered(n, n)
+    index = geo.PlaceIndex().add_all(points)
+
+    for radius in (0.5, 2, 10, 50):
+        assert index.within(40.75, -73.98, radius) == [p for p in points if distance(p) <= radius]
+
+
+@pytest.mark.parametrize("n", [10, 300, 3000])
+def test_nearest_matches_a_full_sort(n):
+    points = scattered(n, n)
+    index = geo.PlaceIndex().add_all(points)
+
+    nearest = index.nearest(40.75, -73.98, k=7)
+
+    assert [p for p, _ in nearest] == sorted(points, key=distance)[:7]
+    assert [miles for _, miles in nearest] == pytest.approx([distance(p) for p, _ in nearest])
+
+
+def test_nearest_within_max_miles():
+    index = geo.PlaceIndex().add_all(scattered(500, 1))
+    assert all(miles <= 1 for _, miles in index.nearest(40.75, -73.98, k=50, max_miles=1))
+
+
+def test_region_key_is_the_index_cell():
+    index = geo.PlaceIndex(cell_degrees=0.01)
+    assert geo.region_key(40.7512, -73.9876, 0.01) == "%d,%d" % index.cell(40.7512, -73.9876)
+    assert geo.region_key(40.7512, -73.9876, 0.01) == geo.region_key(40.7519, -73.9871, 0.01)
+    assert geo.region_key(40.75, -73.98, 0) == "40.750000,-73.980000"
+
+
+def test_hotels_come_back_nearest_first():
+    rng = random.Random(3)
+    hotels = [({"hotelId": str(i)}, [40.75 + rng.uniform(-0.1, 0.1), -73.98 + rng.uniform(-0.1, 0.1), "addr"]) for i in range(300)]
+    hotels.append(({"hotelId": "unplaced"}, [None, None, "addr"]))
+
+    ordered = search._nearest_first(40.75, -73.98, hotels)
+
+    distances = [distance(Point(loc[0], loc[1])) for _, loc in ordered[:-1]]
+    assert distances == sorted(distances)
+    assert ordered[-1][0]["hotelId"] == "unplaced"
+    assert all(isinstance(loc, tuple) for _, loc in ordered)
+
+
+def test_place_search_drops_located_places_outside_the_radius():
+    items = [
+        {"name": "near", "geocodes": {"main": {"latitude": 40.751, "longitude": -73.981}}},
+        {"name": "far", "geocodes": {"main": {"latitude": 41.5, "longitude": -73.98}}},
+        {"name": "no coordinates"},
+    ]
+
+    places = search._parse_places(items, "museum", radius=2, location_coords={"lat": 40.75, "lng": -73.98})
+
+    assert [p.name for p in places] == ["near", "no coordinates"]
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+import geocoding
+from cache import MemoryCache, ReadThroughCache
+from place import Place, PlaceType
+
+
+class FakeGeocoder:
+    """googlemaps-style geocode()/reverse_geocode(); "nowhere" addresses find nothing."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def geocode(self, address):
+        with self.lock:
+            self.calls.append(("fwd", address))
+        time.sleep(self.delay)
+        if "nowhere" in address.lower():
+            return []
+        return [{"geometry": {"location": {"lat": 40.0 + len(address) / 100, "lng": -73.0}}, "formatted_address": address.title()}]
+
+    def reverse_geocode(self, latlng):
+        with self.lock:
+            self.calls.append(("rev", latlng))
+        return [{"formatted_address": f"{latlng[0]} Fake St"}]
+
+
+@pytest.fixture
+def geocoder(monkeypatch):
+    fake = FakeGeocoder()
+    monkeypatch.setattr(geocoding, "get_gmaps_client", lambda: fake)
+    monkeypatch.setattr(geocoding, "geocode_cache", ReadThroughCache(MemoryCache(), ttl=60))
+    return fake
+
+
+def test_normalize_address():
+    assert geocoding.normalize_address("  1 Main  St ,New York,  NY. ") == "1 main st, new york, ny"
+
+
+def test_equivalent_addresses_share_one_lookup(geocoder):
+    first = geocoding.geocode("1 Main St, New York")
+
+    assert geocoding.geocode(" 1 main st ,  new york ") == first
+    assert first["lat"] and first["lng"] == -73.0
+    assert len(geocoder.calls) == 1
+
+
+def test_addresses_that_find_nothing_are_cached(geocoder):
+    assert geocoding.geocode("Nowhere Rd") is None
+    assert geocoding.geocode("nowhere rd") is None
+    assert len(geocoder.calls) == 1
+
+
+def test_reverse_lookups_share_a_key_within_a_metre(geocoder):
+    assert geocoding.reverse_geocode(40.712801, -74.006) == geocoding.reverse_geocode(40.7128012, -74.0060004)
+    assert len(geocoder.calls) == 1
+
+
+def test_fill_locations_geocodes_and_reverse_geocodes(geocoder):
+    by_address = Place("Museum", "1 Main St", PlaceType.TOUR)
+    by_coords = Place("Cafe", None, PlaceType.FOOD, lat=40.5, lon=-73.5)
+    lost = Place("Lost", "Nowhere Rd", PlaceType.TOUR)
+
+    geocoding.fill_locations([by_address, None, by_coords, lost])
+
+    assert by_address.lat is not None and by_address.location == f"{by_address.lat},{by_address.lon}"
+    assert by_coords.address == "40.5 Fake St" and by_coords.location == "40.5,-73.5"
+    assert lost.lat is None and lost.location == "Nowhere Rd"
+
+
+def test_fill_locations_runs_lookups_together(geocoder):
+    geocoder.delay = 0.2
+    places = [Place(f"Stop {i}", f"{i} Main St", PlaceType.TOUR) for i in range(6)]
+    started = time.monotonic()
+
+    geocoding.fill_locations(places)
+
+    assert time.monotonic() - started < 0.2 * len(places) / 2
+    assert all(place.lat is not None for place in places)
+
+
+def test_fill_locations_leaves_late_places_unchanged(geocoder):
+    geocoder.delay = 1.0
+    place = Place("Slow", "9 Slow St", PlaceType.TOUR)
+
+    geocoding.fill_locations([place], deadline=time.monotonic() + 0.1)
+
+    assert place.lat is None
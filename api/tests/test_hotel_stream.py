@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+import geo
+import search
+from bench import load_test
+
+HOTELS = 60
+BATCHES = HOTELS // search.AMADEUS_OFFERS_BATCH_SIZE
+CENTER = {"lat": 40.758, "lng": -73.9855}
+OFFERS = "/v3/shopping/hotel-offers"
+
+
+@pytest.fixture(scope="module")
+def providers():
+    process, url = load_test.start_providers(latency_ms=100, hotels=HOTELS)
+    yield url
+    process.terminate()
+    process.wait()
+
+
+@pytest.fixture(scope="module", params=["threaded", "async"])
+def api(request, providers):
+    port = load_test._free_port()
+    env = load_test._app_env(providers)
+    # One batch at a time, so the order and the number of batches sent are predictable
+    env.update({"AMADEUS_INITIAL_CONCURRENCY": "1", "AMADEUS_MIN_CONCURRENCY": "1", "AMADEUS_MAX_CONCURRENCY": "1"})
+    server = load_test._start_server(request.param, port, env, threads=4)
+    load_test._wait_for_port(port)
+    yield f"http://127.0.0.1:{port}"
+    server.terminate()
+    server.wait()
+
+
+@pytest.fixture
+def offer_requests(providers):
+    requests.post(f"{providers}/_fake/reset")
+    return lambda: requests.get(f"{providers}/_fake/stats").json().get(OFFERS, {}).get("requests", 0)
+
+
+def stream(api, **fields):
+    payload = dict(load_test.PAYLOADS["search-hotels"], location_coords=CENTER, **fields)
+    return requests.post(f"{api}/api/search-hotels/stream", json=payload, stream=True, timeout=30)
+
+
+def distance(hotel):
+    return float(geo.haversine_miles(CENTER["lat"], CENTER["lng"], hotel["lat"], hotel["lon"]))
+
+
+def wait_until_idle(count, settle=0.5):
+    """The provider's request count once it has stopped changing."""
+    seen = count()
+    while True:
+        time.sleep(settle)
+        now = count()
+        if now == seen:
+            return now
+        seen = now
+
+
+def test_stream_sends_hotels_nearest_first_then_done(api, offer_requests):
+    with stream(api, limit=100) as response:
+        events = [json.loads(line) for line in response.iter_lines() if line.strip()]
+
+    hotels = [event["hotel"] for event in events[:-1]]
+    assert {event["type"] for event in events[:-1]} == {"hotel"}
+    assert events[-1] == {"type": "done", "count": len(hotels)}
+    assert hotels
+    assert [distance(hotel) for hotel in hotels] == sorted(distance(hotel) for hotel in hotels)
+    assert offer_requests() == BATCHES
+
+
+def test_stream_stops_at_the_limit(api, offer_requests):
+    with stream(api, limit=3) as response:
+        events = [json.loads(line) for line in response.iter_lines() if line.strip()]
+
+    assert [event["type"] for event in events] == ["hotel"] * 3 + ["done"]
+    assert events[-1]["count"] == 3
+    assert wait_until_idle(offer_requests) <= 2
+
+
+def test_closing_the_stream_stops_sending_batches(api, offer_requests):
+    # Over budget everywhere: nothing but keep-alive lines until every batch is priced
+    with stream(api, max_price=1) as response:
+        # Byte by byte: without chunked encoding, a bigger read would wait for the whole body
+        lines = response.iter_lines(chunk_size=1)
+        assert [next(lines), next(lines)] == [b"", b""]
+
+    assert wait_until_idle(offer_requests) < BATCHES
+
+
+@pytest.fixture
+def fake_amadeus(providers, offer_requests, monkeypatch):
+    monkeypatch.setattr(search, "AMADEUS_BASE_URL", providers)
+    monkeypatch.setattr(search, "get_amadeus_access_token", lambda: "fake-token")
+    monkeypatch.setattr(search, "hotel_offer_cache", None)
+    return search.get_hotels(CENTER["lat"], CENTER["lng"], 5)
+
+
+def priced(hotels, max_price, **kwargs):
+    return search.iter_priced_hotels(max_price, "2026-12-01", "2026-12-04", hotels, 3, **kwargs)
+
+
+def test_iter_priced_hotels_yields_up_to_the_limit(fake_amadeus, offer_requests):
+    hotels = list(priced(fake_amadeus, 900, limit=10))
+
+    assert len({hotel["hotelId"] for hotel in hotels}) == 10
+    assert all(hotel["price"] * 3 <= 900 for hotel in hotels)
+    assert wait_until_idle(offer_requests) < BATCHES
+
+
+def test_iter_priced_hotels_stops_when_closed(fake_amadeus, offer_requests):
+    hotels = priced(fake_amadeus, 1, keep_alive=True)
+
+    assert next(hotels) is None
+    hotels.close()
+
+    assert wait_until_idle(offer_requests) < BATCHES
+
+
+def test_iter_priced_hotels_stops_when_told(fake_amadeus, offer_requests):
+    stop = threading.Event()
+    hotels = priced(fake_amadeus, 1, stop=stop, keep_alive=True)
+
+    assert next(hotels) is None
+    stop.set()
+
+    assert not any(hotels)
+    assert wait_until_idle(offer_requests) < BATCHES
@@ -0,0 +1,43 @@
+import pytest
+import requests
+
+import http_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_sessions():
+    http_client.close_all()
+    yield
+    http_client.close_all()
+
+
+def geocode_url(base, address="1 Main St"):
+    return f"{base}/maps/api/geocode/json?address={address}"
+
+
+def test_one_session_per_host():
+    assert http_client.session_for("https://a.example/x") is http_client.session_for("https://a.example/y?z=1")
+    assert http_client.session_for("https://a.example/x") is not http_client.session_for("https://b.example/x")
+
+
+def test_sequential_calls_reuse_one_connection(fake_providers):
+    for i in range(10):
+        assert http_client.get(geocode_url(fake_providers, f"{i} Main St")).status_code == 200
+
+    pools = http_client.session_for(fake_providers).get_adapter(fake_providers).poolmanager.pools
+    [pool] = [pools[key] for key in pools.keys()]
+    assert pool.num_connections == 1
+    assert pool.num_requests == 10
+
+
+def test_timeout_override_applies(fake_providers):
+    with pytest.raises(requests.Timeout):
+        http_client.get(geocode_url(fake_providers), timeout=0.001)
+
+
+def test_close_all_starts_new_sessions(fake_providers):
+    session = http_client.session_for(fake_providers)
+
+    http_client.close_all()
+
+    assert http_client.session_for(fake_providers) is not session
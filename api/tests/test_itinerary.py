@@ -0,0 +1,108 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+
+import itenerary
+from itenerary import Itinerary, optimize_all
+from place import Place, PlaceType
+from travel_matrix import TravelTimeMatrix
+
+
+def day(n, seed):
+    """An itinerary of a hotel and n tours with a ready distance matrix and seeded rng."""
+    coords = np.random.default_rng(seed).uniform(0, 5000, (n + 1, 2))
+    itinerary = Itinerary()
+    itinerary.add_place(Place("Hotel", "0,0", PlaceType.HOTEL))
+    for i in range(n):
+        itinerary.add_place(Place(f"Stop {i}", f"{i + 1},0", PlaceType.TOUR))
+    itinerary.distance_matrix = np.linalg.norm(coords[:, None] - coords[None, :], axis=-1)
+    itinerary.matrix_places = list(itinerary.places)
+    itinerary.rng = random.Random(seed)
+    # Optimize from a shuffled order, hotel not first
+    itinerary.places = itinerary.places[::-1]
+    return itinerary
+
+
+def names(itinerary):
+    return [place.name for place in itinerary.places]
+
+
+@pytest.fixture
+def days():
+    return [day(n, seed) for seed, n in enumerate([6, 15, 20, 9])]
+
+
+def test_pool_gives_the_same_days_as_inline(days, monkeypatch):
+    inline = copy.deepcopy(days)
+    monkeypatch.setattr(itenerary, "OPTIMIZER_WORKERS", 1)
+    optimize_all(inline)
+
+    monkeypatch.setattr(itenerary, "OPTIMIZER_WORKERS", 2)
+    results = optimize_all(days)
+
+    assert [names(it) for it in days] == [names(it) for it in inline]
+    assert [result.cost for result in results] == pytest.approx([it.optimal for it in inline])
+
+
+def test_days_are_reordered_in_place_with_the_hotel_first(days, monkeypatch):
+    monkeypatch.setattr(itenerary, "OPTIMIZER_WORKERS", 2)
+    before = [sorted(names(it)) for it in days]
+
+    results = optimize_all(days)
+
+    assert [sorted(names(it)) for it in days] == before
+    assert all(it.places[0].type == PlaceType.HOTEL for it in days)
+    assert all(it.final == it.places for it in days)
+    assert [it.optimal for it in days] == [result.cost for result in results]
+
+
+def test_failed_day_keeps_its_order(monkeypatch):
+    monkeypatch.setattr(itenerary, "OPTIMIZER_WORKERS", 1)
+    broken = day(5, 0)
+    broken.distance_matrix = None
+    order = names(broken)
+
+    assert optimize_all([broken, day(5, 1)])[0] is None
+    assert names(broken) == order
+
+
+def test_day_matrix_is_sliced_from_the_trip_matrix():
+    hotel, a, b = Place("Hotel", "0,0", PlaceType.HOTEL), Place("A", "1,0", PlaceType.TOUR), Place("B", "2,0", PlaceType.TOUR)
+    trip_matrix = TravelTimeMatrix()
+    trip_matrix.add_group([p.location_key for p in (hotel, a, b)])
+    trip_matrix.durations[:3, :3] = [[0, 100, np.inf], [100, 0, 50], [200, 50, 0]]
+
+    itinerary = Itinerary()
+    for place in (hotel, a, b):
+        itinerary.add_place(place)
+    itinerary.create_distance_matrix(trip_matrix)
+
+    assert itinerary.distance_between(hotel, b) == itenerary.UNREACHABLE_SECONDS
+    assert itinerary.distance_between(b, hotel) == 200
+    assert itinerary.cost_of([hotel, a, b]) == 100 + 50 + 200
+
+
+def test_day_with_unfetched_legs_has_no_matrix():
+    itinerary = Itinerary()
+    itinerary.add_place(Place("Hotel", "0,0", PlaceType.HOTEL))
+    itinerary.add_place(Place("A", "1,0", PlaceType.TOUR))
+
+    itinerary.create_distance_matrix(TravelTimeMatrix())
+
+    assert not itinerary.has_distance_matrix()
+
+
+def test_places_at_the_same_location_keep_their_own_rows():
+    first, second = Place("Cafe", "1,0", PlaceType.FOOD), Place("Museum", "1,0", PlaceType.TOUR)
+    trip_matrix = TravelTimeMatrix()
+    trip_matrix.add_group([first.location_key])
+    trip_matrix.durations[0, 0] = 0
+
+    itinerary = Itinerary()
+    itinerary.add_place(first)
+    itinerary.add_place(second)
+    itinerary.create_distance_matrix(trip_matrix)
+
+    assert itinerary.rows_of([first, second]).tolist() == [0, 1]
@@ -0,0 +1,121 @@
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+import logs
+import pipeline
+
+
+def record(msg="Searching %s", args=("hotels",), **extra):
+    entry = logging.makeLogRecord({"name": "search", "levelno": logging.INFO, "levelname": "INFO", "msg": msg, "args": args, **extra})
+    entry.request_id = extra.get("request_id", "abc123")
+    return entry
+
+
+@pytest.fixture
+def queued():
+    """A logger wired like logs.setup() (filter, bounded queue, writer thread) writing JSON to a buffer."""
+    out = io.StringIO()
+    stream = logging.StreamHandler(out)
+    stream.setFormatter(logs.JsonFormatter())
+    handler = logs._QueueHandler(queue.Queue(maxsize=100))
+    handler.addFilter(logs._ContextFilter())
+    listener = logs._QueueListener(handler.queue, stream)
+    log = logging.getLogger("tests.logs")
+    log.addHandler(handler)
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    listener.start()
+
+    def lines():
+        listener.stop()
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    yield log, handler, lines
+    log.removeHandler(handler)
+
+
+def test_new_request_id_keeps_a_sane_incoming_id():
+    assert logs.new_request_id("frontend-42.a_b") == "frontend-42.a_b"
+
+
+@pytest.mark.parametrize("incoming", [None, "", "has spaces", "x" * 65, "new\nline"])
+def test_new_request_id_replaces_a_missing_or_odd_id(incoming):
+    rid = logs.new_request_id(incoming)
+
+    assert rid != incoming
+    assert len(rid) == 16
+
+
+def test_json_lines_carry_the_request_id_and_extra_fields():
+    entry = json.loads(logs.JsonFormatter().format(record(tours=["museum"], duration=3)))
+
+    assert entry["msg"] == "Searching hotels"
+    assert entry["request_id"] == "abc123"
+    assert (entry["tours"], entry["duration"]) == (["museum"], 3)
+    assert {"ts", "level", "logger"} <= set(entry)
+
+
+def test_text_lines_put_extra_fields_after_the_message():
+    line = logs.TextFormatter().format(record(duration=3))
+
+    assert line.endswith("INFO [abc123] search: Searching hotels duration=3")
+
+
+def test_records_are_stamped_with_the_request_id_of_the_calling_thread(queued):
+    log, _, lines = queued
+    token = logs.request_id.set("req-1")
+    try:
+        log.info("In the view")
+        pipeline.run_concurrently([lambda: log.info("In a worker")])
+    finally:
+        logs.request_id.reset(token)
+    log.info("Between requests")
+
+    assert [(line["msg"], line["request_id"]) for line in lines()] == [
+        ("In the view", "req-1"), ("In a worker", "req-1"), ("Between requests", "-"),
+    ]
+
+
+def test_arguments_and_tracebacks_are_rendered_before_queueing(queued):
+    log, _, lines = queued
+    places = ["museum"]
+    log.info("Places: %s", places)
+    places.append("park")
+    try:
+        raise ValueError("bad place")
+    except ValueError:
+        log.exception("Failed")
+
+    first, second = lines()
+    assert first["msg"] == "Places: ['museum']"
+    assert "ValueError: bad place" in second["exc"]
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = logs._QueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(record())
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_debug_records_are_sampled(monkeypatch):
+    monkeypatch.setattr(logs, "LOG_DEBUG_SAMPLE_RATE", 0.0)
+    sampling = logs._ContextFilter()
+    debug = record()
+    debug.levelno = logging.DEBUG
+
+    assert not sampling.filter(debug)
+    assert sampling.filter(record())
+
+
+def test_setup_installs_one_queue_handler():
+    logs.setup()
+    logs.setup()
+
+    assert sum(isinstance(handler, logs._QueueHandler) for handler in logging.getLogger().handlers) == 1
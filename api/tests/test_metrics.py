@@ -0,0 +1,103 @@
+import app
+import config
+import metrics
+import pipeline
+
+
+def test_counter_renders_one_line_per_label_set():
+    counter = metrics.Counter("test_calls_total", "Calls")
+    counter.inc(endpoint="/a", status=200)
+    counter.inc(2, endpoint="/a", status=200)
+    counter.inc(endpoint='say "hi"\n', status=500)
+
+    assert counter.render() == [
+        'test_calls_total{endpoint="/a",status="200"} 3',
+        'test_calls_total{endpoint="say \\"hi\\"\\n",status="500"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route="/x")
+
+    assert histogram.render() == [
+        'test_seconds_bucket{route="/x",le="0.1"} 2',
+        'test_seconds_bucket{route="/x",le="1.0"} 3',
+        'test_seconds_bucket{route="/x",le="+Inf"} 4',
+        'test_seconds_sum{route="/x"} 3.65',
+        'test_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_metrics_are_registered_once_per_name():
+    first = metrics.counter("test_registered_total", "Registered")
+    first.inc()
+
+    assert metrics.counter("test_registered_total", "Registered again") is first
+    assert "# TYPE test_registered_total counter\ntest_registered_total 1\n" in metrics.render()
+
+
+def test_spans_add_up_per_stage_in_the_trace():
+    trace, token = metrics.start_trace()
+    try:
+        with metrics.span("fetch"):
+            pass
+        with metrics.span("fetch"):
+            pass
+        metrics.record("optimize", 0.25)
+    finally:
+        metrics.end_trace(token)
+
+    entries = trace.server_timing().split(", ")
+    assert [entry.split(";")[0] for entry in entries] == ["fetch", "optimize", "total"]
+    assert entries[0].endswith('desc="2x"')
+    assert entries[1] == 'optimize;dur=250.0;desc="1x"'
+
+
+def test_worker_threads_record_into_the_request_trace():
+    trace, token = metrics.start_trace()
+    try:
+        pipeline.run_concurrently([lambda: metrics.record("lookup", 0.01) for _ in range(3)])
+    finally:
+        metrics.end_trace(token)
+
+    assert trace.stages["lookup"][1] == 3
+
+
+def test_spans_outside_a_request_only_feed_the_histogram():
+    with metrics.span("test_untraced"):
+        pass
+
+    assert 'tripplanner_stage_duration_seconds_count{stage="test_untraced"} 1' in metrics.render()
+
+
+def test_metrics_endpoint_and_server_timing_header(monkeypatch):
+    monkeypatch.setattr(config, "SERVER_TIMING", True)
+    client = app.app.test_client()
+
+    response = client.get("/api/metrics")
+
+    assert response.mimetype == "text/plain"
+    assert "# TYPE tripplanner_http_request_duration_seconds histogram" in response.get_data(as_text=True)
+    assert response.headers["Server-Timing"].startswith("total;dur=")
+    assert response.headers["Timing-Allow-Origin"] == config.FRONTEND_URL
+    assert 'route="/api/metrics",status="200"' in client.get("/api/metrics").get_data(as_text=True)
+
+
+def test_server_timing_header_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(config, "SERVER_TIMING", False)
+
+    assert "Server-Timing" not in app.app.test_client().get("/api/metrics").headers
+
+
+def test_label_values_of_mixed_types_render():
+    counter = metrics.Counter("test_provider_total", "Provider calls")
+    counter.inc(endpoint="/a", status=200)
+    counter.inc(endpoint="/a", status="error")
+    counter.inc(endpoint="/a", status="200")
+
+    assert counter.render() == [
+        'test_provider_total{endpoint="/a",status="200"} 2',
+        'test_provider_total{endpoint="/a",status="error"} 1',
+    ]
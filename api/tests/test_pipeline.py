@@ -0,0 +1,106 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pipeline
+
+
+def sleeper(seconds, value):
+    def task():
+        time.sleep(seconds)
+        return value
+    return task
+
+
+def failing():
+    raise RuntimeError("provider down")
+
+
+def test_results_come_back_in_task_order():
+    tasks = [sleeper(0.05 * (3 - i), i) for i in range(3)]
+
+    assert pipeline.run_concurrently(tasks) == [0, 1, 2]
+
+
+def test_tasks_run_at_the_same_time():
+    started = time.monotonic()
+
+    pipeline.run_concurrently([sleeper(0.2, i) for i in range(5)], max_workers=5)
+
+    assert time.monotonic() - started < 0.5
+
+
+def test_at_most_max_workers_run_at_once():
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def task():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    pipeline.run_concurrently([task] * 12, max_workers=3)
+
+    assert peak[0] == 3
+
+
+def test_failed_task_gets_the_default():
+    assert pipeline.run_concurrently([sleeper(0, "a"), failing, sleeper(0, "c")], default=[]) == ["a", [], "c"]
+
+
+def test_late_task_gets_the_default_at_the_deadline():
+    started = time.monotonic()
+
+    results = pipeline.run_concurrently([sleeper(0, "fast"), sleeper(2, "slow")], deadline=pipeline.new_deadline(0.2), default=None)
+
+    assert results == ["fast", None]
+    assert time.monotonic() - started < 1
+
+
+def test_tasks_see_the_callers_context():
+    var = contextvars.ContextVar("var", default=None)
+    var.set("request-1")
+
+    assert pipeline.run_concurrently([var.get, var.get]) == ["request-1", "request-1"]
+
+
+def test_remaining():
+    assert pipeline.remaining(None) is None
+    assert pipeline.remaining(time.monotonic() - 1) == 0.0
+    assert 0 < pipeline.remaining(pipeline.new_deadline(10)) <= 10
+
+
+async def async_sleeper(seconds, value):
+    await asyncio.sleep(seconds)
+    return value
+
+
+async def async_failing():
+    raise RuntimeError("provider down")
+
+
+def test_async_results_come_back_in_order_with_defaults():
+    coroutines = [async_sleeper(0.05, "a"), async_failing(), async_sleeper(0, "c"), async_sleeper(2, "late")]
+    started = time.monotonic()
+
+    results = asyncio.run(pipeline.run_concurrently_async(coroutines, deadline=pipeline.new_deadline(0.2), default=[]))
+
+    assert results == ["a", [], "c", []]
+    assert time.monotonic() - started < 1
+
+
+def test_async_lookups_are_bounded_by_max_workers():
+    running, peak = [0], [0]
+
+    async def lookup():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+
+    asyncio.run(pipeline.run_concurrently_async([lookup() for _ in range(10)], max_workers=3))
+
+    assert peak[0] == 3
@@ -0,0 +1,75 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from place import Place, PlaceSet, PlaceType
+
+
+def test_places_have_no_instance_dict():
+    place = Place("Museum", "1 Main St", PlaceType.TOUR)
+
+    assert not hasattr(place, "__dict__")
+    with pytest.raises(AttributeError):
+        place.rating = 5
+
+
+def test_keys_follow_the_fields():
+    place = Place("Museum", "1 Main St", PlaceType.TOUR)
+    assert place.dedupe_key == "museum\x1f1 main st"
+    assert place.location_key == "1 Main St"
+
+    place.name = "MoMA"
+    place.address = "11 W 53rd St"
+    place.location = "40.7614,-73.9776"
+
+    assert place.dedupe_key == "moma\x1f11 w 53rd st"
+    assert place.location_key == "40.7614,-73.9776"
+
+
+def test_location_keys_are_interned():
+    first = Place("A", "".join(["40.7614", ",-73.9776"]), PlaceType.TOUR)
+    second = Place("B", "".join(["40.7614,", "-73.9776"]), PlaceType.FOOD)
+
+    assert first.location_key is second.location_key
+
+
+def test_places_survive_pickling():
+    place = Place("Museum", "1 Main St", PlaceType.TOUR, lat=40.7, lon=-73.9, category="art")
+
+    copy = pickle.loads(pickle.dumps(place))
+
+    assert (copy.name, copy.address, copy.location, copy.type, copy.lat, copy.lon, copy.category) == \
+        ("Museum", "1 Main St", "1 Main St", PlaceType.TOUR, 40.7, -73.9, "art")
+    assert copy.dedupe_key == place.dedupe_key
+
+
+def test_place_set_columns():
+    places = PlaceSet([
+        Place("Cafe", "a", PlaceType.FOOD, lat=1.0, lon=2.0),
+        None,
+        Place("Museum", "b", PlaceType.TOUR),
+        Place("Park", "c", PlaceType.TOUR, lat=3.0, lon=4.0),
+    ])
+
+    assert len(places) == 3
+    assert places.located.tolist() == [True, False, True]
+    assert places.of_type(PlaceType.TOUR).tolist() == [False, True, True]
+    assert np.allclose(places.lats, [1.0, np.nan, 3.0], equal_nan=True)
+    assert [p.name for p in places.take(places.located & places.of_type("TOUR"))] == ["Park"]
+    assert [p.name for p in places.take([2, 0])] == ["Park", "Cafe"]
+
+
+def test_dedupe_keeps_the_first_of_each_name_and_address():
+    places = PlaceSet([
+        Place("Cafe", "1 Main St", PlaceType.FOOD),
+        Place("CAFE", "1 main st", PlaceType.FOOD),
+        Place("Cafe", "2 Main St", PlaceType.FOOD),
+        Place("Park", "3 Main St", PlaceType.TOUR),
+    ])
+    seen = {"park\x1f3 main st"}
+
+    kept = places.dedupe(seen)
+
+    assert [p.address for p in kept] == ["1 Main St", "2 Main St"]
+    assert "cafe\x1f2 main st" in seen
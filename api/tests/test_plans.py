@@ -0,0 +1,84 @@
+import app
+import pipeline
+import plans
+from bench import load_test
+from place import Place, PlaceType
+
+
+def trip_with(*must_visit):
+    return {'must_visit_places': list(must_visit)}
+
+
+def entry_for(trip, search_results, monkeypatch):
+    monkeypatch.setattr(app, 'plan_trip', lambda *args: {'itinerary': []})
+    return app.plan_entry(trip, search_results, pipeline.new_deadline(), seed=1)
+
+
+def test_plan_with_every_must_visit_placed_is_complete(monkeypatch):
+    museum = Place("Museum", "1 Main St", PlaceType.TOUR, lat=40.7, lon=-73.9)
+
+    assert entry_for(trip_with(museum), [[museum]], monkeypatch)['complete']
+
+
+def test_plan_with_an_unplaced_must_visit_is_not_complete(monkeypatch):
+    museum = Place("Museum", "1 Main St", PlaceType.TOUR, lat=40.7, lon=-73.9)
+    lost = Place("Somewhere", "Nowhere Rd", PlaceType.TOUR)
+
+    entry = entry_for(trip_with(museum, lost), [[museum]], monkeypatch)
+
+    assert entry['plan'] == {'itinerary': []}
+    assert not entry['complete']
+
+
+def test_plan_with_an_empty_search_is_not_complete(monkeypatch):
+    assert not entry_for(trip_with(), [[], [object()]], monkeypatch)['complete']
+
+
+def test_plan_cache_keeps_only_complete_plans():
+    assert app.plans.plan_cache.should_cache({'plan': {}, 'complete': True})
+    assert not app.plans.plan_cache.should_cache({'plan': {}, 'complete': False})
+
+
+def key_for(**fields):
+    data = dict(load_test.PAYLOADS["submit"], **fields)
+    trip, error = app.parse_submit_request(data)
+    assert error is None
+    return plans.fingerprint(trip)
+
+
+def test_fingerprint_ignores_case_spacing_tour_order_and_budget():
+    assert key_for(
+        location="  new york,   NY ",
+        selected_tours=["Nature Tour", "Museum Tour", "Nature Tour"],
+        budget=50,
+    ) == key_for()
+
+
+def test_fingerprint_snaps_nearby_coordinates_to_the_grid():
+    base = load_test.PAYLOADS["submit"]["location_coords"]
+    nearby = {"lat": base["lat"] + 0.0001, "lng": base["lng"] - 0.0001}
+    elsewhere = {"lat": base["lat"] + 0.01, "lng": base["lng"]}
+
+    assert key_for(location_coords=nearby) == key_for()
+    assert key_for(location_coords=elsewhere) != key_for()
+
+
+def test_fingerprint_changes_with_anything_that_changes_the_plan():
+    must_visit = [{"name": "Museum", "type": "Tour", "address": "1 Main St"}]
+    variants = [
+        key_for(),
+        key_for(duration=4),
+        key_for(rent_car=True),
+        key_for(radius=10),
+        key_for(selected_tours=["City Tour"]),
+        key_for(food_percentages=[100, 0, 0]),
+        key_for(must_visit_locations=must_visit),
+        key_for(hotel=None),
+    ]
+
+    assert len(set(variants)) == len(variants)
+
+
+def test_seed_is_stable_for_a_fingerprint():
+    assert plans.seed(key_for()) == plans.seed(key_for(budget=50))
+    assert plans.seed(key_for()) != plans.seed(key_for(duration=4))
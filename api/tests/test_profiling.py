@@ -0,0 +1,91 @@
+import json
+import os
+import time
+
+import pytest
+
+import app
+import cache
+import profiling
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_requests_are_not_profiled_without_a_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+
+    assert not profiling.requested(None)
+    assert not profiling.requested("")
+
+
+def test_requests_sending_the_token_are_profiled(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+
+    assert profiling.requested("s3cret")
+    assert not profiling.requested("guess")
+    assert not profiling.requested(None)
+
+
+def test_profile_requests_profiles_everything(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_REQUESTS", True)
+
+    assert profiling.requested(None)
+
+
+def test_strip_secrets_drops_credential_parameters():
+    url = "https://maps.example/geocode/json?address=1+Main+St&key=abc&client_secret=xyz"
+
+    assert profiling.strip_secrets(url) == "https://maps.example/geocode/json?address=1+Main+St"
+
+
+def test_capture_records_provider_responses_without_credentials(profile_dir):
+    capture = profiling.begin("/api/search-hotels", "req-1", {"radius": 5})
+    assert profiling.active() and cache.bypass_reads.get()
+
+    profiling.record_response("POST", "https://amadeus.example/v1/security/oauth2/token", 200, {}, b'{"access_token": "t"}', 0.1)
+    profiling.record_response(
+        "GET", "https://amadeus.example/v3/shopping/hotel-offers?hotelIds=A&key=abc", 429,
+        {"content-type": "application/json", "retry-after": "1", "set-cookie": "x"}, b'{"errors": []}', 0.2,
+    )
+    profiling.record_error("GET", "https://maps.example/geocode/json?key=abc", TimeoutError("slow"))
+    time.sleep(0.05)
+    path = capture.finish(200)
+
+    assert not profiling.active() and not cache.bypass_reads.get()
+    assert capture.finish(500) == path
+    with open(path) as f:
+        saved = json.load(f)
+    token, offers, error = saved["responses"]
+    assert (saved["route"], saved["request_id"], saved["status"], saved["request"]) == ("/api/search-hotels", "req-1", 200, {"radius": 5})
+    assert token["body"] is None
+    assert offers["url"].endswith("hotel-offers?hotelIds=A")
+    assert offers["headers"] == {"content-type": "application/json", "retry-after": "1"}
+    assert offers["body"] == {"errors": []}
+    assert error == {"method": "GET", "url": "https://maps.example/geocode/json", "error": "TimeoutError: slow"}
+    assert os.path.exists(path[:-len(".json")] + ".folded")
+
+
+def test_responses_outside_a_capture_are_ignored(profile_dir):
+    profiling.record_response("GET", "https://maps.example/", 200, {}, b"{}", 0.1)
+
+    assert not profiling.active()
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_flask_names_the_capture_in_a_response_header(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    client = app.app.test_client()
+
+    profiled = client.post("/api/submit", json={}, headers={"X-Profile": "s3cret", "X-Request-ID": "req-2"})
+    plain = client.post("/api/submit", json={})
+
+    assert profiled.status_code == 400
+    name = profiled.headers["X-Profile-Capture"]
+    assert "req-2" in name
+    with open(profile_dir / name) as f:
+        assert json.load(f)["status"] == 400
+    assert "X-Profile-Capture" not in plain.headers
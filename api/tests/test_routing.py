@@ -0,0 +1,158 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from routing import adjacency_violations, alternate, held_karp, local_search, optimize_route, or_opt_gains, tour_cost, two_opt_gains
+
+
+def asymmetric_matrix(n, seed):
+    matrix = np.random.default_rng(seed).uniform(60, 1800, (n, n))
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
+
+
+def brute_force(matrix, order):
+    """Cheapest closed tour from order[0] by trying every ordering of the other stops."""
+    depot, stops = order[0], order[1:]
+    return min(tour_cost(matrix, [depot, *perm]) for perm in itertools.permutations(stops))
+
+
+@pytest.mark.parametrize("n", range(2, 9))
+@pytest.mark.parametrize("seed", range(8))
+def test_held_karp_matches_brute_force(n, seed):
+    matrix = asymmetric_matrix(n, seed)
+    order = np.random.default_rng(seed + 100).permutation(n)
+
+    route, cost = held_karp(matrix, order)
+
+    assert route[0] == order[0]
+    assert sorted(route.tolist()) == list(range(n))
+    assert cost == pytest.approx(tour_cost(matrix, route))
+    assert cost == pytest.approx(brute_force(matrix, order))
+
+
+@pytest.mark.parametrize("n", [5, 12, 13, 20, 30])
+@pytest.mark.parametrize("seed", range(4))
+def test_optimize_route_never_worse_than_input_and_keeps_depot(n, seed):
+    matrix = asymmetric_matrix(n, seed)
+    order = np.random.default_rng(seed + 100).permutation(n)
+
+    result = optimize_route(matrix, order, rng=random.Random(seed), exact_max=12)
+
+    assert result.order[0] == order[0]
+    assert sorted(result.order.tolist()) == list(range(n))
+    assert result.cost <= tour_cost(matrix, order) + 1e-9
+    assert result.method == ("held-karp" if n <= 12 else "local-search")
+
+
+def test_optimize_route_is_deterministic_for_a_seed():
+    matrix = asymmetric_matrix(30, 7)
+
+    first = optimize_route(matrix, rng=random.Random(7))
+    second = optimize_route(matrix, rng=random.Random(7))
+
+    assert first.order.tolist() == second.order.tolist()
+    assert first.starts == second.starts
+
+
+def relocated(order, s, length, p, reverse):
+    """order with the run order[s:s + length] moved into the gap after order[p]."""
+    seg = order[s:s + length][::-1] if reverse else order[s:s + length]
+    if p < s:
+        return np.concatenate((order[:p + 1], seg, order[p + 1:s], order[s + length:]))
+    return np.concatenate((order[:s], order[s + length:p + 1], seg, order[p + 1:]))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_two_opt_gains_are_exact(seed):
+    matrix = asymmetric_matrix(9, seed)
+    order = np.random.default_rng(seed).permutation(9)
+    gains = two_opt_gains(matrix, order)
+
+    for i, j in itertools.combinations(range(9), 2):
+        moved = order.copy()
+        moved[i + 1:j + 1] = moved[i + 1:j + 1][::-1]
+        assert gains[i, j] == pytest.approx(tour_cost(matrix, order) - tour_cost(matrix, moved))
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("length", [1, 2, 3])
+def test_or_opt_gains_are_exact(seed, length):
+    matrix = asymmetric_matrix(9, seed)
+    order = np.random.default_rng(seed).permutation(9)
+
+    for gains, reverse in zip(or_opt_gains(matrix, order, length), (False, True)):
+        for (k, p), gain in np.ndenumerate(gains):
+            if gain == -np.inf:
+                continue
+            moved = relocated(order, k + 1, length, p, reverse)
+            assert moved[0] == order[0]
+            assert gain == pytest.approx(tour_cost(matrix, order) - tour_cost(matrix, moved))
+
+
+def test_local_search_untangles_a_ring():
+    angles = np.linspace(0, 2 * np.pi, 30, endpoint=False)
+    points = np.column_stack((np.cos(angles), np.sin(angles)))
+    matrix = np.linalg.norm(points[:, None] - points[None, :], axis=-1)
+    order = np.random.default_rng(0).permutation(30)
+
+    local_search(matrix, order)
+
+    assert tour_cost(matrix, order) == pytest.approx(tour_cost(matrix, np.arange(30)))
+    assert two_opt_gains(matrix, order).max() <= 1e-9
+
+
+def test_adjacency_violations_mark_legs_between_flagged_stops():
+    violations = adjacency_violations([False, True, True, False, True])
+
+    assert violations.tolist() == [
+        [0, 0, 0, 0, 0],
+        [0, 0, 1, 0, 1],
+        [0, 1, 0, 0, 1],
+        [0, 0, 0, 0, 0],
+        [0, 1, 1, 0, 0],
+    ]
+
+
+def test_alternate_spreads_flagged_stops():
+    flags = [False, True, True, True, False, False, False]
+
+    route = alternate(np.arange(7), flags)
+
+    assert route[0] == 0
+    assert sorted(route.tolist()) == list(range(7))
+    assert not any(flags[a] and flags[b] for a, b in zip(route, np.roll(route, -1)))
+
+
+def clustered_meals(n, meals, seed):
+    """Travel times where the meals sit together, so the shortest tour visits them in a row."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 1000, (n, 2))
+    points[1:meals + 1] = rng.uniform(0, 10, (meals, 2))
+    flags = [0 < i <= meals for i in range(n)]
+    return np.linalg.norm(points[:, None] - points[None, :], axis=-1), flags
+
+
+@pytest.mark.parametrize("n, exact_max", [(8, 12), (20, 12)])
+def test_meals_are_kept_apart_when_possible(n, exact_max):
+    matrix, flags = clustered_meals(n, 3, seed=n)
+
+    free = optimize_route(matrix, rng=random.Random(0), exact_max=exact_max)
+    ruled = optimize_route(matrix, rng=random.Random(0), exact_max=exact_max,
+                           violations=adjacency_violations(flags), flags=flags)
+
+    assert tour_cost(adjacency_violations(flags), free.order) > 0
+    assert ruled.violations == 0
+    assert ruled.cost == pytest.approx(tour_cost(matrix, ruled.order))
+    assert ruled.cost >= free.cost - 1e-9
+
+
+def test_unavoidable_violations_are_minimized_and_reported():
+    # Depot, three meals and one tour: at least one meal follows another
+    matrix, flags = clustered_meals(5, 3, seed=1)
+
+    result = optimize_route(matrix, violations=adjacency_violations(flags), flags=flags)
+
+    assert result.violations == 1
@@ -0,0 +1,102 @@
+import urllib.parse
+
+import pytest
+import requests
+
+import search
+from cache import MemoryCache, ReadThroughCache
+
+
+def query_of(url):
+    return dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+
+
+def test_place_search_sends_the_request_as_given():
+    coords = {"lat": 40.75012, "lng": -73.98034}
+
+    params = query_of(search._place_search_url("New York", "Art Museum", radius=1234.5, location_coords=coords))
+
+    assert params["query"] == "Art Museum"
+    assert params["ll"] == "40.75012,-73.98034"
+    assert params["radius"] == "1234"
+
+
+def test_hotel_radius_is_not_rounded_up():
+    params = query_of(search._place_search_url("New York", "hotel", max_price=200, radius=5, location_coords={"lat": 40.75, "lng": -73.98}))
+
+    assert params["radius"] == "5"
+    assert params["max_price"] == "1"
+
+
+def test_near_identical_searches_share_a_cache_key():
+    key = search._place_search_key("New York", "Art  Museum", radius=1100, location_coords={"lat": 40.75012, "lng": -73.98034})
+
+    assert key == search._place_search_key("New York", "art museum", radius=1200, location_coords={"lat": 40.75041, "lng": -73.98011})
+    assert key != search._place_search_key("New York", "art museum", radius=1300, location_coords={"lat": 40.75041, "lng": -73.98011})
+    assert key != search._place_search_key("New York", "art museum", radius=1100, location_coords={"lat": 40.76, "lng": -73.98011})
+    assert key != search._place_search_key("New York", "art museum", max_price=100, radius=1100, location_coords={"lat": 40.75012, "lng": -73.98034})
+
+
+def test_searches_by_place_name_key_on_the_normalized_name():
+    assert search._place_search_key(" new york,  NY", "Park") == search._place_search_key("New York, NY", "park")
+    assert query_of(search._place_search_url("New York, NY", "park"))["near"] == "New York, NY"
+
+
+def test_empty_hotel_lists_are_not_cached(monkeypatch):
+    found = [[], [[{"hotelId": "H1", "name": "Hotel"}, [40.75, -73.98, "1 Main St"]]]]
+    calls = []
+
+    def fetch(lat, lon, radius_miles):
+        calls.append((lat, lon, radius_miles))
+        return found[len(calls) - 1]
+
+    monkeypatch.setattr(search, "_fetch_hotels", fetch)
+
+    assert search.get_hotels(12.345, 67.89, 5) == []
+    assert [hotel["hotelId"] for hotel, _ in search.get_hotels(12.345, 67.89, 5)] == ["H1"]
+    assert [hotel["hotelId"] for hotel, _ in search.get_hotels(12.345, 67.89, 5)] == ["H1"]
+    assert len(calls) == 2
+
+
+@pytest.fixture
+def fake_amadeus(fake_providers, monkeypatch):
+    monkeypatch.setattr(search, "AMADEUS_BASE_URL", fake_providers)
+    monkeypatch.setattr(search, "get_amadeus_access_token", lambda: "fake-token")
+    monkeypatch.setattr(search, "hotel_list_cache", ReadThroughCache(MemoryCache(), ttl=60, should_cache=bool))
+    monkeypatch.setattr(search, "hotel_offer_cache", MemoryCache(ttl=60))
+    requests.post(f"{fake_providers}/_fake/reset")
+    return lambda path: requests.get(f"{fake_providers}/_fake/stats").json().get(path, {}).get("requests", 0)
+
+
+def test_nearby_hotel_searches_share_the_hotel_list(fake_amadeus):
+    first = search.get_hotels(40.75012, -73.98034, 5)
+
+    assert {hotel["hotelId"] for hotel, _ in search.get_hotels(40.75031, -73.98012, 5)} == {hotel["hotelId"] for hotel, _ in first}
+    assert fake_amadeus("/v1/reference-data/locations/hotels/by-geocode") == 1
+    search.get_hotels(40.75012, -73.98034, 10)
+    assert fake_amadeus("/v1/reference-data/locations/hotels/by-geocode") == 2
+
+
+def test_offers_are_reused_across_budgets_but_not_dates(fake_amadeus):
+    hotels = search.get_hotels(40.75, -73.98, 5)
+
+    generous = search.priced_hotels(3000, "2026-12-01", "2026-12-04", hotels, 3)
+    batches = fake_amadeus("/v3/shopping/hotel-offers")
+    tight = search.priced_hotels(250, "2026-12-01", "2026-12-04", hotels, 3)
+
+    assert fake_amadeus("/v3/shopping/hotel-offers") == batches
+    assert {hotel["hotelId"] for hotel in tight} < {hotel["hotelId"] for hotel in generous}
+    assert all(hotel["price"] * 3 <= 250 for hotel in tight)
+
+    search.priced_hotels(3000, "2026-12-02", "2026-12-04", hotels, 2)
+    assert fake_amadeus("/v3/shopping/hotel-offers") == 2 * batches
+
+
+def test_offer_keys_cover_dates_guests_and_currency():
+    params = {"checkInDate": "2026-12-01", "checkOutDate": "2026-12-04", "adults": 1, "currency": "USD"}
+
+    keys = {search._offer_key("H1", dict(params, **change)) for change in (
+        {}, {"checkInDate": "2026-12-02"}, {"checkOutDate": "2026-12-05"}, {"adults": 2}, {"currency": "EUR"},
+    )}
+
+    assert len(keys) == 5
@@ -0,0 +1,128 @@
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from cache import SharedCache, SQLiteCache
+from token_manager import TokenManager
+
+
+def fetcher(*tokens):
+    tokens = list(tokens)
+    calls = []
+
+    def fetch():
+        calls.append(tokens[len(calls)])
+        return calls[-1], 1800
+
+    return fetch, calls
+
+
+def shared_store(path):
+    return SharedCache(SQLiteCache(str(path), "tokens"), local_entries=10, local_ttl=30)
+
+
+def test_workers_share_a_stored_token(tmp_path):
+    fetch, calls = fetcher("first", "second")
+    path = tmp_path / "shared.sqlite3"
+    worker = TokenManager(fetch, store=shared_store(path), key="amadeus")
+    other = TokenManager(fetch, store=shared_store(path), key="amadeus")
+
+    assert worker.get() == "first"
+    assert other.get() == "first"
+    assert calls == ["first"]
+    assert other.stats()["shared_hits"] == 1
+
+
+def test_invalidate_leaves_a_replaced_shared_token(tmp_path):
+    fetch, calls = fetcher("first", "second")
+    path = tmp_path / "shared.sqlite3"
+    worker = TokenManager(fetch, store=shared_store(path), key="amadeus")
+    other = TokenManager(fetch, store=shared_store(path), key="amadeus")
+    assert worker.get() == "first"
+
+    # Another worker has already replaced the token this one saw rejected
+    other.store.set("amadeus", {"token": "replacement", "expires_at": 4102444800.0})
+    worker.store.local.clear()
+    worker.invalidate()
+
+    assert other.store.shared.get("amadeus")["token"] == "replacement"
+    assert worker.get() == "replacement"
+    assert calls == ["first"]
+
+
+def test_invalidate_removes_the_rejected_shared_token(tmp_path):
+    fetch, calls = fetcher("first", "second")
+    worker = TokenManager(fetch, store=shared_store(tmp_path / "shared.sqlite3"), key="amadeus")
+    assert worker.get() == "first"
+
+    worker.invalidate()
+
+    assert worker.store.shared.get("amadeus") is None
+    assert worker.get() == "second"
+
+
+def test_token_is_reused_until_the_refresh_margin():
+    fetch, calls = fetcher("first", "second")
+    manager = TokenManager(fetch, refresh_margin=60, early_refresh=60)
+
+    assert [manager.get() for _ in range(5)] == ["first"] * 5
+    assert calls == ["first"]
+    assert manager.stats()["hits"] == 4
+
+
+def test_token_inside_the_refresh_margin_is_replaced():
+    tokens = iter([("short", 30), ("long", 1800)])
+    manager = TokenManager(lambda: next(tokens), refresh_margin=60, early_refresh=60)
+
+    assert manager.get() == "short"
+    assert manager.get() == "long"
+    assert manager.stats()["refreshes"] == 2
+
+
+def test_token_near_expiry_is_refreshed_in_the_background():
+    tokens = iter([("old", 200), ("new", 1800)])
+    manager = TokenManager(lambda: next(tokens), refresh_margin=60, early_refresh=300)
+    assert manager.get() == "old"
+
+    assert manager.get() == "old"
+    deadline = time.monotonic() + 5
+    while manager.stats()["refreshes"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.get() == "new"
+
+
+def test_concurrent_callers_share_one_refresh():
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "token", 1800
+
+    manager = TokenManager(fetch)
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        results = [pool.submit(manager.get) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        assert [result.result() for result in results] == ["token"] * 8
+    assert len(calls) == 1
+
+
+def test_failed_refresh_raises_and_the_next_call_retries():
+    outcomes = iter([RuntimeError("token endpoint down"), ("token", 1800)])
+
+    def fetch():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    manager = TokenManager(fetch)
+
+    with pytest.raises(RuntimeError):
+        manager.get()
+    assert manager.get() == "token"
+    assert manager.stats()["refresh_failures"] == 1
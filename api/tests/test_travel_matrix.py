@@ -0,0 +1,184 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from cache import bypass_reads, open_cache
+from travel_matrix import TravelTimeCache, TravelTimeMatrix, location_key, plan_tiles
+
+
+class FakeDistanceMatrix:
+    """googlemaps-style distance_matrix(); `unreachable` pairs come back ZERO_RESULTS."""
+
+    def __init__(self, unreachable=()):
+        self.unreachable = set(unreachable)
+        self.requests = []
+
+    @staticmethod
+    def seconds(origin, destination):
+        return 60 + sum(map(ord, origin + "|" + destination)) % 1800
+
+    def distance_matrix(self, origins, destinations, mode):
+        self.requests.append([(o, d) for o in origins for d in destinations])
+        return {"rows": [
+            {"elements": [
+                {"status": "ZERO_RESULTS"} if (o, d) in self.unreachable
+                else {"status": "OK", "duration": {"value": self.seconds(o, d)}}
+                for d in destinations
+            ]}
+            for o in origins
+        ]}
+
+    def pairs(self):
+        return [pair for request in self.requests for pair in request]
+
+
+def trip(*days):
+    matrix = TravelTimeMatrix("transit")
+    for locations in days:
+        matrix.add_group(locations)
+    return matrix
+
+
+@pytest.mark.parametrize("origins, destinations", [(1, 1), (3, 40), (10, 10), (11, 9), (30, 30), (60, 2)])
+def test_tiles_cover_the_block_within_the_limits(origins, destinations):
+    tiles = plan_tiles(list(range(origins)), list(range(destinations)))
+
+    pairs = [(o, d) for tile_origins, tile_destinations in tiles for o in tile_origins for d in tile_destinations]
+    assert sorted(pairs) == sorted(itertools.product(range(origins), range(destinations)))
+    assert all(len(o) * len(d) <= 100 and len(o) <= 25 and len(d) <= 25 for o, d in tiles)
+
+
+def test_days_sharing_the_hotel_fetch_each_pair_once():
+    client = FakeDistanceMatrix()
+    matrix = trip(["hotel", "a", "b", "c"], ["hotel", "d", "e"])
+
+    matrix.fetch(client=client, use_cache=False)
+
+    legs = [(o, d) for o, d in client.pairs() if o != d]
+    assert len(legs) == len(set(legs))
+    assert set(client.pairs()) >= {(o, d) for day in (["hotel", "a", "b", "c"], ["hotel", "d", "e"]) for o in day for d in day}
+    assert ("a", "d") not in legs and ("d", "a") not in legs
+
+
+def test_fetch_skips_pairs_already_known():
+    client = FakeDistanceMatrix()
+    matrix = trip(["hotel", "a", "b"])
+    matrix.fetch(client=client, use_cache=False)
+
+    first = len(client.requests)
+    matrix.add_group(["hotel", "a", "c"])
+    matrix.fetch(client=client, use_cache=False)
+
+    assert {pair for request in client.requests[first:] for pair in request} == {("hotel", "c"), ("a", "c"), ("c", "hotel"), ("c", "a"), ("c", "c")}
+
+
+def test_day_submatrix_holds_the_fetched_durations():
+    client = FakeDistanceMatrix(unreachable={("b", "a")})
+    day = ["hotel", "a", "b"]
+    matrix = trip(day)
+
+    matrix.fetch(client=client, use_cache=False)
+
+    expected = np.array([[client.seconds(o, d) for d in day] for o in day], dtype=float)
+    expected[2, 1] = math.inf
+    assert np.array_equal(matrix.submatrix(day), expected)
+
+
+@pytest.fixture
+def travel_cache(tmp_path):
+    return TravelTimeCache(open_cache("shared", "travel_times", ttl=3600, path=str(tmp_path / "travel.sqlite3")))
+
+
+def test_location_key_snaps_coordinates_and_normalizes_addresses():
+    assert location_key("40.75012, -73.98034") == location_key("40.75009,-73.98031")
+    assert location_key("40.7501,-73.9803") != location_key("40.7521,-73.9803")
+    assert location_key("  1 Main  St, NYC ") == location_key("1 main st, nyc")
+    assert location_key("40.75012,-73.98034", grid=0) == "40.750120,-73.980340"
+
+
+def test_cached_pairs_are_not_fetched_again(travel_cache):
+    day = ["hotel", "a", "b"]
+    first = FakeDistanceMatrix()
+    trip(day).fetch(client=first, cache=travel_cache)
+
+    second = FakeDistanceMatrix()
+    matrix = trip(day)
+    matrix.fetch(client=second, cache=travel_cache)
+
+    assert second.requests == []
+    assert matrix.cache_hits == 9
+    assert np.array_equal(matrix.submatrix(day), np.array([[first.seconds(o, d) for d in day] for o in day], dtype=float))
+
+
+def test_modes_are_cached_apart(travel_cache):
+    trip(["hotel", "a"]).fetch(client=FakeDistanceMatrix(), cache=travel_cache)
+
+    driving = TravelTimeMatrix("driving")
+    driving.add_group(["hotel", "a"])
+    client = FakeDistanceMatrix()
+    driving.fetch(client=client, cache=travel_cache)
+
+    assert len(client.pairs()) == 4
+
+
+def test_unreachable_pairs_are_not_cached(travel_cache):
+    trip(["hotel", "a"]).fetch(client=FakeDistanceMatrix(unreachable={("a", "hotel")}), cache=travel_cache)
+
+    client = FakeDistanceMatrix()
+    trip(["hotel", "a"]).fetch(client=client, cache=travel_cache)
+
+    assert client.pairs() == [("a", "hotel")]
+
+
+def test_bypass_reads_refetches_and_refreshes_the_cache(travel_cache):
+    trip(["hotel", "a"]).fetch(client=FakeDistanceMatrix(unreachable={("a", "hotel")}), cache=travel_cache)
+
+    client = FakeDistanceMatrix()
+    token = bypass_reads.set(True)
+    try:
+        trip(["hotel", "a"]).fetch(client=client, cache=travel_cache)
+    finally:
+        bypass_reads.reset(token)
+
+    assert len(client.pairs()) == 4
+    assert travel_cache.lookup([("a", "hotel")], "transit") == {("a", "hotel"): client.seconds("a", "hotel")}
+
+
+def test_matrix_grows_without_losing_durations():
+    client = FakeDistanceMatrix()
+    matrix = trip(["hotel", "a"])
+    matrix.fetch(client=client, use_cache=False)
+
+    for i in range(50):
+        matrix.add_location(f"stop {i}")
+
+    assert matrix.durations.shape[0] >= 52
+    assert matrix.duration("hotel", "a") == client.seconds("hotel", "a")
+    assert np.isnan(matrix.duration("hotel", "stop 7"))
+
+
+def test_submatrix_gives_repeated_locations_their_own_rows():
+    client = FakeDistanceMatrix()
+    matrix = trip(["hotel", "a"])
+    matrix.fetch(client=client, use_cache=False)
+
+    block = matrix.submatrix(["hotel", "a", "hotel"])
+
+    assert block.shape == (3, 3)
+    assert np.array_equal(block[0], block[2])
+    assert block[1, 2] == client.seconds("a", "hotel")
+    assert np.isnan(matrix.submatrix(["hotel", "never fetched"])[0, 1])
+
+
+def test_missing_blocks_cover_only_the_unknown_pairs():
+    matrix = trip(["hotel", "a", "b", "c"])
+    matrix.fetch(client=FakeDistanceMatrix(), use_cache=False)
+    matrix.add_group(["hotel", "a", "b", "c", "new"])
+
+    blocks = matrix.missing_blocks()
+
+    new = matrix.index["new"]
+    pairs = {(i, j) for origins, destinations in blocks for i in origins for j in destinations}
+    assert pairs == {(i, new) for i in range(5)} | {(new, j) for j in range(5)}
@@ -0,0 +1,146 @@
+import threading
+import time
+
+
+class _Flight:
+    """A single in-progress token refresh that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.token = None
+        self.error = None
+
+
+class TokenManager:
+    """
+    Thread-safe, process-wide holder for an OAuth bearer token.
+
+    The token is kept until `refresh_margin` seconds before it expires. Once it is
+    within `early_refresh` seconds of expiry, the next caller still gets the cached
+    token but a refresh is started in the background. Concurrent callers that need
+    a new token share a single in-flight refresh instead of each starting their own.
+
+    With a `store` (a cache backend every worker process opens, see cache.SharedCache),
+    a refresh first takes the token another worker stored there if it isn't due for
+    refresh itself, and a newly fetched token is stored for the others, so the workers
+    on a host share one token.
+
+    Args:
+        fetch (callable): returns (access_token, expires_in_seconds)
+        refresh_margin (float): stop handing out the token this long before expiry
+        early_refresh (float): start a background refresh this long before expiry
+        store: optional shared cache backend
+        key (str): the token's key in `store`
+    """
+
+    def __init__(self, fetch, refresh_margin=60, early_refresh=300, store=None, key="token"):
+        self._fetch = fetch
+        self.store = store
+        self.key = key
+        self.refresh_margin = refresh_margin
+        self.early_refresh = max(early_refresh, refresh_margin)
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+        self._flight = None
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._shared_hits = 0
+        self._refresh_failures = 0
+        self._refresh_seconds_total = 0.0
+        self._refresh_seconds_max = 0.0
+
+    def get(self):
+        """Return a valid access token, refreshing it if needed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._token and now < self._expires_at - self.refresh_margin:
+                self._hits += 1
+                if now >= self._expires_at - self.early_refresh and self._flight is None:
+                    flight = self._flight = _Flight()
+                    threading.Thread(target=self._refresh, args=(flight,), daemon=True).start()
+                return self._token
+            self._misses += 1
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+
+        if leader:
+            self._refresh(flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.token
+
+    def invalidate(self):
+        """Drop the cached token, e.g. after the provider rejected it with a 401."""
+        with self._lock:
+            rejected = self._token
+            self._token = None
+            self._expires_at = 0.0
+        # Other workers may already have replaced it with a good one; leave that be
+        if self.store is not None and rejected is not None:
+            entry = self.store.get(self.key)
+            if entry is not None and entry["token"] == rejected:
+                self.store.delete(self.key)
+
+    def stats(self):
+        """Return counters for cache hits, refreshes and refresh latency."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "refreshes": self._refreshes,
+                "shared_hits": self._shared_hits,
+                "refresh_failures": self._refresh_failures,
+                "refresh_seconds_total": self._refresh_seconds_total,
+                "refresh_seconds_max": self._refresh_seconds_max,
+                "expires_in": max(0.0, self._expires_at - time.monotonic()) if self._token else 0.0,
+            }
+
+    def _shared_token(self):
+        """A token from the store with more than early_refresh seconds left, as (token, expires_in), or None."""
+        entry = self.store.get(self.key) if self.store is not None else None
+        if entry is None:
+            return None
+        expires_in = entry["expires_at"] - time.time()
+        return (entry["token"], expires_in) if expires_in > self.early_refresh else None
+
+    def _fetch_and_share(self):
+        token, expires_in = self._fetch()
+        if self.store is not None and token and expires_in:
+            entry = {"token": token, "expires_at": time.time() + float(expires_in)}
+            self.store.set(self.key, entry, ttl=float(expires_in))
+        return token, expires_in
+
+    def _refresh(self, flight):
+        started = time.monotonic()
+        shared = False
+        try:
+            found = self._shared_token()
+            shared = found is not None
+            token, expires_in = found or self._fetch_and_share()
+            if not token:
+                raise RuntimeError("Token endpoint returned no access token")
+            flight.token = token
+        except Exception as e:
+            flight.error = e
+        elapsed = time.monotonic() - started
+
+        with self._lock:
+            if flight.error is None:
+                self._token = flight.token
+                self._expires_at = started + float(expires_in or 0)
+                if shared:
+                    self._shared_hits += 1
+                else:
+                    self._refreshes += 1
+            else:
+                self._refresh_failures += 1
+            self._refresh_seconds_total += elapsed
+            self._refresh_seconds_max = max(self._refresh_seconds_max, elapsed)
+            self._flight = None
+        flight.done.set()
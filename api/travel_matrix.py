@@ -0,0 +1,232 @@
+import math
+import threading
+import numpy as np
+from http_client import get_gmaps_client
+from cache import open_cache, bypass_reads
+from config import TRAVEL_CACHE_PATH, TRAVEL_CACHE_TTL, TRAVEL_CACHE_MAX_ENTRIES, TRAVEL_CACHE_GRID
+import pipeline
+import metrics
+
+# Google Distance Matrix per-request limits
+MAX_ELEMENTS_PER_REQUEST = 100
+MAX_LOCATIONS_PER_SIDE = 25
+
+
+def plan_tiles(origins, destinations, max_elements=MAX_ELEMENTS_PER_REQUEST, max_side=MAX_LOCATIONS_PER_SIDE):
+    """
+    Split an origins x destinations block into the fewest requests that fit Google's limits.
+
+    Returns:
+        list[tuple]: (origins_slice, destinations_slice) pairs covering the whole block
+    """
+    if not origins or not destinations:
+        return []
+    cols = min(len(destinations), max_side, max_elements)
+    rows = max(1, min(len(origins), max_side, max_elements // cols))
+    tiles = []
+    for r in range(0, len(origins), rows):
+        for c in range(0, len(destinations), cols):
+            tiles.append((origins[r:r + rows], destinations[c:c + cols]))
+    return tiles
+
+
+def location_key(location, grid=TRAVEL_CACHE_GRID):
+    """
+    Normalize a routing location for cache keys.
+
+    "lat,lon" strings are snapped to a grid of `grid` degrees (when grid > 0) so that
+    near-identical coordinates share a key; anything else is treated as an address.
+    """
+    text = " ".join(str(location).lower().split())
+    try:
+        lat, lon = (float(part) for part in text.split(","))
+    except ValueError:
+        return text
+    if grid:
+        lat = round(lat / grid) * grid
+        lon = round(lon / grid) * grid
+    return f"{lat:.6f},{lon:.6f}"
+
+
+class TravelTimeCache:
+    """Persistent (origin, destination, mode) -> duration cache in front of the Distance Matrix API."""
+
+    def __init__(self, store, grid=TRAVEL_CACHE_GRID):
+        self.store = store
+        self.grid = grid
+
+    def key(self, origin, destination, mode):
+        return f"{mode}|{location_key(origin, self.grid)}|{location_key(destination, self.grid)}"
+
+    def lookup(self, pairs, mode):
+        """Return {(origin, destination): seconds} for the pairs that are cached."""
+        keys = {}
+        for o, d in pairs:
+            keys.setdefault(self.key(o, d, mode), []).append((o, d))
+        found = self.store.get_many(keys)
+        return {pair: value for key, value in found.items() for pair in keys[key]}
+
+    def save(self, durations, mode):
+        """Cache {(origin, destination): seconds}; unreachable (inf) pairs are not cached."""
+        self.store.set_many({
+            self.key(o, d, mode): value
+            for (o, d), value in durations.items()
+            if value != math.inf
+        })
+
+    def stats(self):
+        return self.store.stats()
+
+
+_travel_cache = None
+_travel_cache_lock = threading.Lock()
+
+
+def get_travel_cache():
+    """Return the travel-time cache every worker shares, or None if TRAVEL_CACHE_PATH is empty."""
+    global _travel_cache
+    if _travel_cache is None and TRAVEL_CACHE_PATH:
+        with _travel_cache_lock:
+            if _travel_cache is None:
+                store = open_cache("shared", "travel_times", ttl=TRAVEL_CACHE_TTL, max_entries=TRAVEL_CACHE_MAX_ENTRIES, path=TRAVEL_CACHE_PATH)
+                _travel_cache = TravelTimeCache(store)
+    return _travel_cache
+
+
+class TravelTimeMatrix:
+    """
+    Travel durations (seconds) between the locations of a whole trip, fetched once.
+
+    Each day registers its locations with add_group(). fetch() then requests only the
+    pairs some day actually needs and that haven't been fetched yet (so shared legs such
+    as the hotel's are fetched once), tiled to respect the per-request element limits.
+    Pairs found in the persistent travel-time cache are not fetched at all.
+
+    Durations live in one contiguous float array indexed by location id; pairs that
+    haven't been fetched are NaN and unreachable pairs are math.inf. Days take their
+    dense per-place block with submatrix().
+    """
+
+    def __init__(self, mode="transit"):
+        self.mode = mode
+        self.locations = []
+        self.index = {}
+        self.durations = np.full((0, 0), np.nan)
+        self.groups = []
+        self.requests_made = 0
+        self.elements_fetched = 0
+        self.cache_hits = 0
+
+    def add_location(self, location):
+        if location not in self.index:
+            self.index[location] = len(self.locations)
+            self.locations.append(location)
+            size = len(self.locations)
+            if size > self.durations.shape[0]:
+                grown = np.full((2 * size, 2 * size), np.nan)
+                old = self.durations.shape[0]
+                grown[:old, :old] = self.durations
+                self.durations = grown
+        return self.index[location]
+
+    def add_group(self, locations):
+        """Register one day's locations; every ordered pair within the group will be fetched."""
+        self.groups.append(np.array(sorted(set(self.add_location(loc) for loc in locations)), dtype=np.intp))
+
+    def _unknown(self, group):
+        """(i, j) location-id pairs of `group` that have no duration yet."""
+        rows, cols = np.nonzero(np.isnan(self.durations[np.ix_(group, group)]))
+        return list(zip(group[rows].tolist(), group[cols].tolist()))
+
+    def needed_pairs(self):
+        """Every (i, j) some group needs that is not known yet."""
+        return set(pair for group in self.groups for pair in self._unknown(group))
+
+    def missing_blocks(self):
+        """
+        Return (origins, destinations) blocks covering the not-yet-known pairs of every group.
+
+        A group's missing pairs are requested as one bounding block when that wastes
+        little; otherwise origins that miss the same destinations are grouped into exact
+        blocks (e.g. one new restaurant in an otherwise cached day becomes a row and a column).
+        """
+        planned = set()
+        blocks = []
+        for group in self.groups:
+            missing = [pair for pair in self._unknown(group) if pair not in planned]
+            if not missing:
+                continue
+            planned.update(missing)
+            origins = sorted(set(i for i, _ in missing))
+            destinations = sorted(set(j for _, j in missing))
+            if len(origins) * len(destinations) - len(missing) <= max(1, len(missing) // 10):
+                blocks.append((origins, destinations))
+                continue
+            by_destinations = {}
+            for i, j in missing:
+                by_destinations.setdefault(i, []).append(j)
+            grouped = {}
+            for i, js in by_destinations.items():
+                grouped.setdefault(tuple(sorted(js)), []).append(i)
+            for js, origins in grouped.items():
+                blocks.append((sorted(origins), list(js)))
+        return blocks
+
+    def fetch(self, client=None, deadline=None, cache=None, use_cache=True):
+        """
+        Fill in all missing pairs: first from the travel-time cache, then from the network
+        with the tiles sent concurrently. Unreachable pairs are math.inf.
+        """
+        cache = (cache or get_travel_cache()) if use_cache else None
+        if cache is not None and not bypass_reads.get():
+            needed = self.needed_pairs()
+            cached = cache.lookup([(self.locations[i], self.locations[j]) for i, j in needed], self.mode)
+            for (origin, destination), value in cached.items():
+                self.durations[self.index[origin], self.index[destination]] = value
+            self.cache_hits += len(cached)
+            metrics.MATRIX_CACHED.inc(len(cached), mode=self.mode)
+
+        tiles = [tile for origins, destinations in self.missing_blocks() for tile in plan_tiles(origins, destinations)]
+        if not tiles:
+            return
+        client = client or get_gmaps_client()
+        tasks = [lambda o=o, d=d: self._fetch_tile(client, o, d) for o, d in tiles]
+        fetched = {}
+        for result in pipeline.run_concurrently(tasks, deadline=deadline, default=None):
+            if result is None:
+                continue
+            self.requests_made += 1
+            self.elements_fetched += len(result)
+            fetched.update(result)
+        for (i, j), value in fetched.items():
+            self.durations[i, j] = value
+        if cache is not None and fetched:
+            cache.save({(self.locations[i], self.locations[j]): value for (i, j), value in fetched.items()}, self.mode)
+
+    def _fetch_tile(self, client, origins, destinations):
+        metrics.MATRIX_ELEMENTS.inc(len(origins) * len(destinations), mode=self.mode)
+        with metrics.span("distance_matrix_tile"):
+            matrix = client.distance_matrix(
+                [self.locations[i] for i in origins],
+                [self.locations[j] for j in destinations],
+                mode=self.mode,
+            )
+        result = {}
+        for i, row in zip(origins, matrix['rows']):
+            for j, element in zip(destinations, row['elements']):
+                if element['status'] == 'OK':
+                    result[(i, j)] = element['duration']['value']
+                else:
+                    result[(i, j)] = math.inf
+        return result
+
+    def duration(self, origin, destination):
+        return self.durations[self.index[origin], self.index[destination]]
+
+    def submatrix(self, locations):
+        """
+        Dense durations between `locations`, one row/column per entry (repeated locations
+        get their own rows). NaN marks pairs that were never fetched.
+        """
+        ids = np.array([self.add_location(loc) for loc in locations], dtype=np.intp)
+        return self.durations[np.ix_(ids, ids)]
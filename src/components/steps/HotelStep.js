@@ -33,6 +33,8 @@ const HotelStep = ({
   const [hotelName, setHotelName] = useState('');
   const [selectedMarker, setSelectedMarker] = useState(null);
   const mapRef = useRef();
+  // Aborting the hotel stream closes the connection, which makes the server stop pricing
+  const searchRef = useRef(null);
 
   // Set default dates if not provided
   const defaultCheckIn = checkInDate || new Date();
@@ -62,7 +64,13 @@ const HotelStep = ({
     }
   }, [hotels]);
 
+  // Stop the hotel search when leaving this step
+  useEffect(() => () => searchRef.current?.abort(), []);
+
   const fetchHotels = async () => {
+    searchRef.current?.abort();
+    const search = new AbortController();
+    searchRef.current = search;
     setLoadingHotels(true);
     setError(null);
     try {
@@ -73,7 +81,8 @@ const HotelStep = ({
         return d.toISOString().split('T')[0];
       };
 
-      const response = await fetch(`${API_BASE}/api/search-hotels`, {
+      // Hotels arrive as NDJSON lines, one per hotel, as soon as each batch is priced
+      const response = await fetch(`${API_BASE}/api/search-hotels/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -86,21 +95,45 @@ const HotelStep = ({
           hotel_name: hotelName,
           check_in_date: formatDate(checkInDate || defaultCheckIn),
           check_out_date: formatDate(checkOutDate || defaultCheckOut),
+          limit: 20,
         }),
+        signal: search.signal,
       });
 
       if (!response.ok) {
         throw new Error(`Server error: ${response.status}`);
       }
 
-      const data = await response.json();
-      setHotels(data.hotels || []);
+      setHotels([]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'hotel') {
+            setHotels(prev => [...prev, event.hotel]);
+          } else if (event.type === 'error') {
+            throw new Error(event.error);
+          }
+        }
+      }
     } catch (err) {
+      if (err.name === 'AbortError') return;
       console.error('Error fetching hotels:', err);
       setError(err.message);
       setHotels([]);
     } finally {
-      setLoadingHotels(false);
+      if (searchRef.current === search) {
+        searchRef.current = null;
+        setLoadingHotels(false);
+      }
     }
   };
 